@@ -1,11 +1,13 @@
 import customtkinter as ctk
+import time
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import include.Motor as mtr
+from include.MotorCommandDispatcher import MotorCommandDispatcher
 
 class MotorVelocityInput:
 
-    def __init__(self, maximumFrequency, relativeIncrease, motorConnected=True, motorNode=1, motorUSB=0, motorAcceleration=8000):
+    def __init__(self, maximumFrequency, relativeIncrease, motorConnected=True, motorNode=1, motorUSB=0, motorAcceleration=8000, motorBackend=None, maxCommandRate=50, maxFrameRate=60):
         ctk.set_appearance_mode("dark")
         self.root = ctk.CTk()
         self.root.geometry("400x400")
@@ -32,37 +34,69 @@ class MotorVelocityInput:
         self.motorConnected = motorConnected
 
         if self.motorConnected:
-            self.motor = mtr.Motor(motorNode,motorUSB)
+            self.motor = mtr.Motor(motorNode,motorUSB,motorBackend) # motorBackend=None uses the EPOS DLL, or pass e.g. SimulatedEpos()
             self.motor.OpenCommunication()
             if self.motor.keyhandle != 0:
                 self.motor.EnableMotor()
                 self.motor.SetVelocityProfile(motorAcceleration,motorAcceleration)
 
+            # Velocity commands are sent on a background thread (latest value wins, at most maxCommandRate per second)
+            self.dispatcher = MotorCommandDispatcher(self.motor, maxCommandRate)
+            self.dispatcher.start()
+
         # Matplotlib figure and axis
         fig, self.ax = plt.subplots()
         self.bar = self.ax.bar(["Bar"], [self.rpmFreq])
         self.ax.set_ylim([0, self.maximumFrequency+1])
         self.bar[0].set_color('blue')
+        self.bar[0].set_animated(True)  # The bar is drawn by blitting, not by a full redraw
 
         # Embedding the matplotlib figure into customtkinter
         self.canvas = FigureCanvasTkAgg(fig, master=self.barDisplay)  # Create canvas for figure
         self.canvas.get_tk_widget().place(relwidth=1, relheight=1)  # Pack inside the frame
+
+        # Fast rendering: the axes without the bar are cached as background (again after every full draw, e.g. a resize),
+        # and key presses within one frame (maxFrameRate) are batched into one render of only the bar
+        self.background = None
+        self.frameInterval = 1.0/maxFrameRate
+        self.lastRenderTime = 0.0
+        self.renderScheduled = False
+        self.displayedText = None
+        self.canvas.mpl_connect('draw_event', self.onDraw)
         self.canvas.draw()  # Draw initial plot
         self.setBindings()
 
         # Give closing commands
         self.root.protocol("WM_DELETE_WINDOW", self.onClosing)
 
+        # Show the actual command rate and latency in the title
+        if self.motorConnected:
+            self.updateDispatcherStats()
+
         # Initiate figure
         self.root.mainloop()
 
     def update_bar_plot(self):
+        # Schedule one render for all updates within the current frame (frame-rate capping)
+        if not self.renderScheduled:
+            self.renderScheduled = True
+            delay = max(0.0, self.lastRenderTime + self.frameInterval - time.perf_counter())
+            self.root.after(int(delay*1000), self.renderBarPlot)
+
+    def renderBarPlot(self):
+        self.renderScheduled = False
+        self.lastRenderTime = time.perf_counter()
+
+        # Update the textbox only if the value changed
+        text = "\n"+str(round(self.rpmDirection*self.rpmFreq,3))
+        if text != self.displayedText:
+            # Clear the textbox and insert the value of self.rpmFreq
+            self.freqDisplay.delete("1.0", "end")
+            self.freqDisplay.insert("1.0", text,"center")
+            self.displayedText = text
+
         # Update heights
         self.bar[0].set_height(self.rpmFreq)
-        # Clear the textbox (optional if you want to replace old content)
-        self.freqDisplay.delete("1.0", "end")
-        # Insert the value of self.rpmFreq
-        self.freqDisplay.insert("1.0", "\n"+str(round(self.rpmDirection*self.rpmFreq,3)),"center")
 
         # Update color from direction
         colorMap = {
@@ -70,7 +104,19 @@ class MotorVelocityInput:
             -1: 'red'
         }
         self.bar[0].set_color(colorMap.get(self.rpmDirection, 'black')) # Default black color
-        self.canvas.draw()
+
+        # Blit: restore the cached background and draw only the bar
+        if self.background is None:
+            self.canvas.draw()
+            return
+        self.canvas.restore_region(self.background)
+        self.ax.draw_artist(self.bar[0])
+        self.canvas.blit(self.ax.bbox)
+
+    def onDraw(self, event):
+        # Called after every full redraw: cache the new background and draw the (animated) bar on top of it
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.ax.draw_artist(self.bar[0])
 
     def setBindings(self):
         Bindings = {
@@ -133,19 +179,27 @@ class MotorVelocityInput:
         self.rpmFreq = rpm
         self.update_bar_plot()
         if self.motorConnected:
-            self.motor.RunSetVelocity(int((26.0/7.0)*60.0*self.rpmFreq*self.rpmDirection))
+            self.dispatcher.submit(mtr.FrequencyToVelocity(self.rpmFreq,self.rpmDirection)) # Non-blocking
 
     def setDirection(self, direction):
         self.rpmDirection = direction
         self.update_bar_plot()
         if self.motorConnected:
-            self.motor.RunSetVelocity(int((26.0/7.0)*60.0*self.rpmFreq*self.rpmDirection))
+            self.dispatcher.submit(mtr.FrequencyToVelocity(self.rpmFreq,self.rpmDirection)) # Non-blocking
+
+    def updateDispatcherStats(self):
+        stats = self.dispatcher.stats()
+        latency = f"{stats['latency_mean_ms']:.1f} ms" if stats['latency_mean_ms'] is not None else "-"
+        self.root.title(f"Bar Plot Example - {stats['command_rate_hz']:.0f} cmd/s, latency {latency}")
+        self.root.after(500, self.updateDispatcherStats)
 
     # Miscellaneous motor key handlers
 
     # Function to terminate running program when closing the figure
     def onClosing(self):
         if self.motorConnected:
+            self.dispatcher.stop() # Sends the last pending command
+            print(f"Motor commands: {self.dispatcher.stats()}")
             self.motor.DisableMotor() 
             self.motor.CloseCommunication()
         self.root.quit()
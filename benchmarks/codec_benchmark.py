@@ -0,0 +1,166 @@
+"""
+Codec Benchmark
+
+Measures the codecs that can be used for the recordings (CameraWorker, "codec" in cameras.json) and for the tracking
+video of the VideoTracker. A reference clip is replayed through cv2.VideoWriter with every codec, the file is decoded
+again with cv2.VideoCapture and the tracker (locate_object, Otsu's thresholding and the largest contour, the same as
+the VideoTracker) runs on the decoded frames. Reported per codec:
+- encode fps and decode fps (including the conversion to grayscale for the grayscale codecs),
+- bytes per frame,
+- centroid error (mean, max in pixels) of the tracked object against tracking on the uncompressed source frames,
+  and the number of frames where the object was lost.
+
+Codecs that are not available in the installed OpenCV/FFmpeg build are reported as unavailable (e.g. H.264 is often
+missing from the pip wheels).
+
+The reference clip is a synthetic recording of a dark object that moves over a noisy background (default), or a real
+recording (--clip, with --roi the object ROI in its first frame).
+
+How to run:
+    python -m benchmarks.codec_benchmark [--clip <video> --roi X Y W H] [--frames 150] [--width 1920] [--height 1080] [--json results.json] [--keep <folder>]
+"""
+
+import cv2
+import numpy as np
+import argparse
+import tempfile
+import shutil
+import json
+import time
+import os
+from include.TrackerClassV3 import locate_object
+
+# (name, fourcc, container, grayscale). fourcc None = uncompressed frames
+CODECS = [
+    ("XVID", "XVID", ".avi", False),
+    ("MJPG", "MJPG", ".avi", False),
+    ("FFV1 (lossless)", "FFV1", ".avi", False),
+    ("HuffYUV (lossless)", "HFYU", ".avi", False),
+    ("H.264", "H264", ".mkv", False),
+    ("H.264 (avc1)", "avc1", ".mp4", False),
+    ("Raw", None, ".avi", False),
+    ("FFV1 gray (lossless)", "FFV1", ".avi", True),
+    ("Raw gray (Y800)", "Y800", ".avi", True),
+]
+
+def synthetic_clip(n_frames, width, height, seed=0):
+    # A dark ellipse moving on a Lissajous path over a textured, noisy background (like the container under the camera)
+    rng = np.random.default_rng(seed)
+    background = cv2.GaussianBlur(rng.integers(170, 230, (height, width, 3), dtype=np.uint8), (0, 0), 3)
+    t = np.arange(n_frames) / 30.0
+    centers = np.column_stack((width / 2 + 0.3 * width * np.sin(0.7 * t), height / 2 + 0.3 * height * np.sin(1.1 * t)))
+    axes = (max(width // 40, 4), max(width // 80, 2))
+    frames = []
+    for i, (cx, cy) in enumerate(centers):
+        frame = background.copy()
+        cv2.ellipse(frame, (int(cx), int(cy)), axes, 30.0 * t[i], 0, 360, (40, 40, 40), -1)
+        noise = rng.normal(0, 4, frame.shape)
+        frames.append(np.clip(frame + noise, 0, 255).astype(np.uint8))
+    roi = (int(centers[0, 0]) - 3 * axes[0], int(centers[0, 1]) - 3 * axes[0], 6 * axes[0], 6 * axes[0])
+    return frames, roi
+
+def load_clip(path, n_frames):
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < n_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+def track(frames, roi):
+    # Same tracking as the VideoTracker, returns the object center per frame (NaN when it was not found)
+    centers = np.full((len(frames), 2), np.nan)
+    for i, frame in enumerate(frames):
+        roi, rect, _ = locate_object(frame, roi)
+        if rect is not None:
+            centers[i] = rect[0]
+    return centers
+
+def run_codec(name, fourcc, container, gray, frames, roi, reference, folder):
+    path = os.path.join(folder, f"{name.split()[0].replace('.', '')}{'_gray' if gray else ''}{container}")
+    height, width = frames[0].shape[:2]
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc) if fourcc else 0, 30, (width, height), isColor=not gray)
+    if not writer.isOpened():
+        return {"codec": name, "available": False}
+
+    # Encode (the conversion to grayscale is part of the recording path)
+    start = time.perf_counter()
+    for frame in frames:
+        writer.write(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if gray else frame)
+    writer.release()
+    encode_time = time.perf_counter() - start
+
+    # Decode
+    cap = cv2.VideoCapture(path)
+    decoded = []
+    start = time.perf_counter()
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        decoded.append(frame)
+    decode_time = time.perf_counter() - start
+    cap.release()
+    if len(decoded) != len(frames):
+        return {"codec": name, "available": True, "error": f"decoded {len(decoded)} of {len(frames)} frames"}
+
+    # Tracking accuracy against the uncompressed source
+    centers = track(decoded, roi)
+    errors = np.linalg.norm(centers - reference, axis=1)
+    return {
+        "codec": name,
+        "available": True,
+        "fourcc": fourcc or "raw",
+        "container": container,
+        "grayscale": gray,
+        "encode_fps": len(frames) / encode_time,
+        "decode_fps": len(frames) / decode_time,
+        "bytes_per_frame": os.path.getsize(path) / len(frames),
+        "centroid_error_px": {"mean": float(np.nanmean(errors)), "max": float(np.nanmax(errors))} if np.isfinite(errors).any() else None,
+        "lost_frames": int(np.isnan(centers[:, 0]).sum() - np.isnan(reference[:, 0]).sum()),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the video codecs for recording and tracking.")
+    parser.add_argument("--clip", help="Reference video (default: synthetic clip)")
+    parser.add_argument("--roi", nargs=4, type=int, metavar=("X", "Y", "W", "H"), help="Object ROI in the first frame of the clip")
+    parser.add_argument("--frames", type=int, default=150, help="Number of frames of the clip")
+    parser.add_argument("--width", type=int, default=1920, help="Width of the synthetic clip")
+    parser.add_argument("--height", type=int, default=1080, help="Height of the synthetic clip")
+    parser.add_argument("--json", help="Save the results to this JSON file")
+    parser.add_argument("--keep", help="Keep the encoded videos in this folder (default: temporary folder)")
+    args = parser.parse_args()
+
+    if args.clip:
+        if args.roi is None:
+            parser.error("--roi is needed with --clip")
+        frames, roi = load_clip(args.clip, args.frames), tuple(args.roi)
+    else:
+        frames, roi = synthetic_clip(args.frames, args.width, args.height)
+    print(f"[INFO] Reference clip: {len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]}")
+    reference = track(frames, roi)
+
+    folder = args.keep or tempfile.mkdtemp(prefix="codec_benchmark_")
+    os.makedirs(folder, exist_ok=True)
+    try:
+        results = [run_codec(*codec, frames, roi, reference, folder) for codec in CODECS]
+    finally:
+        if not args.keep:
+            shutil.rmtree(folder, ignore_errors=True)
+
+    print(f"\n{'Codec':<22}{'encode fps':>11}{'decode fps':>11}{'kB/frame':>10}{'err mean':>10}{'err max':>9}{'lost':>6}")
+    for result in results:
+        if not result["available"] or "error" in result:
+            print(f"{result['codec']:<22}  {result.get('error', 'unavailable')}")
+            continue
+        error = result["centroid_error_px"] or {"mean": float("nan"), "max": float("nan")}
+        print(f"{result['codec']:<22}{result['encode_fps']:>11.1f}{result['decode_fps']:>11.1f}{result['bytes_per_frame'] / 1000:>10.1f}"
+              f"{error['mean']:>10.3f}{error['max']:>9.3f}{result['lost_frames']:>6d}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"settings": vars(args), "codecs": results}, f, indent=2)
+        print(f"\n[INFO] Results saved to {args.json}")
@@ -0,0 +1,139 @@
+"""
+Frame Bus Benchmark
+
+Compares two ways to fan out camera frames to consumers in other processes:
+- FrameBus: the frames are written into a shared-memory ring (include/FrameBus.py) and every consumer reads the
+  newest frame as a view on the shared memory (no copy, slow consumers skip ahead).
+- Queue: every frame is pickled and sent to every consumer through a multiprocessing.Queue (a copy per consumer).
+
+The producer writes synthetic frames at a fixed rate (like a camera) and every consumer does a small amount of work
+on each frame (mean of a region, like the tracker ROI). Reported per method: the frames per second the consumers
+handled, the skipped frames and the latency from publishing a frame to the consumer having it.
+
+How to run:
+    python -m benchmarks.frame_bus_benchmark [--consumers 3] [--fps 30] [--duration 5] [--width 1920] [--height 1080] [--json results.json]
+"""
+
+import numpy as np
+import multiprocessing
+import argparse
+import json
+import time
+import queue
+from include.FrameBus import FrameBus, FrameBusReader
+
+def bus_consumer(spec, duration, results):
+    reader = FrameBusReader(spec)
+    latencies = []
+    n_frames = 0
+    frame = None
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        result = reader.read_latest(timeout=0.5)
+        if result is None:
+            continue
+        sequence, timestamp, frame = result
+        latencies.append(time.perf_counter() - timestamp)
+        frame[100:200, 100:200].mean()
+        n_frames += 1
+    results.put({"frames": n_frames, "skipped": reader.n_skipped, "latencies": latencies})
+    frame = None  # Release the view on the shared memory before closing it
+    reader.close()
+
+def queue_consumer(frame_queue, duration, results):
+    latencies = []
+    n_frames = 0
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        try:
+            timestamp, frame = frame_queue.get(timeout=0.5)
+        except queue.Empty:
+            continue
+        latencies.append(time.perf_counter() - timestamp)
+        frame[100:200, 100:200].mean()
+        n_frames += 1
+    results.put({"frames": n_frames, "skipped": 0, "latencies": latencies})
+
+def produce(write, frames, fps, duration):
+    # Writes the frames at a fixed rate with absolute deadlines, returns the number of frames written
+    period = 1.0 / fps
+    start = time.perf_counter()
+    n_frames = 0
+    while time.perf_counter() - start < duration:
+        deadline = start + n_frames * period
+        delay = deadline - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        write(frames[n_frames % len(frames)])
+        n_frames += 1
+    return n_frames
+
+def summarize(name, n_produced, consumer_results, duration):
+    latencies_ms = np.concatenate([r["latencies"] for r in consumer_results]) * 1000.0
+    return {
+        "method": name,
+        "produced": n_produced,
+        "consumer_fps": [r["frames"] / duration for r in consumer_results],
+        "skipped": [r["skipped"] for r in consumer_results],
+        "latency_ms": {"mean": float(latencies_ms.mean()), "p95": float(np.percentile(latencies_ms, 95)), "max": float(latencies_ms.max())}
+                      if len(latencies_ms) else None,
+    }
+
+def run_bus(frames, args):
+    bus = FrameBus("benchmark", shape=frames[0].shape)
+    results = multiprocessing.Queue()
+    consumers = [multiprocessing.Process(target=bus_consumer, args=(bus.spec(), args.duration + 1.0, results)) for _ in range(args.consumers)]
+    for consumer in consumers:
+        consumer.start()
+    time.sleep(0.5)  # Let the consumers attach
+    n_produced = produce(lambda frame: bus.write(frame, time.perf_counter()), frames, args.fps, args.duration)
+    consumer_results = [results.get() for _ in consumers]
+    for consumer in consumers:
+        consumer.join()
+    bus.close()
+    return summarize("FrameBus", n_produced, consumer_results, args.duration)
+
+def run_queue(frames, args):
+    results = multiprocessing.Queue()
+    frame_queues = [multiprocessing.Queue(maxsize=8) for _ in range(args.consumers)]
+    consumers = [multiprocessing.Process(target=queue_consumer, args=(q, args.duration + 1.0, results)) for q in frame_queues]
+    for consumer in consumers:
+        consumer.start()
+    time.sleep(0.5)
+
+    def write(frame):
+        timestamp = time.perf_counter()
+        for q in frame_queues:
+            try:
+                q.put_nowait((timestamp, frame))
+            except queue.Full:
+                pass  # Consumer is too slow, drop the frame for it
+    n_produced = produce(write, frames, args.fps, args.duration)
+    consumer_results = [results.get() for _ in consumers]
+    for consumer in consumers:
+        consumer.join()
+    return summarize("Queue (pickle)", n_produced, consumer_results, args.duration)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the shared-memory frame bus against a multiprocessing.Queue.")
+    parser.add_argument("--consumers", type=int, default=3, help="Number of consumer processes (preview, writer, tracker)")
+    parser.add_argument("--fps", type=float, default=30.0, help="Frame rate of the producer")
+    parser.add_argument("--duration", type=float, default=5.0, help="Duration per method in seconds")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--json", help="Save the results to this JSON file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, (args.height, args.width, 3), dtype=np.uint8) for _ in range(4)]
+
+    results = {"settings": vars(args), "methods": [run_bus(frames, args), run_queue(frames, args)]}
+    for result in results["methods"]:
+        latency = result["latency_ms"]
+        print(f"{result['method']:<16} produced {result['produced']:5d}  consumer fps {np.round(result['consumer_fps'], 1)}  "
+              f"skipped {result['skipped']}  latency mean {latency['mean']:.2f} p95 {latency['p95']:.2f} max {latency['max']:.2f} ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n[INFO] Results saved to {args.json}")
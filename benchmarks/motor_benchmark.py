@@ -0,0 +1,121 @@
+"""
+Motor Benchmark
+
+Measures the command round-trip rate and the control-loop jitter of the Motor class. By default it runs against the
+simulated EPOS4 (include/EposSimulator.py), so it works without hardware and on Linux; use --hardware to run it
+against the real EPOS4 through the DLL.
+
+Benchmarks:
+- Round trip: calls RunSetVelocity, ReadPositionIs and ReadStatusword back to back and reports the calls per second
+  and the latency percentiles of every call.
+- Control loop: runs a velocity control loop (read position + set velocity) at a fixed rate with absolute deadlines
+  and reports how late every iteration started (jitter) and the number of missed deadlines.
+
+How to run:
+    python -m benchmarks.motor_benchmark [--latency-ms 1.0] [--error-rate 0.0] [--calls 2000] [--rate 200] [--duration 5] [--json results.json]
+"""
+
+import numpy as np
+import argparse
+import json
+import time
+from include.Motor import Motor
+from include.EposSimulator import SimulatedEpos
+
+def percentiles_ms(samples_s):
+    samples_ms = np.asarray(samples_s) * 1000.0
+    return {"mean": float(samples_ms.mean()), "p50": float(np.percentile(samples_ms, 50)),
+            "p95": float(np.percentile(samples_ms, 95)), "p99": float(np.percentile(samples_ms, 99)), "max": float(samples_ms.max())}
+
+def benchmark_round_trip(motor, n_calls):
+    calls = {
+        "RunSetVelocity": lambda i: motor.RunSetVelocity(100 * (i % 10)),
+        "ReadPositionIs": lambda i: motor.ReadPositionIs(),
+        "ReadStatusword": lambda i: motor.ReadStatusword(),
+    }
+    results = {}
+    for name, call in calls.items():
+        latencies = np.empty(n_calls)
+        start = time.perf_counter()
+        for i in range(n_calls):
+            t = time.perf_counter()
+            call(i)
+            latencies[i] = time.perf_counter() - t
+        elapsed = time.perf_counter() - start
+        results[name] = {"calls_per_s": n_calls / elapsed, "latency_ms": percentiles_ms(latencies)}
+    return results
+
+def benchmark_control_loop(motor, rate_hz, duration_s):
+    period = 1.0 / rate_hz
+    n_iterations = int(duration_s * rate_hz)
+    lateness = np.empty(n_iterations)
+    loop_time = np.empty(n_iterations)
+    n_missed = 0
+
+    start = time.perf_counter()
+    for i in range(n_iterations):
+        deadline = start + i * period
+        delay = deadline - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        t = time.perf_counter()
+        lateness[i] = t - deadline
+
+        # Simple control step: read the position and command a velocity (sine sweep)
+        motor.ReadPositionIs()
+        motor.RunSetVelocity(int(1000 * np.sin(2 * np.pi * 0.5 * (t - start))))
+        loop_time[i] = time.perf_counter() - t
+        if time.perf_counter() > deadline + period:
+            n_missed += 1
+
+    return {"rate_hz": rate_hz, "iterations": n_iterations, "missed_deadlines": n_missed,
+            "start_lateness_ms": percentiles_ms(lateness), "loop_time_ms": percentiles_ms(loop_time)}
+
+def print_stats(name, stats):
+    print(f"  {name:<24} mean {stats['mean']:8.3f}  p50 {stats['p50']:8.3f}  p95 {stats['p95']:8.3f}  p99 {stats['p99']:8.3f}  max {stats['max']:8.3f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the motor command round trip and control-loop jitter.")
+    parser.add_argument("--hardware", action="store_true", help="Use the real EPOS4 (DLL) instead of the simulator")
+    parser.add_argument("--latency-ms", type=float, default=1.0, help="Simulated command latency")
+    parser.add_argument("--jitter-ms", type=float, default=0.2, help="Simulated random extra latency (maximum)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Simulated probability that a call fails")
+    parser.add_argument("--calls", type=int, default=2000, help="Number of calls per round-trip benchmark")
+    parser.add_argument("--rate", type=float, default=200.0, help="Control loop rate in Hz")
+    parser.add_argument("--duration", type=float, default=5.0, help="Control loop duration in seconds")
+    parser.add_argument("--json", help="Save the results to this JSON file")
+    args = parser.parse_args()
+
+    backend = None if args.hardware else SimulatedEpos(command_latency_s=args.latency_ms / 1000.0, latency_jitter_s=args.jitter_ms / 1000.0)
+    motor = Motor(1, 0, backend)
+    motor.OpenCommunication()
+    if motor.keyhandle == 0:
+        raise SystemExit("Could not open the motor")
+    motor.EnableMotor()
+    motor.SetVelocityProfile(8000, 8000)
+
+    # Only inject errors after the setup, the benchmark itself should keep running when calls fail
+    if backend is not None:
+        backend.error_rate = args.error_rate
+
+    results = {"backend": "hardware" if args.hardware else "simulated", "settings": vars(args)}
+    results["round_trip"] = benchmark_round_trip(motor, args.calls)
+    results["control_loop"] = benchmark_control_loop(motor, args.rate, args.duration)
+
+    motor.RunSetVelocity(0)
+    motor.DisableMotor()
+    motor.CloseCommunication()
+
+    print("\nCommand round trip:")
+    for name, stats in results["round_trip"].items():
+        print(f"  {name:<24} {stats['calls_per_s']:10.1f} calls/s")
+        print_stats("  latency", stats["latency_ms"])
+    loop = results["control_loop"]
+    print(f"\nControl loop at {loop['rate_hz']:.0f} Hz ({loop['iterations']} iterations, {loop['missed_deadlines']} missed deadlines):")
+    print_stats("start lateness (jitter)", loop["start_lateness_ms"])
+    print_stats("loop time", loop["loop_time_ms"])
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n[INFO] Results saved to {args.json}")
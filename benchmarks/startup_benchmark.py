@@ -0,0 +1,142 @@
+"""
+Startup Benchmark
+
+Measures the cold-start latency of the recorder, from starting Python until the operator sees the window and the
+first preview of every camera. Every measurement runs in a new Python process, so nothing is cached in memory.
+- imports: time to import main.py (the recorder, the post-processing queue and their dependencies), and whether the
+  heavy analysis modules (pandas, matplotlib, h5py) stay unloaded until post-processing starts.
+- cameras: time until every camera has delivered its first frame, with the cameras opened one after another
+  (serial) and with one CameraWorker thread per camera (parallel, as in the recorder).
+- gui: time until the DualCameraApp window is shown and until every camera preview has a frame (needs a display).
+
+The cameras come from the camera configuration (default cameras.json). Video files can be given as the "index" of
+a camera to run the benchmark without cameras.
+
+How to run:
+    python -m benchmarks.startup_benchmark [--repeat 5] [--camera-config cameras.json] [--api recorder|any] [--skip-cameras] [--skip-gui] [--json results.json]
+"""
+
+import subprocess
+import argparse
+import json
+import sys
+import os
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("pandas", "matplotlib", "h5py", "scipy")
+
+IMPORTS_SCRIPT = """
+import time, sys, json
+start = time.perf_counter()
+import main
+print(json.dumps({"import_s": time.perf_counter() - start, "loaded": [m for m in HEAVY_MODULES if m in sys.modules]}))
+"""
+
+CAMERAS_SCRIPT = """
+import time, json
+from include.CameraWorker import CameraWorker, load_camera_config
+if API is None:
+    from include.RecorderClassV3 import cap_api
+else:
+    cap_api = API
+config = load_camera_config(CAMERA_CONFIG)
+if MODE == "serial":
+    start = time.perf_counter()
+    workers = []
+    for camera in config:
+        worker = CameraWorker(camera, cap_api)
+        worker.start_time = time.perf_counter()
+        worker.open()
+        ret, _ = worker.cap.read()
+        workers.append((worker, ret))
+    result = {"first_frames_s": time.perf_counter() - start, "ok": all(ret for _, ret in workers)}
+    for worker, _ in workers:
+        worker.cap.release()
+else:
+    workers = [CameraWorker(camera, cap_api) for camera in config]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    while any(worker.latest()[0] == 0 for worker in workers) and time.perf_counter() - start < TIMEOUT:
+        time.sleep(0.001)
+    result = {"first_frames_s": time.perf_counter() - start, "ok": all(worker.latest()[0] > 0 for worker in workers),
+              "open_s": [worker.open_time for worker in workers]}
+    for worker in workers:
+        worker.stop()
+print(json.dumps(result))
+"""
+
+GUI_SCRIPT = """
+import time, json
+start = time.perf_counter()
+import tkinter as tk
+from include.RecorderClassV3 import DualCameraApp
+root = tk.Tk()
+app = DualCameraApp(root, camera_config_file=CAMERA_CONFIG)
+root.update()
+window_s = time.perf_counter() - start
+while any(sequence == 0 for sequence in app.shown_sequences) and time.perf_counter() - start < TIMEOUT:
+    root.update()
+    time.sleep(0.001)
+preview_s = time.perf_counter() - start
+app.on_closing()
+print(json.dumps({"window_s": window_s, "first_preview_s": preview_s}))
+"""
+
+def run_script(script, **constants):
+    # Runs the script in a new Python process in the repository folder and returns its JSON result
+    header = "".join(f"{name} = {value!r}\n" for name, value in constants.items())
+    process = subprocess.run([sys.executable, "-c", header + script], cwd=REPO_DIR, capture_output=True, text=True)
+    for line in reversed(process.stdout.strip().splitlines()):
+        if line.startswith("{"):
+            return json.loads(line)
+    raise RuntimeError(process.stderr.strip().splitlines()[-1] if process.stderr.strip() else "no result")
+
+def statistics(values):
+    values = np.asarray(values, dtype=np.float64)
+    return {"median_s": float(np.median(values)), "min_s": float(values.min()), "max_s": float(values.max())}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the cold-start latency of the recorder.")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of cold starts per measurement")
+    parser.add_argument("--camera-config", default=os.path.join(REPO_DIR, "cameras.json"), help="Camera configuration to open")
+    parser.add_argument("--api", choices=("recorder", "any"), default="recorder",
+                        help="Capture API: the one of the recorder (cap_api) or cv2.CAP_ANY (e.g. for video files as cameras)")
+    parser.add_argument("--timeout", type=float, default=20.0, help="Maximum time to wait for the first frames (s)")
+    parser.add_argument("--skip-cameras", action="store_true", help="Don't open the cameras")
+    parser.add_argument("--skip-gui", action="store_true", help="Don't start the GUI")
+    parser.add_argument("--json", help="Save the results to this JSON file")
+    args = parser.parse_args()
+    camera_config = os.path.abspath(args.camera_config)
+    api = None if args.api == "recorder" else 0  # cv2.CAP_ANY
+    results = {"settings": vars(args)}
+
+    runs = [run_script(IMPORTS_SCRIPT, HEAVY_MODULES=HEAVY_MODULES) for _ in range(args.repeat)]
+    results["imports"] = {**statistics([run["import_s"] for run in runs]), "heavy_modules_loaded": runs[0]["loaded"]}
+    print(f"import main        median {results['imports']['median_s'] * 1000:7.1f} ms  "
+          f"(heavy modules loaded: {', '.join(runs[0]['loaded']) or 'none'})")
+
+    if not args.skip_cameras:
+        for mode in ("serial", "parallel"):
+            runs = [run_script(CAMERAS_SCRIPT, CAMERA_CONFIG=camera_config, MODE=mode, TIMEOUT=args.timeout, API=api) for _ in range(args.repeat)]
+            if not all(run["ok"] for run in runs):
+                print(f"[WARNING] Not every camera delivered a frame ({mode}), check the camera configuration and --api")
+                continue
+            results[f"cameras_{mode}"] = statistics([run["first_frames_s"] for run in runs])
+            print(f"cameras {mode:<10} median {results[f'cameras_{mode}']['median_s'] * 1000:7.1f} ms  (until every camera has a frame)")
+
+    if not args.skip_gui:
+        try:
+            runs = [run_script(GUI_SCRIPT, CAMERA_CONFIG=camera_config, TIMEOUT=args.timeout) for _ in range(args.repeat)]
+            results["gui"] = {"window": statistics([run["window_s"] for run in runs]),
+                              "first_preview": statistics([run["first_preview_s"] for run in runs])}
+            print(f"gui window         median {results['gui']['window']['median_s'] * 1000:7.1f} ms")
+            print(f"gui first preview  median {results['gui']['first_preview']['median_s'] * 1000:7.1f} ms")
+        except RuntimeError as error:
+            print(f"[WARNING] GUI not measured: {error}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n[INFO] Results saved to {args.json}")
@@ -0,0 +1,304 @@
+"""
+Tracker Benchmark
+
+Ground-truth benchmark of the tracking and the reconstruction: synthetic recordings of a small dark capsule (like the
+UMR) moving along a known 3D path in the box are rendered for camera 1 and 2, with the camera matrices and distortion
+of the calibration file (the same ones the TrajectoryReconstructor uses). The session then goes through the real
+pipeline: VideoTracker.track_and_save per camera (with the box and the first ROI given) and the
+TrajectoryReconstructor, both with the box geometry and with triangulation (the poses of the synthetic cameras).
+
+The scene follows the geometry of TrajectoryGeometry: the coordinate system of camera 1, which looks through the
+bottom of the box (BOX_MM_CAM1 seen from camera 1), and camera 2 looks at the side of the box (BOX_MM_CAM2, its
+image Y is -Z).
+
+Scenes (different speed, noise, blur and lighting, every scene uses the same path):
+- baseline: slow movement, little noise.
+- fast: four times faster, with motion blur (exposure of half a frame).
+- noisy: strong sensor noise.
+- blurred: out of focus (Gaussian blur).
+- lighting: uneven and flickering illumination with less contrast.
+
+Reported per scene:
+- fps of the tracker per camera, and fps per stage (Tracing spans: decode, threshold, contour, encode, ...),
+- RMS 2D error (pixels) per camera against the projected center of the capsule, and the track-loss rate (frames where
+  the object was not found or the error is larger than LOST_PX),
+- RMS 3D error (mm) per reconstruction method against the path (both relative to the first frame, like the
+  trajectory CSV), and the time of the reconstruction.
+
+The results (with the commit of the repository) are saved as JSON, --compare prints the change against the results
+of another run (e.g. of the previous commit). With --grayscale the tracker runs single-channel (VideoTracker with
+grayscale=True, without the tracking video), with --gray-recording the synthetic recordings are saved in grayscale
+(like "grayscale": true in cameras.json, e.g. with --codec Y800).
+
+How to run:
+    python -m benchmarks.tracker_benchmark [--scenes baseline fast ...] [--frames 240] [--codec XVID] [--grayscale] [--gray-recording] [--json results.json] [--compare old.json] [--keep <folder>]
+"""
+
+import cv2
+import numpy as np
+import pandas as pd
+import subprocess
+import argparse
+import tempfile
+import shutil
+import json
+import time
+import csv
+import os
+from include.TrackerClassV3 import VideoTracker
+from include.TrajectoryClassV5 import TrajectoryReconstructor
+from include.TrajectoryGeometry import BOX_MM_CAM1, BOX_MM_CAM2
+from include.CameraCalibration import load_calibration, save_calibration, DEFAULT_CALIBRATION_FILE
+from include import Tracing
+
+FPS = 30.0
+FRAME_SIZE = (1920, 1080)
+CAPSULE_MM = (6.0, 2.5)  # Length and diameter of the capsule
+ROI_PX = 160             # Size of the ROI of the tracker (square)
+LOST_PX = 15.0           # 2D error above which the track counts as lost
+DISTANCE_MM = 140.0      # Distance of both cameras to the box
+
+SCENES = {
+    "baseline": {"speed": 1.0, "noise": 3.0, "blur": 0.0, "exposure": 0.0, "lighting": False},
+    "fast": {"speed": 4.0, "noise": 3.0, "blur": 0.0, "exposure": 0.5, "lighting": False},
+    "noisy": {"speed": 1.0, "noise": 15.0, "blur": 0.0, "exposure": 0.0, "lighting": False},
+    "blurred": {"speed": 1.0, "noise": 3.0, "blur": 4.0, "exposure": 0.0, "lighting": False},
+    "lighting": {"speed": 1.0, "noise": 3.0, "blur": 0.0, "exposure": 0.0, "lighting": True},
+}
+
+def scene_cameras(calibration):
+    # Camera 1 at the origin looking up (+Z) through the bottom of the box, camera 2 at the +Y side looking at -Y
+    # (image X = -X, image Y = -Z). Poses as in the calibration file: x_camera = R x_camera1 + T (mm)
+    box_bottom = DISTANCE_MM
+    R2 = np.array([[-1.0, 0.0, 0.0], [0.0, 0.0, -1.0], [0.0, -1.0, 0.0]])
+    center2 = np.array([0.0, BOX_MM_CAM1[1] / 2 + DISTANCE_MM, box_bottom + BOX_MM_CAM2[1] / 2])
+    poses = {"cam1": (np.eye(3), np.zeros(3)), "cam2": (R2, -R2 @ center2)}
+    return {name: {**calibration["cameras"][name], "R": R, "T": T} for name, (R, T) in poses.items()}
+
+def project(camera, points):
+    rvec, _ = cv2.Rodrigues(camera["R"])
+    pixels, _ = cv2.projectPoints(np.asarray(points, dtype=np.float64).reshape(-1, 1, 3), rvec, camera["T"], camera["camera_matrix"], camera["dist_coeffs"])
+    depth = (np.asarray(points) @ camera["R"].T + camera["T"])[:, 2]
+    return pixels.reshape(-1, 2), depth
+
+def box_rectangles(cameras):
+    # The box as the user selects it: the bottom for camera 1, the near side for camera 2 (X, Y, Width, Height)
+    w1, h1 = BOX_MM_CAM1
+    w2, h2 = BOX_MM_CAM2
+    bottom = DISTANCE_MM
+    corners = {
+        "cam1": [(x, y, bottom) for x in (-w1 / 2, w1 / 2) for y in (-h1 / 2, h1 / 2)],
+        "cam2": [(x, h1 / 2, z) for x in (-w2 / 2, w2 / 2) for z in (bottom, bottom + h2)],
+    }
+    boxes = {}
+    for name, points in corners.items():
+        pixels, _ = project(cameras[name], points)
+        x, y = pixels.min(axis=0)
+        w, h = pixels.max(axis=0) - pixels.min(axis=0)
+        boxes[name] = (int(round(x)), int(round(y)), int(round(w)), int(round(h)))
+    return boxes
+
+def path(t, speed):
+    # Lissajous path through the box (mm, coordinates of camera 1), inside the walls by a margin of 10 mm
+    w = speed * 0.5
+    x = (BOX_MM_CAM1[0] / 2 - 10) * np.sin(w * t)
+    y = (BOX_MM_CAM1[1] / 2 - 10) * np.sin(1.7 * w * t + 0.5)
+    z = DISTANCE_MM + BOX_MM_CAM2[1] / 2 + (BOX_MM_CAM2[1] / 2 - 8) * np.sin(0.6 * w * t + 1.0)
+    return np.column_stack((x, y, z))
+
+def background(size, seed):
+    # Textured container bottom/wall
+    rng = np.random.default_rng(seed)
+    texture = rng.integers(175, 225, (size[1] // 8, size[0] // 8), dtype=np.uint8)
+    return cv2.GaussianBlur(cv2.resize(texture, size, interpolation=cv2.INTER_CUBIC), (0, 0), 2).astype(np.float32)
+
+def render(camera, lit, centers, directions, scene, noise):
+    # Only the region around the capsule is rendered (coverage 0..1, averaged over the exposure for the motion blur)
+    ends = np.concatenate((centers - directions * CAPSULE_MM[0] / 2, centers + directions * CAPSULE_MM[0] / 2))
+    pixels, depth = project(camera, ends)
+    thickness = max(int(round(CAPSULE_MM[1] * camera["camera_matrix"][0, 0] / depth.mean())), 1)
+    margin = thickness + int(3 * scene["blur"]) + 4
+    x0, y0 = np.maximum(np.floor(pixels.min(axis=0)).astype(int) - margin, 0)
+    x1, y1 = np.minimum(np.ceil(pixels.max(axis=0)).astype(int) + margin, (lit.shape[1], lit.shape[0]))
+
+    frame = lit.copy()
+    if x1 > x0 and y1 > y0:
+        coverage = np.zeros((y1 - y0, x1 - x0), dtype=np.float32)
+        n = len(centers)
+        for p1, p2 in zip(pixels[:n] - (x0, y0), pixels[n:] - (x0, y0)):
+            mask = np.zeros(coverage.shape, dtype=np.uint8)
+            cv2.line(mask, tuple(int(round(v * 16)) for v in p1), tuple(int(round(v * 16)) for v in p2), 255, thickness, cv2.LINE_AA, shift=4)
+            coverage += mask.astype(np.float32) / (255.0 * n)
+        patch = frame[y0:y1, x0:x1] * (1.0 - coverage) + 35.0 * coverage
+        if scene["blur"] > 0:
+            patch = cv2.GaussianBlur(patch, (0, 0), scene["blur"])  # The background is smooth, only the capsule changes
+        frame[y0:y1, x0:x1] = patch
+    return np.clip(frame + noise, 0, 255).astype(np.uint8)
+
+def render_session(folder, cameras, scene, n_frames, codec, gray_recording=False, seed=0):
+    t = np.arange(n_frames) / FPS
+    truth = path(t, scene["speed"])
+    velocity = np.gradient(truth, t, axis=0)
+    directions = velocity / np.maximum(np.linalg.norm(velocity, axis=1, keepdims=True), 1e-9)
+
+    # Positions during the exposure of every frame (motion blur)
+    offsets = np.linspace(-scene["exposure"] / 2, scene["exposure"] / 2, 5) / FPS if scene["exposure"] > 0 else np.zeros(1)
+
+    rng = np.random.default_rng(seed)
+    noise_bank = [rng.normal(0.0, scene["noise"], (FRAME_SIZE[1], FRAME_SIZE[0])).astype(np.float32) for _ in range(8)]
+    centers_px = {}
+    for i, (name, camera) in enumerate(cameras.items()):
+        base = background(FRAME_SIZE, seed + i)
+        if scene["lighting"]:
+            yy, xx = np.mgrid[0:FRAME_SIZE[1], 0:FRAME_SIZE[0]].astype(np.float32)
+            base *= 0.75 + 0.35 * (xx / FRAME_SIZE[0]) * (yy / FRAME_SIZE[1])  # Uneven illumination
+        writer = cv2.VideoWriter(os.path.join(folder, f"B_{name}.avi"), cv2.VideoWriter_fourcc(*codec) if codec else 0, FPS, FRAME_SIZE, isColor=not gray_recording)
+        for k in range(n_frames):
+            lit = base * (1.0 + 0.08 * np.sin(2 * np.pi * 2.3 * t[k])) if scene["lighting"] else base  # Flicker
+            exposure = path(t[k] + offsets, scene["speed"])
+            frame = render(camera, lit, exposure, np.repeat(directions[k:k + 1], len(exposure), axis=0), scene, noise_bank[rng.integers(len(noise_bank))])
+            writer.write(frame if gray_recording else cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR))
+        writer.release()
+        centers_px[name] = project(camera, truth)[0]
+
+    with open(os.path.join(folder, "B_timestamps.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Frame"] + [f"Timestamp {name} (s)" for name in cameras])
+        for k in range(n_frames):
+            writer.writerow([k] + [t[k]] * len(cameras))
+    return truth, centers_px
+
+def stage_fps(rows, category):
+    # Frames per second of every per-frame span (count / total time)
+    return {row["name"]: row["count"] / (row["total_ms"] / 1000.0) for row in rows if row["category"] == category and row["total_ms"] > 0 and row["count"] > 1}
+
+def run_scene(name, scene, cameras, calibration_files, n_frames, codec, folder, grayscale=False, gray_recording=False):
+    truth, centers_px = render_session(folder, cameras, scene, n_frames, codec, gray_recording)
+    boxes = box_rectangles(cameras)
+    result = {"scene": name, "settings": scene, "cameras": {}, "reconstruction": {}}
+
+    # Tracking per camera, timed with the Tracing spans of the tracker
+    for cam, centers in centers_px.items():
+        x, y = centers[0]
+        roi = (int(x) - ROI_PX // 2, int(y) - ROI_PX // 2, ROI_PX, ROI_PX)
+        Tracing.enable()
+        tracker = VideoTracker(os.path.join(folder, f"B_{cam}.avi"), grayscale=grayscale)
+        tracker.display = False
+        start = time.perf_counter()
+        tracker.track_and_save(roi=roi, box=boxes[cam])
+        elapsed = time.perf_counter() - start
+        rows = Tracing.summary()
+        Tracing.disable()
+
+        locations = pd.read_csv(os.path.join(folder, f"B_{cam}_locations.csv"))
+        errors = np.linalg.norm(locations[["X", "Y"]].to_numpy(np.float64) - centers[:len(locations)], axis=1)
+        found = locations["Found"].to_numpy() > 0
+        lost = ~found | (errors > LOST_PX)
+        result["cameras"][cam] = {
+            "fps": len(locations) / elapsed,
+            "stage_fps": stage_fps(rows, "tracker"),
+            "rms_2d_px": float(np.sqrt(np.mean(errors[found] ** 2))) if found.any() else None,
+            "max_2d_px": float(errors[found].max()) if found.any() else None,
+            "track_loss_rate": float(lost.mean()),
+        }
+
+    # Reconstruction with both methods, against the path relative to the first frame
+    truth_relative = truth - truth[0]
+    for method, calibration_file in calibration_files.items():
+        start = time.perf_counter()
+        reconstructor = TrajectoryReconstructor(*[os.path.join(folder, f"B_{cam}_locations.csv") for cam in cameras], calibration_file=calibration_file)
+        reconstructor.save_hdf5 = False
+        trajectory = reconstructor.reconstruct()[["X", "Y", "Z"]].to_numpy()
+        elapsed = time.perf_counter() - start
+        errors = np.linalg.norm(trajectory - truth_relative[:len(trajectory)], axis=1)
+        result["reconstruction"][method] = {
+            "rms_3d_mm": float(np.sqrt(np.nanmean(errors ** 2))),
+            "max_3d_mm": float(np.nanmax(errors)),
+            "rms_3d_mm_per_axis": np.sqrt(np.nanmean((trajectory - truth_relative[:len(trajectory)]) ** 2, axis=0)).tolist(),
+            "seconds": elapsed,
+        }
+    return result
+
+def commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_results(results):
+    print(f"\n{'Scene':<10}{'Camera':<8}{'fps':>8}{'RMS 2D px':>11}{'max px':>9}{'lost':>8}   stages (fps)")
+    for result in results:
+        for cam, values in result["cameras"].items():
+            stages = ", ".join(f"{stage} {fps:.0f}" for stage, fps in values["stage_fps"].items())
+            rms = f"{values['rms_2d_px']:.2f}" if values["rms_2d_px"] is not None else "-"
+            worst = f"{values['max_2d_px']:.1f}" if values["max_2d_px"] is not None else "-"
+            print(f"{result['scene']:<10}{cam:<8}{values['fps']:>8.1f}{rms:>11}{worst:>9}{values['track_loss_rate'] * 100:>7.1f}%   {stages}")
+    print(f"\n{'Scene':<10}{'Method':<15}{'RMS 3D mm':>10}{'max mm':>9}{'time s':>8}")
+    for result in results:
+        for method, values in result["reconstruction"].items():
+            print(f"{result['scene']:<10}{method:<15}{values['rms_3d_mm']:>10.3f}{values['max_3d_mm']:>9.3f}{values['seconds']:>8.2f}")
+
+def print_comparison(results, baseline):
+    # Change of the main numbers against an older run (positive = higher)
+    old = {result["scene"]: result for result in baseline["scenes"]}
+    print(f"\nCompared to {baseline.get('commit') or 'baseline'}:")
+    for result in results:
+        previous = old.get(result["scene"])
+        if previous is None:
+            continue
+        for cam, values in result["cameras"].items():
+            before = previous["cameras"].get(cam)
+            if before is None:
+                continue
+            changes = [f"fps {100 * (values['fps'] / before['fps'] - 1):+.1f}%",
+                       f"lost {100 * (values['track_loss_rate'] - before['track_loss_rate']):+.1f} pt"]
+            if values["rms_2d_px"] is not None and before["rms_2d_px"] is not None:
+                changes.append(f"RMS 2D {values['rms_2d_px'] - before['rms_2d_px']:+.3f} px")
+            print(f"  {result['scene']:<10}{cam:<8}" + ", ".join(changes))
+        for method, values in result["reconstruction"].items():
+            before = previous["reconstruction"].get(method)
+            if before is not None:
+                print(f"  {result['scene']:<10}{method:<15}RMS 3D {values['rms_3d_mm'] - before['rms_3d_mm']:+.3f} mm")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the accuracy and speed of the tracker and the reconstruction on synthetic recordings.")
+    parser.add_argument("--scenes", nargs="+", choices=list(SCENES), default=list(SCENES), help="Scenes to run")
+    parser.add_argument("--frames", type=int, default=240, help="Number of frames per scene")
+    parser.add_argument("--codec", default="XVID", help="FourCC of the synthetic recordings (as in cameras.json, '' = uncompressed)")
+    parser.add_argument("--grayscale", action="store_true", help="Track single-channel frames (without the tracking video)")
+    parser.add_argument("--gray-recording", action="store_true", help="Save the synthetic recordings in grayscale")
+    parser.add_argument("--calibration", default=DEFAULT_CALIBRATION_FILE, help="Calibration file with the camera matrices of cam1 and cam2")
+    parser.add_argument("--json", help="Save the results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--keep", help="Keep the synthetic sessions in this folder (default: temporary folder)")
+    args = parser.parse_args()
+
+    cameras = scene_cameras(load_calibration(args.calibration))
+    folder = args.keep or tempfile.mkdtemp(prefix="tracker_benchmark_")
+    os.makedirs(folder, exist_ok=True)
+    try:
+        # The box geometry only uses the camera matrices, the triangulation also the poses of the synthetic cameras
+        calibration_files = {"box geometry": os.path.join(folder, "calibration_intrinsics.json"),
+                             "triangulation": os.path.join(folder, "calibration_poses.json")}
+        save_calibration(calibration_files["box geometry"], {name: {k: v for k, v in camera.items() if k not in ("R", "T")} for name, camera in cameras.items()})
+        save_calibration(calibration_files["triangulation"], cameras)
+
+        results = []
+        for name in args.scenes:
+            print(f"[INFO] Scene {name}")
+            scene_folder = os.path.join(folder, name)
+            os.makedirs(scene_folder, exist_ok=True)
+            results.append(run_scene(name, SCENES[name], cameras, calibration_files, args.frames, args.codec or None, scene_folder,
+                                     args.grayscale, args.gray_recording))
+    finally:
+        if not args.keep:
+            shutil.rmtree(folder, ignore_errors=True)
+
+    print_results(results)
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(results, json.load(f))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"commit": commit(), "settings": vars(args), "scenes": results}, f, indent=2)
+        print(f"\n[INFO] Results saved to {args.json}")
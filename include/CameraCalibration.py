@@ -0,0 +1,249 @@
+"""
+CameraCalibrator Class
+
+This class replaces the MATLAB calibration script (cameraCalibration/mainCameraCalibration.m). It detects the
+checkerboard corners in a folder with calibration images, solves the intrinsics of each camera (and optionally the
+stereo extrinsics between the two cameras) and writes everything to one calibration file. The recorder and the
+trajectory generator both load this file, so the numbers no longer have to be copied by hand.
+
+Main Workflow:
+- The corners are detected with cv2.findChessboardCorners and refined to sub-pixel accuracy with cv2.cornerSubPix.
+  The images are processed in parallel over a process pool.
+- The detected corners are cached per image by the hash of its content (corner_cache.json in the image folder),
+  so adding images to a folder only processes the new ones.
+- The intrinsics are solved with cv2.calibrateCamera. Like the MATLAB defaults, only two radial distortion
+  coefficients are estimated (no tangential distortion and no k3).
+- If a folder pair with simultaneous images of both cameras is given, the stereo extrinsics (R, T) are solved
+  with cv2.stereoCalibrate, using the intrinsics found before. Images are paired by file name.
+- For more than two cameras, the pose (R, T) of every other camera relative to camera 1 is solved the same way
+  (--extrinsics) and saved with that camera. The TrajectoryReconstructor triangulates over all cameras when every
+  camera has a pose. The pose maps a point from camera 1 to the camera: x_cam = R @ x_cam1 + T (T in mm).
+- The result is saved as JSON (default: cameraCalibration/calibration.json).
+
+Methods:
+- __init__(pattern_size, square_size_mm, workers): Initializes the calibrator with the inner corner count and the square size.
+- detect_folder(folder): Returns the detected corners of every image in the folder, using (and updating) the corner cache.
+- calibrate_camera(folder): Solves the camera matrix and distortion coefficients from the images in a folder.
+- stereo_calibrate(folder_cam1, folder_cam2, calibration_cam1, calibration_cam2): Solves the rotation and translation between both cameras.
+
+Functions:
+- load_calibration(path): Loads a calibration file and returns the matrices as numpy arrays. Camera 1 gets the identity
+  pose if another camera has a pose, camera 2 gets the stereo extrinsics if it has no pose of its own.
+- save_calibration(path, cameras, stereo): Saves the calibration of the cameras (with their pose, if any) and the stereo extrinsics to JSON.
+
+How to run:
+    python -m include.CameraCalibration --cam1 cameraCalibration/Cam2Bottom [--cam2 <folder>] [--stereo <folder_cam1> <folder_cam2>]
+        [--camera cam3 <folder>] [--extrinsics cam3 <folder_cam1> <folder_cam3>]
+"""
+
+import cv2
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import hashlib
+import json
+import os
+
+# Calibration file that is loaded by the recorder and the trajectory generator
+DEFAULT_CALIBRATION_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cameraCalibration", "calibration.json")
+
+CORNER_CACHE_NAME = "corner_cache.json"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff")
+
+def file_hash(path):
+    # Hash of the file content, so a renamed image is still found in the cache and a changed image is not
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def find_corners(image_path, pattern_size):
+    # Runs in a worker process --> only returns plain python types
+    gray = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        return None, None
+    image_size = [gray.shape[1], gray.shape[0]]
+    flags = cv2.CALIB_CB_ADAPTIVE_THRESH + cv2.CALIB_CB_NORMALIZE_IMAGE
+    found, corners = cv2.findChessboardCorners(gray, tuple(pattern_size), flags)
+    if not found:
+        return image_size, None
+
+    # Refine the corners to sub-pixel accuracy
+    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001)
+    corners = cv2.cornerSubPix(gray, corners, (11, 11), (-1, -1), criteria)
+    return image_size, corners.reshape(-1, 2).tolist()
+
+def load_calibration(path=DEFAULT_CALIBRATION_FILE):
+    with open(path) as f:
+        data = json.load(f)
+
+    calibration = {"cameras": {}, "stereo": None}
+    for name, camera in data["cameras"].items():
+        calibration["cameras"][name] = {
+            "camera_matrix": np.array(camera["camera_matrix"], dtype=np.float64),
+            "dist_coeffs": np.array(camera["dist_coeffs"], dtype=np.float64),
+            "image_size": tuple(camera["image_size"]),
+        }
+        if camera.get("R") is not None:
+            calibration["cameras"][name]["R"] = np.array(camera["R"], dtype=np.float64)
+            calibration["cameras"][name]["T"] = np.array(camera["T"], dtype=np.float64).reshape(3)
+    if data.get("stereo"):
+        calibration["stereo"] = {
+            "R": np.array(data["stereo"]["R"], dtype=np.float64),
+            "T": np.array(data["stereo"]["T"], dtype=np.float64).reshape(3),
+        }
+
+    # The poses are relative to camera 1, the stereo extrinsics are the pose of camera 2
+    cameras = calibration["cameras"]
+    if calibration["stereo"] is not None and "cam2" in cameras and "R" not in cameras["cam2"]:
+        cameras["cam2"]["R"] = calibration["stereo"]["R"]
+        cameras["cam2"]["T"] = calibration["stereo"]["T"]
+    if "cam1" in cameras and "R" not in cameras["cam1"] and any("R" in camera for camera in cameras.values()):
+        cameras["cam1"]["R"] = np.eye(3)
+        cameras["cam1"]["T"] = np.zeros(3)
+    return calibration
+
+def save_calibration(path, cameras, stereo=None):
+    data = {"cameras": {}, "stereo": None}
+    for name, camera in cameras.items():
+        data["cameras"][name] = {
+            "camera_matrix": np.asarray(camera["camera_matrix"]).tolist(),
+            "dist_coeffs": np.asarray(camera["dist_coeffs"]).ravel().tolist(),
+            "image_size": list(camera["image_size"]),
+            "rms": camera.get("rms"),
+            "n_images": camera.get("n_images"),
+        }
+        if camera.get("R") is not None:
+            data["cameras"][name]["R"] = np.asarray(camera["R"]).tolist()
+            data["cameras"][name]["T"] = np.asarray(camera["T"]).ravel().tolist()  # In millimeters, relative to camera 1
+    if stereo is not None:
+        data["stereo"] = {
+            "R": np.asarray(stereo["R"]).tolist(),
+            "T": np.asarray(stereo["T"]).ravel().tolist(),  # In millimeters (the unit of the square size)
+            "rms": stereo.get("rms"),
+        }
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+    print(f"[INFO] Calibration saved to {path}")
+
+class CameraCalibrator:
+    def __init__(self, pattern_size=(9, 6), square_size_mm=9.2, workers=None):
+        self.pattern_size = tuple(pattern_size)  # Number of INNER corners (columns, rows)
+        self.square_size_mm = square_size_mm
+        self.workers = workers  # None = one worker per CPU core
+
+        # The corner positions of the board in its own coordinate system (Z = 0)
+        self.object_points = np.zeros((self.pattern_size[0] * self.pattern_size[1], 3), np.float32)
+        self.object_points[:, :2] = np.mgrid[0:self.pattern_size[0], 0:self.pattern_size[1]].T.reshape(-1, 2) * self.square_size_mm
+
+    def detect_folder(self, folder):
+        """
+        Returns {file name: (image_size, corners or None)} for every image in the folder.
+        Only the images that are not in the corner cache yet are processed.
+        """
+        image_names = sorted(f for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXTENSIONS))
+        cache_file = os.path.join(folder, CORNER_CACHE_NAME)
+        cache = {}
+        if os.path.exists(cache_file):
+            with open(cache_file) as f:
+                cache = json.load(f)
+
+        # The pattern size is part of the key, detecting with another board size gives other corners
+        pattern_key = f"{self.pattern_size[0]}x{self.pattern_size[1]}"
+        keys = {name: f"{file_hash(os.path.join(folder, name))}_{pattern_key}" for name in image_names}
+        new_names = [name for name in image_names if keys[name] not in cache]
+        print(f"[INFO] {len(image_names)} images in {folder}, {len(new_names)} not in the corner cache")
+
+        if new_names:
+            paths = [os.path.join(folder, name) for name in new_names]
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                results = pool.map(find_corners, paths, [self.pattern_size] * len(paths))
+                for name, (image_size, corners) in zip(new_names, results):
+                    if image_size is None:
+                        print(f"[WARNING] Could not read image: {name}")
+                        continue
+                    cache[keys[name]] = {"image_size": image_size, "corners": corners}
+                    if corners is None:
+                        print(f"[WARNING] No checkerboard found in: {name}")
+
+            with open(cache_file, "w") as f:
+                json.dump(cache, f)
+
+        detections = {}
+        for name in image_names:
+            entry = cache.get(keys[name])
+            if entry is None:
+                continue
+            corners = None if entry["corners"] is None else np.array(entry["corners"], dtype=np.float32).reshape(-1, 1, 2)
+            detections[name] = (tuple(entry["image_size"]), corners)
+        return detections
+
+    def calibrate_camera(self, folder):
+        detections = self.detect_folder(folder)
+        image_points = [corners for _, corners in detections.values() if corners is not None]
+        if len(image_points) < 3:
+            raise RuntimeError(f"Not enough images with a detected checkerboard in {folder} ({len(image_points)})")
+        image_size = next(iter(detections.values()))[0]
+
+        # Same model as the MATLAB defaults: two radial coefficients, no tangential distortion
+        flags = cv2.CALIB_ZERO_TANGENT_DIST + cv2.CALIB_FIX_K3
+        rms, camera_matrix, dist_coeffs, _, _ = cv2.calibrateCamera(
+            [self.object_points] * len(image_points), image_points, image_size, None, None, flags=flags)
+        print(f"[INFO] Calibrated {folder} with {len(image_points)} images, reprojection error (RMS): {rms:.3f} px")
+        return {"camera_matrix": camera_matrix, "dist_coeffs": dist_coeffs.ravel(), "image_size": image_size,
+                "rms": rms, "n_images": len(image_points)}
+
+    def stereo_calibrate(self, folder_cam1, folder_cam2, calibration_cam1, calibration_cam2):
+        detections_cam1 = self.detect_folder(folder_cam1)
+        detections_cam2 = self.detect_folder(folder_cam2)
+
+        # Only use the image pairs (same file name) where both cameras see the board
+        image_points_cam1, image_points_cam2 = [], []
+        for name in sorted(set(detections_cam1) & set(detections_cam2)):
+            if detections_cam1[name][1] is not None and detections_cam2[name][1] is not None:
+                image_points_cam1.append(detections_cam1[name][1])
+                image_points_cam2.append(detections_cam2[name][1])
+        if len(image_points_cam1) < 3:
+            raise RuntimeError(f"Not enough image pairs with a detected checkerboard ({len(image_points_cam1)})")
+
+        criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 100, 1e-6)
+        rms, _, _, _, _, R, T, _, _ = cv2.stereoCalibrate(
+            [self.object_points] * len(image_points_cam1), image_points_cam1, image_points_cam2,
+            calibration_cam1["camera_matrix"], calibration_cam1["dist_coeffs"],
+            calibration_cam2["camera_matrix"], calibration_cam2["dist_coeffs"],
+            tuple(calibration_cam1["image_size"]), criteria=criteria, flags=cv2.CALIB_FIX_INTRINSIC)
+        print(f"[INFO] Stereo calibrated with {len(image_points_cam1)} image pairs, reprojection error (RMS): {rms:.3f} px")
+        return {"R": R, "T": T.ravel(), "rms": rms}
+
+# Used when this class is run seperately
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calibrate the cameras from folders with checkerboard images.")
+    parser.add_argument("--cam1", required=True, help="Folder with the calibration images of camera 1")
+    parser.add_argument("--cam2", help="Folder with the calibration images of camera 2 (default: same intrinsics as camera 1)")
+    parser.add_argument("--stereo", nargs=2, metavar=("FOLDER_CAM1", "FOLDER_CAM2"), help="Folders with simultaneous image pairs for the stereo extrinsics")
+    parser.add_argument("--camera", nargs=2, action="append", default=[], metavar=("NAME", "FOLDER"), help="Folder with the calibration images of another camera (e.g. cam3)")
+    parser.add_argument("--extrinsics", nargs=3, action="append", default=[], metavar=("NAME", "FOLDER_CAM1", "FOLDER_CAM"),
+                        help="Folders with simultaneous image pairs of camera 1 and another camera, for the pose of that camera")
+    parser.add_argument("--pattern", nargs=2, type=int, default=[9, 6], help="Number of inner corners (columns rows)")
+    parser.add_argument("--square", type=float, default=9.2, help="Size of a checkerboard square in mm")
+    parser.add_argument("--output", default=DEFAULT_CALIBRATION_FILE, help="Calibration file to write")
+    args = parser.parse_args()
+
+    calibrator = CameraCalibrator(args.pattern, args.square)
+    cameras = {"cam1": calibrator.calibrate_camera(args.cam1)}
+    if args.cam2:
+        cameras["cam2"] = calibrator.calibrate_camera(args.cam2)
+    else:
+        print("[WARNING] No images for camera 2 given, camera 2 gets the intrinsics of camera 1")
+        cameras["cam2"] = dict(cameras["cam1"])
+    for name, folder in args.camera:
+        cameras[name] = calibrator.calibrate_camera(folder)
+
+    stereo = None
+    if args.stereo:
+        stereo = calibrator.stereo_calibrate(args.stereo[0], args.stereo[1], cameras["cam1"], cameras["cam2"])
+    for name, folder_cam1, folder_cam in args.extrinsics:
+        pose = calibrator.stereo_calibrate(folder_cam1, folder_cam, cameras["cam1"], cameras[name])
+        cameras[name]["R"], cameras[name]["T"] = pose["R"], pose["T"]
+    save_calibration(args.output, cameras, stereo)
@@ -0,0 +1,232 @@
+"""
+CameraWorker Class
+
+This class runs the capture (and, while recording, the encoding) of one camera on its own thread. The recorder has
+one worker per camera in the camera configuration, so the cameras no longer wait for each other in the GUI loop and
+the decoding and encoding of several cameras run in parallel (OpenCV releases the GIL in cap.read and writer.write).
+
+Every frame gets its own capture timestamp (time.perf_counter right after the read). While recording, the frame is
+written to the video of this camera and its timestamp (relative to the start of the recording) is kept, so the
+recorder saves one timestamp column per camera.
+
+The camera is opened and configured on the capture thread (open), so the GUI shows up straight away and the
+cameras are opened in parallel instead of one after another. The GUI reads the newest frame with latest(); it is
+never blocked by the capture.
+
+With a crop (X, Y, Width, Height in full-frame pixels, see set_crop), only that region is encoded. The preview, the
+frame bus and the frame listeners still get the full frames. The recorder saves the crop next to the video
+(<filename>_<camera>_crop.csv), so the tracker can convert its positions back to full-frame pixels.
+
+With "grayscale": true the recorded frames are converted to grayscale (into a reused buffer) and encoded
+single-channel (e.g. with the XVID or the raw Y800 codec). The tracker (VideoTracker with grayscale=True) reads
+Y800 and FFV1 gray recordings without any color conversion. The preview and the frame listeners still get the color frames.
+
+The cameras are defined in the camera configuration (cameras.json, see load_camera_config), one entry per camera:
+    {"name": "cam1", "index": 1, "width": 1920, "height": 1080, "fps": 30, "fourcc": "MJPG", "focus": 58, "crop": null, "codec": "XVID", "grayscale": false}
+Only name and index are required, the other settings have the defaults in CAMERA_DEFAULTS.
+
+Methods:
+- __init__(config, api): Initializes the worker with the settings of its configuration (the camera is not opened yet).
+- start(): Starts the capture thread, which opens the camera first.
+- open(): Opens the camera and sets the resolution, framerate and compression, and turns off the autofocus (on the capture thread).
+- latest(): Returns (sequence number, frame, capture time) of the newest frame.
+- set_focus(value): Sets the focus of the camera (applied by the capture thread before the next frame).
+- set_crop(crop, padding): Sets the region that is recorded (None = full frame), padded and aligned to CROP_ALIGNMENT.
+- open_writer(path): Opens and checks the video writer of a recording (raises RuntimeError if the codec is not available).
+- start_recording(path, start_time, writer): Starts writing the frames to a video file (with a writer of open_writer, or a new one).
+- stop_recording(): Stops writing and returns the timestamps of the written frames (relative to start_time).
+- stop(): Stops the capture thread and releases the camera.
+
+Functions:
+- load_camera_config(path): Loads the camera configuration and fills in the defaults.
+"""
+
+import cv2
+import numpy as np
+import threading
+import time
+import json
+import os
+from include import Tracing
+
+# Camera configuration that is loaded by the recorder
+DEFAULT_CAMERA_CONFIG_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cameras.json")
+
+CAMERA_DEFAULTS = {
+    "width": 1920,
+    "height": 1080,
+    "fps": 30,
+    "fourcc": "MJPG",  # Camera compression technique --> If turned off the FPS will be really low (around 5 fps)
+    "focus": None,     # Manual focus value (autofocus is turned off), None = leave as it is
+    "crop": None,      # Recorded region [X, Y, Width, Height], None = full frame
+    "codec": "XVID",   # FourCC of the recorded video, None = uncompressed (compare with benchmarks/codec_benchmark.py)
+    "grayscale": False,  # Record single-channel (8-bit gray) frames
+}
+
+# The width and height of a crop are rounded up to a multiple of this (most encoders need a multiple of 2, some of 8)
+CROP_ALIGNMENT = 8
+
+def load_camera_config(path=DEFAULT_CAMERA_CONFIG_FILE):
+    with open(path) as f:
+        cameras = json.load(f)["cameras"]
+    return [{**CAMERA_DEFAULTS, **camera} for camera in cameras]
+
+class CameraWorker:
+    def __init__(self, config, api=cv2.CAP_ANY):
+        self.config = config
+        self.name = config["name"]
+        self.api = api
+        self.cap = None  # Opened by the capture thread (open), so several cameras open in parallel
+        self.opened = threading.Event()
+        self.start_time = None
+        self.open_time = None         # Seconds from start() until the camera was opened and configured
+        self.first_frame_time = None  # Seconds from start() until the first frame
+        self.pending_focus = config["focus"]  # Applied by the capture thread, so cap.set never runs during cap.read
+        self.focus_lock = threading.Lock()    # set_focus runs on the GUI thread
+
+        self.crop = None
+        if config["crop"] is not None:
+            self.set_crop(config["crop"])
+
+        self.frame_bus = None  # Optional FrameBus, the frames are then captured into its slots
+        self.lock = threading.Lock()         # For the newest frame
+        self.writer_lock = threading.Lock()  # For the writer and the timestamps
+        self.latest_frame = (0, None, None)
+        self.running = False
+        self.thread = None
+
+        # Recording
+        self.writer = None
+        self.writer_crop = None
+        self.gray_frame = None  # Reused buffer of the grayscale conversion
+        self.record_start_time = None
+        self.timestamps = []
+
+    def open(self):
+        # Opening and configuring a DirectShow camera takes seconds, this runs on the capture thread
+        self.cap = cv2.VideoCapture(self.config["index"], self.api)
+
+        # Camera resolution, framerate and compression
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.config["width"])
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.config["height"])
+        self.cap.set(cv2.CAP_PROP_FPS, self.config["fps"])
+        self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*self.config["fourcc"]))
+
+        #Turns off the autofocus
+        self.cap.set(cv2.CAP_PROP_AUTOFOCUS, 0)
+        self.open_time = time.perf_counter() - self.start_time
+        if not self.cap.isOpened():
+            print(f"[WARNING] Camera {self.name} (index {self.config['index']}) could not be opened")
+        self.opened.set()
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name=f"CameraWorker-{self.name}", daemon=True)
+        self.thread.start()
+
+    def latest(self):
+        with self.lock:
+            return self.latest_frame
+
+    def set_focus(self, value):
+        with self.focus_lock:
+            self.pending_focus = float(value)
+
+    def set_crop(self, crop, padding=0):
+        if crop is None:
+            self.crop = None
+            return None
+
+        # Pad the region, round the size up to the alignment and keep it inside the frame
+        x, y, w, h = [int(v) for v in crop]
+        x, y, w, h = x - padding, y - padding, w + 2 * padding, h + 2 * padding
+        w = min(-(-w // CROP_ALIGNMENT) * CROP_ALIGNMENT, self.config["width"])
+        h = min(-(-h // CROP_ALIGNMENT) * CROP_ALIGNMENT, self.config["height"])
+        x = min(max(x, 0), self.config["width"] - w)
+        y = min(max(y, 0), self.config["height"] - h)
+        self.crop = (x, y, w, h)
+        return self.crop
+
+    def open_writer(self, path):
+        size = (self.crop[2], self.crop[3]) if self.crop is not None else (self.config["width"], self.config["height"])
+        codec = self.config["codec"]
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec) if codec else 0, self.config["fps"], size, isColor=not self.config["grayscale"])
+        if not writer.isOpened():
+            raise RuntimeError(f"Cannot record {self.name} with codec {codec!r}, it is not available in this OpenCV build")
+        return writer
+
+    def start_recording(self, path, start_time, writer=None):
+        # The recorder opens the writers of all cameras first, so a camera that can't record doesn't leave the others recording
+        if writer is None:
+            writer = self.open_writer(path)
+        with self.writer_lock:
+            self.timestamps = []
+            self.record_start_time = start_time
+            self.writer = writer
+            self.writer_crop = self.crop  # The crop can't change during a recording
+
+    def stop_recording(self):
+        with self.writer_lock:
+            writer, self.writer = self.writer, None
+            timestamps, self.timestamps = self.timestamps, []
+        if writer is not None:
+            # Adjust the FPS value of the video writer after recording (the timestamps are relative to the start of the
+            # recording, so the duration is measured from the first frame)
+            duration = timestamps[-1] - timestamps[0] if len(timestamps) > 1 else 0.0
+            writer.set(cv2.CAP_PROP_FPS, (len(timestamps) - 1) / duration if duration > 0 else self.config["fps"])
+            writer.release()
+        return timestamps
+
+    def run(self):
+        with Tracing.span("open camera", "recorder", camera=self.name):
+            self.open()
+        sequence = 0
+        while self.running:
+            # Take the pending focus and clear it in one step, so a value set in between isn't lost
+            with self.focus_lock:
+                focus, self.pending_focus = self.pending_focus, None
+            if focus is not None:
+                self.cap.set(cv2.CAP_PROP_FOCUS, float(focus))
+
+            with Tracing.span("capture", "recorder", camera=self.name):
+                if self.frame_bus is not None:
+                    ret, frame = self.frame_bus.capture(self.cap)
+                else:
+                    ret, frame = self.cap.read()
+            capture_time = time.perf_counter()
+            if not ret:
+                time.sleep(0.01)  # Camera not ready (or disconnected), don't spin
+                continue
+
+            # The writer is only changed under the writer lock, so a frame is never written to a released writer
+            with self.writer_lock:
+                if self.writer is not None:
+                    with Tracing.span("encode", "recorder", camera=self.name):
+                        recorded = frame
+                        if self.writer_crop is not None:
+                            x, y, w, h = self.writer_crop
+                            recorded = frame[y:y+h, x:x+w]
+                        if self.config["grayscale"]:
+                            # cvtColor reads the crop in place, the writer gets one contiguous gray frame
+                            self.gray_frame = cv2.cvtColor(recorded, cv2.COLOR_BGR2GRAY, dst=self.gray_frame)
+                            recorded = self.gray_frame
+                        elif self.writer_crop is not None:
+                            recorded = np.ascontiguousarray(recorded)
+                        self.writer.write(recorded)
+                    self.timestamps.append(capture_time - self.record_start_time)
+
+            sequence += 1
+            if sequence == 1:
+                self.first_frame_time = capture_time - self.start_time
+            with self.lock:
+                self.latest_frame = (sequence, frame, capture_time)
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.stop_recording()
+        if self.cap is not None:
+            self.cap.release()
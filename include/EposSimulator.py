@@ -0,0 +1,260 @@
+"""
+SimulatedEpos Class
+
+Pure-python stand-in for the EPOS command library (EposCmd64.dll), so the Motor class and MotorVelocityInput can be
+imported, tested and benchmarked without the hardware (and on Linux). It implements the VCS_* calls that are used
+by the Motor class, with the same arguments (including the ctypes byref() output arguments) and return values
+(1 = success, 0 = failed).
+
+Model:
+- The motor velocity (rpm) follows the commanded velocity with a first-order lag (time constant tau_s), the
+  position (encoder increments) is the integral of the velocity. The state is updated lazily on every call, based
+  on the elapsed time (time.perf_counter).
+- In the position modes the velocity command comes from a proportional position controller, limited to the
+  profile velocity.
+- The statusword (0x6041) reports operation enabled, target reached (bit 10) and setpoint acknowledge (bit 12).
+  Bit 12 is set for ack_delay_s after a new position setpoint.
+- Every call takes command_latency_s (+ random jitter up to latency_jitter_s), like a USB round trip.
+- With error_rate > 0, calls fail at random (return 0 and set the error code) to test the error handling.
+
+Usage:
+    motor = Motor(1, 0, epos=SimulatedEpos(command_latency_s=0.001))
+
+Methods:
+- __init__(tau_s, counts_per_turn, command_latency_s, latency_jitter_s, error_rate, ack_delay_s, seed): Initializes the simulated device.
+- VCS_*(...): The simulated command library calls.
+"""
+
+import numpy as np
+import threading
+import time
+
+SIMULATED_ERROR_CODE = 0x10000003  # Returned in pErrorCode when an error is injected
+
+# Statusword bits
+STATUS_OPERATION_ENABLED = 0x0037
+STATUS_SWITCH_ON_DISABLED = 0x0040
+STATUS_TARGET_REACHED = 0x0400
+STATUS_SETPOINT_ACK = 0x1000
+
+# Operation modes (same values as MotorMode in Motor.py)
+PROFILE_POSITION = 1
+POSITION = -1
+
+def set_ref(ref, value):
+    # Writes to a ctypes byref() argument (or a ctypes object passed directly)
+    getattr(ref, "_obj", ref).value = value
+
+class SimulatedNode:
+    def __init__(self):
+        self.enabled = False
+        self.mode = 0
+        self.velocity = 0.0            # Actual velocity [rpm]
+        self.position = 0.0            # Actual position [inc]
+        self.velocity_command = 0.0    # Commanded velocity [rpm] (velocity modes)
+        self.position_target = None    # Commanded position [inc] (position modes)
+        self.profile_velocity = 1000.0 # [rpm]
+        self.ack_until = 0.0           # perf_counter time until which the setpoint acknowledge bit is set
+        self.last_update = time.perf_counter()
+
+class SimulatedEpos:
+    def __init__(self, tau_s=0.05, counts_per_turn=2000, command_latency_s=0.0, latency_jitter_s=0.0, error_rate=0.0, ack_delay_s=0.002, seed=None):
+        self.tau_s = tau_s
+        self.counts_per_turn = counts_per_turn
+        self.command_latency_s = command_latency_s
+        self.latency_jitter_s = latency_jitter_s
+        self.error_rate = error_rate
+        self.ack_delay_s = ack_delay_s
+        self.rng = np.random.default_rng(seed)
+        self.lock = threading.Lock()
+        self.nodes = {}
+        self.next_keyhandle = 1
+        self.open_keyhandles = set()
+        self.n_calls = 0
+
+    # === Simulation helpers ===
+    def node(self, NodeID):
+        if NodeID not in self.nodes:
+            self.nodes[NodeID] = SimulatedNode()
+        return self.nodes[NodeID]
+
+    def call(self, keyhandle, pErrorCode):
+        # Common part of every call: latency, error injection and keyhandle check. Returns True if the call may proceed
+        delay = self.command_latency_s + (self.rng.uniform(0, self.latency_jitter_s) if self.latency_jitter_s else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+        self.n_calls += 1
+        if keyhandle not in self.open_keyhandles or (self.error_rate and self.rng.random() < self.error_rate):
+            set_ref(pErrorCode, SIMULATED_ERROR_CODE)
+            return False
+        set_ref(pErrorCode, 0)
+        return True
+
+    def update(self, node):
+        # Advance the model to the current time in small steps (stable for the position controller)
+        now = time.perf_counter()
+        elapsed = now - node.last_update
+        node.last_update = now
+        if elapsed <= 0:
+            return
+        n_steps = int(min(max(np.ceil(elapsed / 0.001), 1), 1000))
+        dt = elapsed / n_steps
+        decay = np.exp(-dt / self.tau_s)
+        rpm_to_counts = self.counts_per_turn / 60.0
+
+        for _ in range(n_steps):
+            if not node.enabled:
+                command = 0.0
+            elif node.mode in (PROFILE_POSITION, POSITION) and node.position_target is not None:
+                # Proportional position control (gain: the error is removed in ~tau_s), limited to the profile velocity
+                command = (node.position_target - node.position) / (4 * self.tau_s) / rpm_to_counts
+                command = float(np.clip(command, -node.profile_velocity, node.profile_velocity))
+            else:
+                command = node.velocity_command
+
+            # Exact solution of the first-order lag over dt, and the integral of the velocity for the position
+            new_velocity = command + (node.velocity - command) * decay
+            node.position += (command * dt + (node.velocity - command) * self.tau_s * (1 - decay)) * rpm_to_counts
+            node.velocity = new_velocity
+
+    # === Communication ===
+    def VCS_OpenDevice(self, DeviceName, ProtocolStackName, InterfaceName, PortName, pErrorCode):
+        with self.lock:
+            keyhandle = self.next_keyhandle
+            self.next_keyhandle += 1
+            self.open_keyhandles.add(keyhandle)
+            if not self.call(keyhandle, pErrorCode):
+                self.open_keyhandles.discard(keyhandle)
+                return 0
+            return keyhandle
+
+    def VCS_CloseDevice(self, KeyHandle, pErrorCode):
+        with self.lock:
+            if not self.call(KeyHandle, pErrorCode):
+                return 0
+            self.open_keyhandles.discard(KeyHandle)
+            return 1
+
+    def VCS_GetDeviceErrorCode(self, KeyHandle, NodeId, ErrorNumber, pDeviceErrorCode, pErrorCode):
+        with self.lock:
+            if not self.call(KeyHandle, pErrorCode):
+                return 0
+            set_ref(pDeviceErrorCode, 0)
+            return 1
+
+    # === State machine ===
+    def VCS_SetEnableState(self, KeyHandle, NodeId, pErrorCode):
+        with self.lock:
+            if not self.call(KeyHandle, pErrorCode):
+                return 0
+            node = self.node(NodeId)
+            self.update(node)
+            node.enabled = True
+            return 1
+
+    def VCS_SetDisableState(self, KeyHandle, NodeId, pErrorCode):
+        with self.lock:
+            if not self.call(KeyHandle, pErrorCode):
+                return 0
+            node = self.node(NodeId)
+            self.update(node)
+            node.enabled = False
+            return 1
+
+    def VCS_SetOperationMode(self, KeyHandle, NodeId, Mode, pErrorCode):
+        with self.lock:
+            if not self.call(KeyHandle, pErrorCode):
+                return 0
+            node = self.node(NodeId)
+            self.update(node)
+            node.mode = Mode
+            node.velocity_command = 0.0
+            node.position_target = None
+            return 1
+
+    # === Velocity (profile) mode ===
+    def VCS_SetVelocityProfile(self, KeyHandle, NodeId, ProfileAcceleration, ProfileDeceleration, pErrorCode):
+        with self.lock:
+            return 1 if self.call(KeyHandle, pErrorCode) else 0
+
+    def VCS_MoveWithVelocity(self, KeyHandle, NodeId, TargetVelocity, pErrorCode):
+        with self.lock:
+            if not self.call(KeyHandle, pErrorCode):
+                return 0
+            node = self.node(NodeId)
+            self.update(node)
+            node.velocity_command = float(TargetVelocity)
+            return 1
+
+    # === Position (profile) mode ===
+    def VCS_SetPositionProfile(self, KeyHandle, NodeId, ProfileVelocity, ProfileAcceleration, ProfileDeceleration, pErrorCode):
+        with self.lock:
+            if not self.call(KeyHandle, pErrorCode):
+                return 0
+            self.node(NodeId).profile_velocity = float(ProfileVelocity)
+            return 1
+
+    def VCS_SetPositionMust(self, KeyHandle, NodeId, PositionMust, pErrorCode):
+        with self.lock:
+            if not self.call(KeyHandle, pErrorCode):
+                return 0
+            node = self.node(NodeId)
+            self.update(node)
+            node.position_target = float(PositionMust)
+            return 1
+
+    def VCS_MoveToPosition(self, KeyHandle, NodeId, TargetPosition, Absolute, Immediately, pErrorCode):
+        with self.lock:
+            if not self.call(KeyHandle, pErrorCode):
+                return 0
+            node = self.node(NodeId)
+            self.update(node)
+            if Absolute or node.position_target is None:
+                base = 0.0 if Absolute else node.position
+            else:
+                base = node.position_target
+            node.position_target = base + float(TargetPosition)
+            node.ack_until = time.perf_counter() + self.ack_delay_s
+            return 1
+
+    # === Reading the state ===
+    def VCS_GetPositionIs(self, KeyHandle, NodeId, pPositionIs, pErrorCode):
+        with self.lock:
+            if not self.call(KeyHandle, pErrorCode):
+                return 0
+            node = self.node(NodeId)
+            self.update(node)
+            set_ref(pPositionIs, int(round(node.position)))
+            return 1
+
+    def VCS_GetVelocityIs(self, KeyHandle, NodeId, pVelocityIs, pErrorCode):
+        with self.lock:
+            if not self.call(KeyHandle, pErrorCode):
+                return 0
+            node = self.node(NodeId)
+            self.update(node)
+            set_ref(pVelocityIs, int(round(node.velocity)))
+            return 1
+
+    def VCS_GetObject(self, KeyHandle, NodeId, ObjectIndex, ObjectSubIndex, pData, NbOfBytesToRead, pNbOfBytesRead, pErrorCode):
+        with self.lock:
+            if not self.call(KeyHandle, pErrorCode):
+                return 0
+            node = self.node(NodeId)
+            self.update(node)
+            if ObjectIndex == 0x6041:  # Statusword
+                value = STATUS_OPERATION_ENABLED if node.enabled else STATUS_SWITCH_ON_DISABLED
+                if node.position_target is not None and abs(node.position_target - node.position) < 1.0:
+                    value |= STATUS_TARGET_REACHED
+                if time.perf_counter() < node.ack_until:
+                    value |= STATUS_SETPOINT_ACK
+            elif ObjectIndex == 0x6064:  # Position actual value
+                value = int(round(node.position))
+            elif ObjectIndex == 0x606C:  # Velocity actual value
+                value = int(round(node.velocity))
+            else:
+                set_ref(pErrorCode, SIMULATED_ERROR_CODE)
+                return 0
+            set_ref(pData, value)
+            set_ref(pNbOfBytesRead, NbOfBytesToRead)
+            return 1
@@ -0,0 +1,197 @@
+"""
+FrameBus Class
+
+A frame bus per camera in shared memory (multiprocessing.shared_memory), so several consumers in other processes
+(preview, video writer, online tracker) can read the same 1080p frame without pickling and copying ~6 MB per frame.
+
+The bus is a ring of n_slots preallocated frame buffers. Every slot has the sequence number and the timestamp of
+the frame in it; the sequence number of the newest frame is kept in the header. The producer never waits for the
+consumers: it writes the next frame in the next slot (directly with cap.read into the slot buffer, see capture()).
+A slot is marked as "being written" (sequence -1) while it is filled, so a consumer can check that a frame was not
+overwritten while it used it (valid(sequence)). Consumers that are slower than the camera skip ahead to the newest
+frame (read_latest) or, if they need every frame (e.g. a video writer), continue with the oldest frame that is
+still in the ring (read_next); the skipped frames are counted.
+
+The frames are returned as views on the shared memory (no copy). A view stays valid until the producer has written
+n_slots newer frames, so a consumer that holds on to a frame longer should copy it (copy=True).
+
+Usage:
+    bus = FrameBus("cam1")                    # producer (recorder)
+    ret, frame = bus.capture(cap)             # cap.read into the next slot and publish it
+    spec = bus.spec()                         # send to the consumer processes
+
+    reader = FrameBusReader(spec)             # consumer (other process)
+    sequence, timestamp, frame = reader.read_latest(timeout=1.0)
+
+Methods (FrameBus):
+- __init__(name, shape, dtype, n_slots): Creates the shared memory for n_slots frames of the given shape.
+- spec(): Returns the (picklable) description of the bus, to attach a FrameBusReader in another process.
+- next_slot(): Returns the buffer of the next slot (to fill in place), the frame is published with publish().
+- publish(timestamp): Publishes the frame in the slot of next_slot() with its timestamp. Returns the sequence number.
+- write(frame, timestamp): Copies a frame into the next slot and publishes it.
+- capture(cap, timestamp): Reads a frame from a cv2.VideoCapture directly into the next slot and publishes it.
+  Returns (ret, frame), the frame is the view on the slot.
+- close(): Closes and removes the shared memory.
+
+Methods (FrameBusReader):
+- __init__(spec): Attaches to the shared memory of a bus.
+- latest_sequence(): Returns the sequence number of the newest frame (0 if there is none yet).
+- read_latest(timeout, copy): Waits for a frame newer than the last read frame and returns the newest one.
+- read_next(timeout, copy): Returns the frame after the last read frame (or the oldest frame still in the ring).
+- valid(sequence): Returns True if the frame with this sequence number was not overwritten yet.
+- close(): Detaches from the shared memory.
+"""
+
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+import multiprocessing
+import time
+import os
+
+HEADER_ALIGNMENT = 64
+
+# Names of the buses created by this process, their registration with the resource tracker belongs to the FrameBus
+_created = set()
+
+def _layout(shape, dtype, n_slots):
+    # [latest sequence, sequence per slot] (int64), [timestamp per slot] (float64), then the frames (aligned)
+    header_size = (1 + n_slots) * 8 + n_slots * 8
+    frames_offset = -(-header_size // HEADER_ALIGNMENT) * HEADER_ALIGNMENT
+    frame_size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+    return frames_offset, frames_offset + n_slots * frame_size
+
+def _views(buffer, shape, dtype, n_slots):
+    frames_offset, _ = _layout(shape, dtype, n_slots)
+    sequences = np.ndarray((1 + n_slots,), dtype=np.int64, buffer=buffer, offset=0)
+    timestamps = np.ndarray((n_slots,), dtype=np.float64, buffer=buffer, offset=(1 + n_slots) * 8)
+    frames = np.ndarray((n_slots, *shape), dtype=dtype, buffer=buffer, offset=frames_offset)
+    return sequences, timestamps, frames
+
+def _attach(name):
+    # Only the producer removes the shared memory. Before Python 3.13, attaching also registers it with the resource
+    # tracker, which would remove it when the consumer process exits. Child processes (multiprocessing) share the
+    # resource tracker of the producer, so there it is left registered (the producer unregisters it on close), just
+    # like for a reader in the producer process itself
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        if os.name == "posix" and multiprocessing.parent_process() is None and name not in _created:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+class FrameBus:
+    def __init__(self, name, shape=(1080, 1920, 3), dtype=np.uint8, n_slots=8):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.n_slots = n_slots
+        _, size = _layout(self.shape, self.dtype, n_slots)
+
+        # Unique name per process, so two recorders (or a crashed one) don't share a bus
+        self.shm_name = f"framebus_{name}_{os.getpid()}"
+        self.shm = shared_memory.SharedMemory(name=self.shm_name, create=True, size=size)
+        _created.add(self.shm_name)
+        self.sequences, self.timestamps, self.frames = _views(self.shm.buf, self.shape, self.dtype, n_slots)
+        self.sequences[:] = 0
+        self.sequence = 0  # Sequence number of the last published frame
+
+    def spec(self):
+        return {"name": self.shm_name, "shape": self.shape, "dtype": self.dtype.str, "n_slots": self.n_slots}
+
+    def next_slot(self):
+        slot = (self.sequence + 1) % self.n_slots
+        self.sequences[1 + slot] = -1  # Being written
+        return self.frames[slot]
+
+    def publish(self, timestamp):
+        self.sequence += 1
+        slot = self.sequence % self.n_slots
+        self.timestamps[slot] = timestamp
+        self.sequences[1 + slot] = self.sequence
+        self.sequences[0] = self.sequence
+        return self.sequence
+
+    def write(self, frame, timestamp):
+        np.copyto(self.next_slot(), frame)
+        return self.publish(timestamp)
+
+    def capture(self, cap, timestamp=None):
+        # cap.read decodes into the given buffer if it has the right size and type, otherwise the frame is copied in
+        slot = self.next_slot()
+        ret, frame = cap.read(slot)
+        if not ret:
+            return False, None
+        if frame.__array_interface__["data"][0] != slot.__array_interface__["data"][0]:
+            np.copyto(slot, frame)
+        self.publish(time.perf_counter() if timestamp is None else timestamp)
+        return True, slot
+
+    def close(self):
+        del self.sequences, self.timestamps, self.frames
+        self.shm.unlink()
+        _created.discard(self.shm_name)
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # A consumer in this process still has a view on a frame, the memory is freed when it is released
+
+class FrameBusReader:
+    def __init__(self, spec):
+        self.shape = tuple(spec["shape"])
+        self.dtype = np.dtype(spec["dtype"])
+        self.n_slots = spec["n_slots"]
+        self.shm = _attach(spec["name"])
+        self.sequences, self.timestamps, self.frames = _views(self.shm.buf, self.shape, self.dtype, self.n_slots)
+        self.last_sequence = 0
+        self.n_skipped = 0  # Frames that were never read by this consumer
+
+    def latest_sequence(self):
+        return int(self.sequences[0])
+
+    def valid(self, sequence):
+        return int(self.sequences[1 + sequence % self.n_slots]) == sequence
+
+    def get(self, sequence, copy):
+        # Returns (timestamp, frame) of a sequence number, or None if it was overwritten (also during the copy)
+        slot = sequence % self.n_slots
+        if not self.valid(sequence):
+            return None
+        timestamp = float(self.timestamps[slot])
+        frame = self.frames[slot].copy() if copy else self.frames[slot]
+        if not self.valid(sequence):
+            return None
+        return timestamp, frame
+
+    def wait_for(self, sequence, timeout):
+        # Polls until a frame with at least this sequence number is published
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while self.latest_sequence() < sequence:
+            if deadline is not None and time.perf_counter() > deadline:
+                return False
+            time.sleep(0.0005)
+        return True
+
+    def read_latest(self, timeout=None, copy=False):
+        while self.wait_for(self.last_sequence + 1, timeout):
+            sequence = self.latest_sequence()
+            result = self.get(sequence, copy)
+            if result is not None:
+                self.n_skipped += sequence - self.last_sequence - 1
+                self.last_sequence = sequence
+                return sequence, result[0], result[1]
+        return None
+
+    def read_next(self, timeout=None, copy=False):
+        while self.wait_for(self.last_sequence + 1, timeout):
+            # Continue with the next frame, or with the oldest frame that is still in the ring
+            sequence = max(self.last_sequence + 1, self.latest_sequence() - self.n_slots + 2)
+            result = self.get(sequence, copy)
+            if result is not None:
+                self.n_skipped += sequence - self.last_sequence - 1
+                self.last_sequence = sequence
+                return sequence, result[0], result[1]
+        return None
+
+    def close(self):
+        del self.sequences, self.timestamps, self.frames
+        self.shm.close()
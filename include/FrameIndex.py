@@ -0,0 +1,325 @@
+"""
+FrameIndex Functions and IndexedVideoReader Class
+
+Random access into the recordings. Seeking with cv2.CAP_PROP_POS_FRAMES is slow and not always exact for the XVID
+AVIs of the recorder (the decoder has to start at a keyframe, which OpenCV has to guess). The frame index is a small
+sidecar file next to the video (<base>_index.npy) with one entry per frame: the byte offset and size of the frame in
+the AVI, whether it is a keyframe and its capture timestamp. It is a NumPy structured array, opened memory-mapped, so
+looking up a frame or a time costs nothing, also for long recordings.
+
+Main Workflow:
+- The index is read from the index of the AVI itself: the OpenDML index (indx/ix## chunks, written for files over
+  1 GB) or the idx1 chunk. Without an index the movi list is scanned (the keyframes are then unknown, except for
+  intra-only codecs). The timestamps come from <base>_timestamps.csv (column of the camera, see the recorder).
+- The recorder builds the index when a recording stops, older recordings get one from the tool below (or on first
+  use by the IndexedVideoReader).
+- The IndexedVideoReader seeks only to keyframes (exact) and decodes forward from the nearest keyframe before the
+  requested frame. A seek of OpenCV costs about as much as decoding 20-30 frames, so frames a bit ahead of the current
+  position are reached by decoding forward without seeking (MAX_DECODE_AHEAD).
+- With direct=True the frames of an MJPG video (every frame a JPEG) are decoded straight from the file bytes with
+  cv2.imdecode, without any seek (>10x faster random access). The JPEG decoder of OpenCV can differ a few grey levels
+  from the one of FFmpeg, so this is meant for previews and review, not for tracking.
+- With grayscale=True the frames are single-channel (8-bit). Gray recordings (GRAY8, e.g. FFV1 or Y800 written with
+  isColor=False, see GRAY_PIXEL_FORMATS) are returned by FFmpeg as they are decoded, without the conversion to BGR.
+  The frames of color videos (XVID, MJPG, ...) are converted with cv2.COLOR_BGR2GRAY into a reused buffer: OpenCV
+  doesn't support reading the luminance plane of YUV video directly (and it has another range than BGR2GRAY).
+
+Functions:
+- index_path(video_path): Returns the path of the index sidecar of a video.
+- load_timestamps(video_path): Returns the capture timestamps of a video from the timestamps CSV of the recording (or None).
+- read_avi_index(video_path): Returns the index of an AVI (without timestamps, NaN).
+- build_index(video_path, timestamps, save): Builds the index of a video (with the timestamps) and saves it as sidecar.
+- load_index(video_path, build): Returns the memory-mapped index, builds it if it is missing or older than the video.
+
+Methods (IndexedVideoReader):
+- __init__(video_path, index, direct, grayscale): Opens the video and its index (built if needed).
+- keyframe_before(frame_number): Returns the last keyframe at or before a frame.
+- frame_at_time(time_seconds): Returns the frame captured at or last before a timestamp.
+- seek(frame_number): Positions the reader so that read() returns this frame.
+- read(): Reads the next frame (like cv2.VideoCapture.read).
+- decode_direct(frame_number): Decodes a JPEG frame straight from the file (direct=True, MJPG only).
+- read_frame(frame_number) / read_time(time_seconds): Reads a frame by number or by capture time.
+- release(): Releases the video.
+
+How to run (build the index of existing recordings):
+    python -m include.FrameIndex <video.avi> [<video.avi> ...]
+"""
+
+import cv2
+import numpy as np
+import argparse
+import struct
+import csv
+import os
+import re
+
+INDEX_DTYPE = np.dtype([("offset", "<u8"), ("size", "<u4"), ("keyframe", "?"), ("timestamp", "<f8")])
+AVIIF_KEYFRAME = 0x10
+ODML_NOT_KEYFRAME = 0x80000000  # Bit 31 of the size in a standard (ix##) index
+INTRA_CODECS = (b"MJPG", b"HFYU", b"Y800", b"\x00\x00\x00\x00")  # Every frame is a keyframe
+MAX_DECODE_AHEAD = 24  # Frames ahead of the current position that are decoded instead of seeking
+# Pixel formats of the decoder (cv2.CAP_PROP_CODEC_PIXEL_FORMAT) that OpenCV returns as they are without the BGR conversion
+GRAY_PIXEL_FORMATS = (b"Y800", b"GREY")
+LOG_LEVEL_ERROR = 2  # cv2.setLogLevel
+
+def index_path(video_path):
+    return os.path.splitext(video_path)[0] + "_index.npy"
+
+def load_timestamps(video_path):
+    # Column "Timestamp <camera> (s)" of <base>_timestamps.csv, older recordings have one "Timestamp (s)" column
+    match = re.search(r'_(cam\d+)\.avi$', os.path.basename(video_path))
+    camera_name = match.group(1) if match else None
+    base_name = re.sub(r'_cam\d+\.avi$', '', os.path.basename(video_path))
+    timestamp_file = os.path.join(os.path.dirname(video_path), f"{base_name}_timestamps.csv")
+    if not os.path.exists(timestamp_file):
+        print(f"[WARNING] Timestamp file not found: {timestamp_file}")
+        return None
+
+    timestamps = []
+    with open(timestamp_file, newline='') as f:
+        reader = csv.DictReader(f)
+        column = f"Timestamp {camera_name} (s)"
+        if column not in reader.fieldnames:
+            column = "Timestamp (s)"
+        for row in reader:
+            if row[column] != "":  # Empty after the last frame of this camera
+                timestamps.append(float(row[column]))
+    print(f"[INFO] Loaded {len(timestamps)} timestamps from {timestamp_file}")
+    return timestamps
+
+def _chunks(f, start, end):
+    # Yields (id, list type or None, data offset, size) of the chunks between start and end
+    position = start
+    while position + 8 <= end:
+        f.seek(position)
+        header = f.read(12)
+        if len(header) < 8:
+            return
+        chunk_id, size = header[:4], struct.unpack("<I", header[4:8])[0]
+        if chunk_id in (b"RIFF", b"LIST"):
+            yield chunk_id, header[8:12], position + 12, size - 4
+        else:
+            yield chunk_id, None, position + 8, size
+        position += 8 + size + (size & 1)
+
+def read_avi_index(video_path):
+    with open(video_path, "rb") as f:
+        file_size = f.seek(0, os.SEEK_END)
+        riffs = [(data, size) for chunk_id, kind, data, size in _chunks(f, 0, file_size) if chunk_id == b"RIFF" and kind in (b"AVI ", b"AVIX")]
+        if not riffs:
+            raise ValueError(f"Not an AVI file: {video_path}")
+
+        # Stream headers: the first video stream, its codec and its OpenDML super index (if any)
+        stream, codec, super_index, movi, idx1 = None, None, None, [], None
+        for chunk_id, kind, data, size in _chunks(f, *_span(riffs[0])):
+            if kind == b"hdrl":
+                for s, (_, strl, strl_data, strl_size) in enumerate(c for c in _chunks(f, data, data + size) if c[1] == b"strl"):
+                    headers = {c[0]: (c[2], c[3]) for c in _chunks(f, strl_data, strl_data + strl_size)}
+                    f.seek(headers[b"strh"][0])
+                    strh = f.read(8)
+                    if stream is None and strh[:4] == b"vids":
+                        stream, codec = s, strh[4:8]
+                        super_index = headers.get(b"indx")
+            elif kind == b"movi":
+                movi.append((data, size))
+            elif chunk_id == b"idx1":
+                idx1 = (data, size)
+        if stream is None:
+            raise ValueError(f"No video stream in {video_path}")
+        for riff in riffs[1:]:  # OpenDML extension RIFFs (AVIX)
+            movi += [(data, size) for _, kind, data, size in _chunks(f, *_span(riff)) if kind == b"movi"]
+        video_ids = (f"{stream:02d}dc".encode(), f"{stream:02d}db".encode())
+
+        if super_index is not None:
+            index = _read_odml_index(f, super_index)
+        elif idx1 is not None and movi:
+            index = _read_idx1(f, idx1, movi[0][0] - 4, video_ids)
+        else:
+            index = None
+        if index is None:
+            # No index in the file: scan the movi lists (the keyframes of inter-frame codecs are unknown)
+            print(f"[WARNING] No index in {video_path}, scanning the frames")
+            entries = [(data, size) for first, length in movi for chunk_id, _, data, size in _chunks(f, first, first + length) if chunk_id in video_ids]
+            index = np.zeros(len(entries), dtype=INDEX_DTYPE)
+            if entries:
+                index["offset"], index["size"] = np.array(entries, dtype=np.uint64).T
+            index["keyframe"] = codec.upper() in INTRA_CODECS
+            index["keyframe"][:1] = True
+    index["timestamp"] = np.nan
+    return index
+
+def _span(chunk):
+    data, size = chunk
+    return data, data + size
+
+def _read_idx1(f, idx1, movi_start, video_ids):
+    f.seek(idx1[0])
+    entries = np.frombuffer(f.read(idx1[1]), dtype=[("id", "S4"), ("flags", "<u4"), ("offset", "<u4"), ("size", "<u4")])
+    entries = entries[np.isin(entries["id"], video_ids)]
+    if len(entries) == 0:
+        return None
+    # The offsets point to the chunk headers, relative to the movi list or (some writers) absolute
+    base = movi_start if entries["offset"][0] < movi_start else 0
+    index = np.zeros(len(entries), dtype=INDEX_DTYPE)
+    index["offset"] = entries["offset"].astype(np.uint64) + base + 8
+    index["size"] = entries["size"]
+    index["keyframe"] = (entries["flags"] & AVIIF_KEYFRAME) != 0
+    return index
+
+def _read_odml_index(f, super_index):
+    # Super index (indx): entries point to the standard indexes (ix##) of every RIFF
+    f.seek(super_index[0])
+    _, _, index_type, n_entries = struct.unpack("<HBBI", f.read(8))
+    if index_type != 0:  # Not an index of indexes
+        return None
+    f.seek(super_index[0] + 24)
+    parts = []
+    for offset, _, _ in struct.iter_unpack("<QII", f.read(16 * n_entries)):
+        f.seek(offset + 8)
+        _, _, _, n_chunks = struct.unpack("<HBBI", f.read(8))
+        f.read(4)  # Chunk id
+        base_offset = struct.unpack("<Q", f.read(12)[:8])[0]
+        entries = np.frombuffer(f.read(8 * n_chunks), dtype=[("offset", "<u4"), ("size", "<u4")])
+        part = np.zeros(n_chunks, dtype=INDEX_DTYPE)
+        part["offset"] = entries["offset"].astype(np.uint64) + base_offset  # Points to the data
+        part["size"] = entries["size"] & ~np.uint32(ODML_NOT_KEYFRAME)
+        part["keyframe"] = (entries["size"] & ODML_NOT_KEYFRAME) == 0
+        parts.append(part)
+    return np.concatenate(parts) if parts else None
+
+def build_index(video_path, timestamps=None, save=True):
+    index = read_avi_index(video_path)
+    if timestamps is None:
+        timestamps = load_timestamps(video_path)
+    if timestamps is not None:
+        if len(timestamps) != len(index):
+            print(f"[WARNING] {len(timestamps)} timestamps for {len(index)} frames in {video_path}")
+        n = min(len(timestamps), len(index))
+        index["timestamp"][:n] = timestamps[:n]
+
+    if save:
+        # Write to a temporary file first so a crash never leaves a half written index
+        path = index_path(video_path)
+        tmp_file = path + ".tmp.npy"
+        np.save(tmp_file, index)
+        os.replace(tmp_file, path)
+        print(f"[INFO] Saved frame index ({len(index)} frames, {int(index['keyframe'].sum())} keyframes) to {path}")
+    return index
+
+def load_index(video_path, build=True):
+    path = index_path(video_path)
+    if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(video_path):
+        return np.load(path, mmap_mode="r")
+    if not build:
+        return None
+    build_index(video_path)
+    return np.load(path, mmap_mode="r")
+
+class IndexedVideoReader:
+    def __init__(self, video_path, index=None, direct=False, grayscale=False):
+        self.video_path = video_path
+        self.grayscale = grayscale
+        self.cap = cv2.VideoCapture(video_path)
+        self.gray_decoder = False  # Frames are the gray frames of the decoder (no conversion)
+        self.gray_frame = None  # Reused output buffer of the conversion to grayscale
+        if grayscale:
+            pixel_format = (int(self.cap.get(cv2.CAP_PROP_CODEC_PIXEL_FORMAT)) & 0xFFFFFFFF).to_bytes(4, "little")
+            if pixel_format in GRAY_PIXEL_FORMATS:
+                # Without the BGR conversion, FFmpeg returns the gray frame as decoded. OpenCV warns about turning the
+                # conversion off on every open (it is supported for GRAY8), so its log level is raised while opening
+                self.cap.release()
+                log_level = cv2.getLogLevel()
+                cv2.setLogLevel(LOG_LEVEL_ERROR)
+                try:
+                    self.cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG, [cv2.CAP_PROP_CONVERT_RGB, 0])
+                finally:
+                    cv2.setLogLevel(log_level)
+                self.gray_decoder = True
+        if index is None:
+            try:
+                index = load_index(video_path)
+            except (ValueError, OSError) as error:
+                # Still readable, but every seek back starts decoding at the first frame
+                print(f"[WARNING] No frame index for {video_path}: {error}")
+        self.index = index
+        if index is not None and index["keyframe"].any():
+            self.keyframes = np.flatnonzero(index["keyframe"])
+        else:
+            self.keyframes = np.array([0])
+        self.timestamps = index["timestamp"] if index is not None else None
+        self.frame_count = len(index) if index is not None else int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.position = 0  # Number of the frame that read() returns next
+
+        # Direct decoding of JPEG frames from the memory-mapped file
+        self.data = None
+        if direct and index is not None and index["keyframe"].all() and len(index) > 0:
+            self.data = np.memmap(video_path, dtype=np.uint8, mode="r")
+            first = self.data[int(index["offset"][0]):int(index["offset"][0]) + 2]
+            if bytes(first) != b"\xff\xd8":  # No JPEG start of image marker
+                self.data = None
+
+    def keyframe_before(self, frame_number):
+        return int(self.keyframes[max(np.searchsorted(self.keyframes, frame_number, side="right") - 1, 0)])
+
+    def frame_at_time(self, time_seconds):
+        if self.timestamps is None or np.isnan(self.timestamps[0]):
+            return int(round(time_seconds * self.fps))  # No timestamps, assume a constant frame rate
+        return max(int(np.searchsorted(self.timestamps, time_seconds, side="right")) - 1, 0)
+
+    def seek(self, frame_number):
+        frame_number = int(frame_number)
+        keyframe = self.keyframe_before(frame_number)
+        ahead = self.position <= frame_number and (self.position >= keyframe or frame_number - self.position <= MAX_DECODE_AHEAD)
+        if not ahead:
+            # Not reachable by decoding on from the current frame: jump to the keyframe (exact, no guessing by the decoder)
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, keyframe)
+            if int(self.cap.get(cv2.CAP_PROP_POS_FRAMES)) != keyframe:
+                print(f"[WARNING] Seek to frame {keyframe} failed, decoding from the first frame")
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                keyframe = 0
+            self.position = keyframe
+
+        # Decode forward without converting the frames
+        while self.position < frame_number:
+            if not self.cap.grab():
+                return False
+            self.position += 1
+        return True
+
+    def read(self):
+        ret, frame = self.cap.read()
+        if ret:
+            self.position += 1
+            if self.grayscale and frame.ndim == 3:
+                self.gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self.gray_frame)
+                frame = self.gray_frame
+        return ret, frame
+
+    def decode_direct(self, frame_number):
+        offset, size = int(self.index["offset"][frame_number]), int(self.index["size"][frame_number])
+        flags = cv2.IMREAD_GRAYSCALE if self.grayscale else cv2.IMREAD_COLOR
+        frame = cv2.imdecode(self.data[offset:offset + size], flags) if size > 0 else None
+        return frame is not None, frame
+
+    def read_frame(self, frame_number):
+        if self.data is not None and 0 <= frame_number < self.frame_count:
+            return self.decode_direct(int(frame_number))
+        if not self.seek(frame_number):
+            return False, None
+        return self.read()
+
+    def read_time(self, time_seconds):
+        return self.read_frame(self.frame_at_time(time_seconds))
+
+    def release(self):
+        self.cap.release()
+        self.data = None
+
+# Builds the index of existing recordings
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the frame index sidecar (<base>_index.npy) of recordings.")
+    parser.add_argument("videos", nargs="+", help="AVI files of the recorder")
+    args = parser.parse_args()
+    for video in args.videos:
+        build_index(video)
@@ -0,0 +1,94 @@
+"""
+Kinematics Module
+
+This module computes the kinematics of a reconstructed trajectory (the points_with_timestamp of the
+TrajectoryReconstructor): smoothed position, vector velocity and acceleration, and the orientation angle and
+angular rate from the angle measured by the tracker.
+
+The timestamps of the recordings are not evenly spaced (the recorder logs the real capture time of every frame),
+so a normal Savitzky-Golay filter or a moving average (which also shifts the time axis) is not correct. Instead,
+a Savitzky-Golay filter for non-uniform time steps is used: for every sample a polynomial is fitted (least squares)
+to the samples in a window around it, in terms of the real time difference to that sample. The polynomial gives
+the smoothed value and its first and second derivative at the sample time, without any time shift.
+
+Everything is vectorized with numpy. The samples are processed in chunks (with the window overlap read from the
+neighbouring samples), so the memory use stays bounded for very long series.
+
+Functions:
+- savgol_nonuniform(t, values, window, order, chunk_size): Returns the smoothed values and the first and second time derivative.
+- unwrap_angle(angle_deg, period): Removes the jumps from an angle that is only known modulo the period.
+- compute_kinematics(t, points, angle_deg, window, order, chunk_size): Returns a DataFrame with position, velocity,
+  acceleration, speed, orientation and angular rate.
+"""
+
+import numpy as np
+import pandas as pd
+
+def savgol_nonuniform(t, values, window=51, order=2, chunk_size=100000):
+    t = np.asarray(t, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    one_dimensional = values.ndim == 1
+    values = values.reshape(len(t), -1)
+    n = len(t)
+
+    # The window must be odd, fit in the data and be larger than the polynomial order
+    window = min(window, n if n % 2 == 1 else n - 1)
+    order = min(order, window - 1)
+    half = window // 2
+
+    # Scale the time differences to around [-1, 1] to keep the least squares problems well conditioned
+    scale = (t[-1] - t[0]) / max(n - 1, 1) * max(half, 1) if n > 1 else 1.0
+    powers = np.arange(order + 1)
+
+    smoothed = np.empty_like(values)
+    first = np.zeros_like(values)
+    second = np.zeros_like(values)
+    for start in range(0, n, chunk_size):
+        rows = np.arange(start, min(start + chunk_size, n))
+
+        # Window around every sample, shifted inwards at the start and end of the data
+        window_start = np.clip(rows - half, 0, n - window)
+        idx = window_start[:, None] + np.arange(window)            # (rows, window)
+        tau = (t[idx] - t[rows, None]) / scale                      # Time relative to the sample itself
+
+        # Least squares polynomial fit for every sample at once: coef = (V^T V)^-1 V^T y
+        V = tau[..., None] ** powers                                # (rows, window, order+1)
+        Vt = V.transpose(0, 2, 1)
+        coef = np.linalg.solve(Vt @ V, Vt @ values[idx])            # (rows, order+1, dims)
+
+        # The polynomial is evaluated at tau = 0, so the coefficients are the value and the derivatives
+        smoothed[rows] = coef[:, 0]
+        if order >= 1:
+            first[rows] = coef[:, 1] / scale
+        if order >= 2:
+            second[rows] = 2.0 * coef[:, 2] / scale**2
+
+    if one_dimensional:
+        return smoothed[:, 0], first[:, 0], second[:, 0]
+    return smoothed, first, second
+
+def unwrap_angle(angle_deg, period=180.0):
+    # The orientation of the UMR (long axis) is only known modulo 180 degrees
+    angle_deg = np.asarray(angle_deg, dtype=np.float64)
+    return np.unwrap(angle_deg, period=period)
+
+def compute_kinematics(t, points, angle_deg=None, window=51, order=2, chunk_size=100000):
+    """
+    t: (N,) timestamps in seconds, points: (N, 3) positions in mm, angle_deg: (N,) orientation in degrees (optional).
+    Returns a DataFrame with the smoothed position (mm), velocity (mm/s), acceleration (mm/s^2) and speed (mm/s),
+    and if an angle is given the unwrapped orientation (deg) and angular rate (deg/s).
+    """
+    position, velocity, acceleration = savgol_nonuniform(t, points, window, order, chunk_size)
+    kinematics = pd.DataFrame({
+        'Time': t,
+        'X': position[:, 0], 'Y': position[:, 1], 'Z': position[:, 2],
+        'Vx': velocity[:, 0], 'Vy': velocity[:, 1], 'Vz': velocity[:, 2],
+        'Ax': acceleration[:, 0], 'Ay': acceleration[:, 1], 'Az': acceleration[:, 2],
+        'Speed': np.linalg.norm(velocity, axis=1),
+    })
+
+    if angle_deg is not None:
+        angle, angular_rate, _ = savgol_nonuniform(t, unwrap_angle(angle_deg), window, order, chunk_size)
+        kinematics['Angle'] = angle
+        kinematics['Angular rate'] = angular_rate
+    return kinematics
@@ -0,0 +1,178 @@
+"""
+LivePositionStream Class
+
+This class computes the 3D position of the object live, while the recorder is running, and publishes every sample
+over UDP, so a controller (e.g. the motor loop or the robot) can use it in closed loop. Without it, a 3D position
+only exists after the offline pipeline (tracking and reconstruction) has finished.
+
+The stream is a frame listener of the DualCameraApp: for every pair of captured frames it gets the frames and the
+capture time. The recorder only hands the frames over, the tracking runs on a background thread with the latest
+frames (latest value wins: if the tracking is slower than the cameras, older frames are dropped instead of building
+up a delay). For both cameras the object is located with the same method as the VideoTracker (locate_object), the
+points are undistorted and converted to 3D with the TrajectoryGeometry of the TrajectoryReconstructor, so the live
+position is the same as in the trajectory CSV (in mm, relative to the first sample of the stream).
+
+The box and the start ROI of both cameras are given, or taken from the selections in the manifest of an earlier
+session with the same setup (see SessionPipeline).
+
+Every sample is sent as one UDP packet (PACKET_FORMAT, little endian):
+    sequence number (uint32), capture time (float64, time.perf_counter in s), X, Y, Z (float64, mm), angle (float64, degrees)
+The capture time uses the same clock as the frame timestamps and the motor telemetry. The latency from the capture
+of the frames to sending the packet is measured for every sample (stats()).
+
+Methods (LivePositionStream):
+- __init__(box_cam1, box_cam2, roi_cam1, roi_cam2, address, calibration_file): Initializes the stream with the boxes
+  and ROIs (X, Y, Width, Height in pixels of the full frames) and the UDP address of the receiver.
+- from_manifest(manifest_path, **kwargs): Creates a stream with the box and ROI selections of a session manifest.
+- start(): Starts the tracking thread.
+- on_frames(frame1, frame2, ..., capture_time): Frame listener for the DualCameraApp (returns immediately). Only camera 1
+  and 2 are used, the frames of other cameras are ignored.
+- reset(): The next sample becomes the origin (0, 0, 0).
+- stop(): Stops the tracking thread and closes the socket.
+- stats(): Returns the number of published and dropped samples and the latency statistics.
+
+Methods (LivePositionReceiver):
+- __init__(address): Opens a UDP socket on the address.
+- receive(timeout): Returns the next sample as a dict, or None after the timeout.
+- close(): Closes the socket.
+"""
+
+import numpy as np
+import threading
+import socket
+import struct
+import time
+import json
+import cv2
+from collections import deque
+from include.TrackerClassV3 import locate_object, long_axis_angle
+from include.TrajectoryGeometry import TrajectoryGeometry, BOX_MM_CAM1, BOX_MM_CAM2
+from include.CameraCalibration import load_calibration, DEFAULT_CALIBRATION_FILE
+
+PACKET_FORMAT = "<Iddddd"
+DEFAULT_ADDRESS = ("127.0.0.1", 5005)
+
+class LivePositionStream:
+    def __init__(self, box_cam1, box_cam2, roi_cam1, roi_cam2, address=DEFAULT_ADDRESS, calibration_file=DEFAULT_CALIBRATION_FILE):
+        calibration = load_calibration(calibration_file)
+        self.camera_matrix1 = calibration["cameras"]["cam1"]["camera_matrix"]
+        self.dist_coeffs1 = calibration["cameras"]["cam1"]["dist_coeffs"]
+        self.camera_matrix2 = calibration["cameras"]["cam2"]["camera_matrix"]
+        self.dist_coeffs2 = calibration["cameras"]["cam2"]["dist_coeffs"]
+
+        # The box is selected in the distorted frames (like in the VideoTracker), the TrajectoryReconstructor uses it as it is
+        self.geometry = TrajectoryGeometry(self.camera_matrix1, self.camera_matrix2, box_cam1, box_cam2, BOX_MM_CAM1, BOX_MM_CAM2)
+        self.roi_cam1 = tuple(int(v) for v in roi_cam1)
+        self.roi_cam2 = tuple(int(v) for v in roi_cam2)
+
+        self.address = address
+        self.socket = None
+        self.condition = threading.Condition()
+        self.pending = None  # Latest (frame1, frame2, capture_time)
+        self.running = False
+        self.thread = None
+
+        # Statistics
+        self.sequence = 0
+        self.n_dropped = 0
+        self.n_lost = 0  # Samples where the object was not found in one of the cameras
+        self.latencies = deque(maxlen=1000)
+
+    @classmethod
+    def from_manifest(cls, manifest_path, **kwargs):
+        with open(manifest_path) as f:
+            selections = json.load(f)["selections"]
+        return cls(selections["cam1"]["box"], selections["cam2"]["box"], selections["cam1"]["roi"], selections["cam2"]["roi"], **kwargs)
+
+    def start(self):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="LivePositionStream", daemon=True)
+        self.thread.start()
+        print(f"[INFO] Live 3D position stream to {self.address[0]}:{self.address[1]}")
+
+    def on_frames(self, frame1, frame2, *more):
+        # Called in the GUI thread: only keep the latest frames, the tracking thread picks them up
+        capture_time = more[-1]
+        with self.condition:
+            if self.pending is not None:
+                self.n_dropped += 1
+            self.pending = (frame1, frame2, capture_time)
+            self.condition.notify()
+
+    def reset(self):
+        with self.condition:
+            self.geometry.reset()
+
+    def stop(self):
+        if self.thread is None:
+            return
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join()
+        self.thread = None
+        self.socket.close()
+        print(f"[INFO] Live 3D position stream stopped: {self.stats()}")
+
+    def locate(self, frame, roi, camera_matrix, dist_coeffs):
+        # Same tracking as the VideoTracker, then undistort the center of the ROI (the tracked point in the CSV)
+        roi, rect, _ = locate_object(frame, roi)
+        if rect is None:
+            return roi, None, None
+        x, y, w, h = roi
+        point = np.array([[[x + w // 2, y + h // 2]]], dtype=np.float32)
+        undistorted = cv2.undistortPoints(point, camera_matrix, dist_coeffs, P=camera_matrix).reshape(2)
+        return roi, undistorted, long_axis_angle(rect)
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.running and self.pending is None:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                frame1, frame2, capture_time = self.pending
+                self.pending = None
+
+            self.roi_cam1, point_cam1, angle = self.locate(frame1, self.roi_cam1, self.camera_matrix1, self.dist_coeffs1)
+            self.roi_cam2, point_cam2, _ = self.locate(frame2, self.roi_cam2, self.camera_matrix2, self.dist_coeffs2)
+            if point_cam1 is None or point_cam2 is None:
+                self.n_lost += 1
+                continue
+
+            with self.condition:
+                X, Y, Z = self.geometry.update_relative(point_cam1[0], point_cam1[1], point_cam2[0], point_cam2[1])
+            packet = struct.pack(PACKET_FORMAT, self.sequence & 0xFFFFFFFF, capture_time, X, Y, Z, angle)
+            self.socket.sendto(packet, self.address)
+            self.latencies.append(time.perf_counter() - capture_time)
+            self.sequence += 1
+
+    def stats(self):
+        latencies_ms = np.array(self.latencies) * 1000.0
+        return {
+            "published": self.sequence,
+            "dropped": self.n_dropped,
+            "lost": self.n_lost,
+            "latency_mean_ms": float(latencies_ms.mean()) if len(latencies_ms) else None,
+            "latency_p95_ms": float(np.percentile(latencies_ms, 95)) if len(latencies_ms) else None,
+            "latency_max_ms": float(latencies_ms.max()) if len(latencies_ms) else None,
+        }
+
+class LivePositionReceiver:
+    def __init__(self, address=DEFAULT_ADDRESS):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(address)
+
+    def receive(self, timeout=None):
+        self.socket.settimeout(timeout)
+        try:
+            packet, _ = self.socket.recvfrom(struct.calcsize(PACKET_FORMAT))
+        except socket.timeout:
+            return None
+        sequence, capture_time, X, Y, Z, angle = struct.unpack(PACKET_FORMAT, packet)
+        return {"sequence": sequence, "capture_time": capture_time, "position_mm": (X, Y, Z), "angle": angle,
+                "latency_s": time.perf_counter() - capture_time}
+
+    def close(self):
+        self.socket.close()
@@ -3,6 +3,8 @@ from enum import IntEnum
 # sleep function
 import time
 import os
+import threading
+import asyncio
 
 class MotorMode(IntEnum):
     ProfilePosition = 1
@@ -16,12 +18,27 @@ class MotorMode(IntEnum):
     StepDirection = -6
 
 
+# Gearbox ratio between the motor and the magnet (26/7). The rotation frequency of the magnet in Hz is converted
+# to the motor velocity in rpm with FrequencyToVelocity
+GEAR_RATIO = 26.0/7.0
+
+def FrequencyToVelocity(frequency, direction=1):
+    return int(GEAR_RATIO*60.0*frequency*direction)
+
+
+def LoadEposLibrary():
+    # The maxon EPOS command library (Windows only)
+    path= os.path.dirname(os.path.abspath(__file__))+'/EposCmd64.dll'
+    cdll.LoadLibrary(path)
+    return CDLL(path)
+
+
 class Motor:
-    def __init__(self, NodeID, USBID):
+    def __init__(self, NodeID, USBID, epos=None):
 
-        path= os.path.dirname(os.path.abspath(__file__))+'/EposCmd64.dll'
-        cdll.LoadLibrary(path)
-        self.epos=CDLL(path)
+        # EPOS command library backend: the real DLL by default, or a stand-in with the same VCS_* calls,
+        # e.g. the simulated EPOS4 in include/EposSimulator.py for testing and benchmarking without hardware
+        self.epos = epos if epos is not None else LoadEposLibrary()
 
         # motor connection variables
         self.keyhandle = 0
@@ -33,36 +50,63 @@ class Motor:
         self.pErrorCode = c_uint()
         self.pDeviceErrorCode = c_uint()
 
-    def WaitAcknowledged(self):
+        # Lock for the calls that are made from more than one thread (e.g. telemetry polling while the GUI sets the velocity)
+        self.lock = threading.RLock()
+
+    def ReadStatusword(self):
+        # CANopen Object: Statusword (UINT16), returns the value or None if the call failed
         ObjectIndex=0x6041
         ObjectSubindex=0x0
         NbOfBytesToRead=0x02
         pNbOfBytesRead=c_uint()
         pData=c_uint()
+        pErrorCode=c_uint()
+
+        with self.lock:
+            ret=self.epos.VCS_GetObject(self.keyhandle, self.NodeID, ObjectIndex, ObjectSubindex, byref(pData), NbOfBytesToRead, byref(pNbOfBytesRead), byref(pErrorCode) )
+        return pData.value if ret==1 else None
 
-        # Setpoint Acknowledged
+    def WaitAcknowledged(self, timeout_ms=2000, poll_interval_ms=1, max_poll_interval_ms=20, backoff=1.5):
+        # Waits until bit 12 of the statusword (setpoint acknowledged) is reset = new profile started.
+        # The statusword is polled fast at first and the interval grows by 'backoff' up to max_poll_interval_ms,
+        # so a quick acknowledge is seen within ~1 ms without flooding the USB bus during a long wait.
+        # Returns 1 if acknowledged, 0 if the deadline (timeout_ms) passed
         Mask_Bit12=0x1000
-        Bit12=0
-        i=0
+        deadline=time.perf_counter()+timeout_ms/1000.0
+        interval=poll_interval_ms/1000.0
 
         while True:
-            # Read Statusword
-            self.ret=self.epos.VCS_GetObject(self.keyhandle, self.NodeID, ObjectIndex, ObjectSubindex, byref(pData), NbOfBytesToRead, byref(pNbOfBytesRead), byref(self.pErrorCode) )
-            Bit12=Mask_Bit12&pData.value
+            statusword=self.ReadStatusword()
+            if statusword is not None and (statusword&Mask_Bit12)==0:
+                return 1
 
             # Timed out
-            if i>20:
+            remaining=deadline-time.perf_counter()
+            if remaining<=0:
                 return 0
-                break
 
-            if Bit12==Mask_Bit12:
-                time.sleep(1)
-                i+=1
+            time.sleep(min(interval, remaining))
+            interval=min(interval*backoff, max_poll_interval_ms/1000.0)
 
-            # Bit12 reseted = new profile started
-            else:
+    async def WaitAcknowledgedAsync(self, timeout_ms=2000, poll_interval_ms=1, max_poll_interval_ms=20, backoff=1.5):
+        # Same as WaitAcknowledged, but awaitable: the event loop can wait on several motors (see wait_all_acknowledged)
+        # or camera events at the same time. The statusword is read in the default executor so the loop never blocks on USB
+        Mask_Bit12=0x1000
+        loop=asyncio.get_running_loop()
+        deadline=time.perf_counter()+timeout_ms/1000.0
+        interval=poll_interval_ms/1000.0
+
+        while True:
+            statusword=await loop.run_in_executor(None, self.ReadStatusword)
+            if statusword is not None and (statusword&Mask_Bit12)==0:
                 return 1
-                break
+
+            remaining=deadline-time.perf_counter()
+            if remaining<=0:
+                return 0
+
+            await asyncio.sleep(min(interval, remaining))
+            interval=min(interval*backoff, max_poll_interval_ms/1000.0)
 
     def GetPosition(self):
         # CANopen Object: Position Actual Value
@@ -95,6 +139,33 @@ class Motor:
             print('GetPositionIs failed')
             return 0    
 
+    def GetVelocityIs(self):
+        pVelocityIs=c_long()
+
+        ret=self.epos.VCS_GetVelocityIs(self.keyhandle, self.NodeID, byref(pVelocityIs), byref(self.pErrorCode) )
+
+        if ret==1:
+            print('Velocity Actual Value: %d [rpm]' % pVelocityIs.value)
+            return 1
+        else:
+            print('GetVelocityIs failed')
+            return 0
+
+    # Fast reads without printing (used for telemetry polling), return the value or None if the call failed
+    def ReadPositionIs(self):
+        pPositionIs=c_long()
+        pErrorCode=c_uint()
+        with self.lock:
+            ret=self.epos.VCS_GetPositionIs(self.keyhandle, self.NodeID, byref(pPositionIs), byref(pErrorCode) )
+        return pPositionIs.value if ret==1 else None
+
+    def ReadVelocityIs(self):
+        pVelocityIs=c_long()
+        pErrorCode=c_uint()
+        with self.lock:
+            ret=self.epos.VCS_GetVelocityIs(self.keyhandle, self.NodeID, byref(pVelocityIs), byref(pErrorCode) )
+        return pVelocityIs.value if ret==1 else None
+
     def OpenCommunication(self):
         print('Opening Port...')
         self.keyhandle=self.epos.VCS_OpenDevice(b'EPOS4', b'MAXON SERIAL V2', b'USB', bytes(f'USB{self.USBID}',"utf-8"), byref(self.pErrorCode) )
@@ -142,7 +213,8 @@ class Motor:
 
     def RunSetVelocity(self,velocity):
         if self.mode == MotorMode.ProfileVelocity:
-            self.ret=self.epos.VCS_MoveWithVelocity(self.keyhandle, self.NodeID, velocity, byref(self.pErrorCode))
+            with self.lock:
+                self.ret=self.epos.VCS_MoveWithVelocity(self.keyhandle, self.NodeID, velocity, byref(self.pErrorCode))
 
 
     # Position Mode commands
@@ -161,6 +233,11 @@ class Motor:
             self.ret = self.epos.VCS_MoveToPosition(self.keyhandle, self.NodeID, position, absolute, immediately, byref(self.pDeviceErrorCode))
 
 
+async def wait_all_acknowledged(motors, **kwargs):
+    # Waits for the setpoint acknowledge of several motors at the same time, returns the result (1/0) per motor
+    return await asyncio.gather(*(motor.WaitAcknowledgedAsync(**kwargs) for motor in motors))
+
+
 if __name__ == "__main__":
     mode = MotorMode.ProfilePosition
     print(mode.value)
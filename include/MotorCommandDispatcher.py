@@ -0,0 +1,109 @@
+"""
+MotorCommandDispatcher Class
+
+This class sends velocity commands to the motor on a background thread, so the GUI never waits for the USB
+communication with the EPOS4. The GUI submits targets without blocking; the dispatcher only keeps the latest
+target (latest value wins: targets that were replaced before they were sent are dropped) and sends at most
+max_rate_hz commands per second. Holding an arrow key therefore no longer floods the EPOS with commands.
+
+The dispatcher reports the actual command rate and the latency from submitting a target (key press) to the end of
+the command on the device. For a coalesced target, the latency is measured from the first submit that was waiting.
+
+Methods:
+- __init__(motor, max_rate_hz): Initializes the dispatcher with the motor and the maximum command rate.
+- start(): Starts the dispatcher thread.
+- submit(velocity): Sets the new target velocity (returns immediately).
+- stop(): Sends the last pending target and stops the thread.
+- stats(): Returns the command rate, latency statistics and the number of submitted / sent / coalesced targets.
+"""
+
+import numpy as np
+import threading
+import time
+from collections import deque
+
+class MotorCommandDispatcher:
+    def __init__(self, motor, max_rate_hz=50):
+        self.motor = motor
+        self.min_interval = 1.0 / max_rate_hz
+        self.condition = threading.Condition()
+        self.pending = None              # (velocity, time of the first submit that is waiting)
+        self.last_sent = None
+        self.last_send_time = -np.inf
+        self.running = False
+        self.thread = None
+
+        # Statistics
+        self.n_submitted = 0
+        self.n_sent = 0
+        self.n_coalesced = 0
+        self.send_times = deque(maxlen=1000)
+        self.latencies = deque(maxlen=1000)
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="MotorCommandDispatcher", daemon=True)
+        self.thread.start()
+
+    def submit(self, velocity):
+        with self.condition:
+            if self.pending is not None:
+                self.n_coalesced += 1
+                self.pending = (velocity, self.pending[1])
+            else:
+                self.pending = (velocity, time.perf_counter())
+            self.n_submitted += 1
+            self.condition.notify()
+
+    def stop(self):
+        if self.thread is None:
+            return
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join()
+        self.thread = None
+
+    def run(self):
+        while True:
+            with self.condition:
+                # Wait for a target, and until the minimum interval since the last command has passed
+                while self.running:
+                    if self.pending is not None:
+                        wait = self.last_send_time + self.min_interval - time.perf_counter()
+                        if wait <= 0:
+                            break
+                        self.condition.wait(wait)
+                    else:
+                        self.condition.wait()
+                if self.pending is None:
+                    return  # Stopped and nothing left to send
+                velocity, submit_time = self.pending
+                self.pending = None
+                stopping = not self.running
+
+            # Send outside the lock, so submit() never waits for the USB communication
+            if velocity != self.last_sent:
+                self.motor.RunSetVelocity(velocity)
+                done = time.perf_counter()
+                self.last_sent = velocity
+                self.last_send_time = done
+                self.n_sent += 1
+                self.send_times.append(done)
+                self.latencies.append(done - submit_time)
+            if stopping:
+                return
+
+    def stats(self):
+        now = time.perf_counter()
+        recent = [t for t in self.send_times if now - t <= 1.0]
+        latencies_ms = np.array(self.latencies) * 1000.0
+        return {
+            "command_rate_hz": float(len(recent)),  # Commands sent in the last second
+            "latency_mean_ms": float(latencies_ms.mean()) if len(latencies_ms) else None,
+            "latency_p95_ms": float(np.percentile(latencies_ms, 95)) if len(latencies_ms) else None,
+            "latency_max_ms": float(latencies_ms.max()) if len(latencies_ms) else None,
+            "submitted": self.n_submitted,
+            "sent": self.n_sent,
+            "coalesced": self.n_coalesced,
+        }
@@ -0,0 +1,104 @@
+"""
+MotorTelemetry Class
+
+This class logs the state of the motor (actual position and velocity of the EPOS4) during a recording, so the motion
+of the UMR can be related to the rotation of the field. The motor is polled on a dedicated thread at a fixed rate
+(absolute deadlines, so the sample times don't drift), and every sample is stamped with the same clock as the
+recorder timestamps (time.perf_counter, relative to the start of the recording).
+
+The samples are stored in a preallocated numpy structured array (doubled in size when it is full), so polling
+doesn't allocate python objects per sample. When the recording stops, the samples are saved next to the recording
+as <filename>_motor.csv (or as a binary .npy file).
+
+Methods:
+- __init__(motor, rate_hz, capacity): Initializes the logger with the motor, the polling rate and the initial buffer size.
+- start(t0): Starts polling on a background thread. t0 is the perf_counter time of the start of the recording.
+- stop(): Stops polling and waits for the thread to finish.
+- samples(): Returns the recorded samples (a view of the buffer).
+- save(path): Saves the samples to a CSV file, or to a binary .npy file if the path ends with .npy.
+"""
+
+import numpy as np
+import threading
+import time
+import csv
+
+SAMPLE_DTYPE = np.dtype([("time", np.float64), ("position", np.int32), ("velocity", np.int32), ("ok", np.bool_)])
+
+class MotorTelemetry:
+    def __init__(self, motor, rate_hz=200, capacity=100000):
+        self.motor = motor
+        self.rate_hz = rate_hz
+        self.buffer = np.zeros(capacity, dtype=SAMPLE_DTYPE)
+        self.n_samples = 0
+        self.n_missed = 0  # Number of deadlines that were skipped because polling took too long
+        self.t0 = None
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def start(self, t0=None):
+        if self.thread is not None:
+            self.stop()
+        self.t0 = time.perf_counter() if t0 is None else t0
+        self.n_samples = 0
+        self.n_missed = 0
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.poll_loop, name="MotorTelemetry", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.thread is None:
+            return
+        self.stop_event.set()
+        self.thread.join()
+        self.thread = None
+        print(f"[INFO] Motor telemetry: {self.n_samples} samples, {self.n_missed} missed deadlines")
+
+    def poll_loop(self):
+        period = 1.0 / self.rate_hz
+        next_deadline = time.perf_counter()
+        while not self.stop_event.is_set():
+            # Sleep until the next absolute deadline (no drift from the time spent polling)
+            delay = next_deadline - time.perf_counter()
+            if delay > 0:
+                self.stop_event.wait(delay)
+                if self.stop_event.is_set():
+                    break
+
+            timestamp = time.perf_counter() - self.t0
+            position = self.motor.ReadPositionIs()
+            velocity = self.motor.ReadVelocityIs()
+            self.append(timestamp, position, velocity)
+
+            # Skip the deadlines that already passed if polling was too slow (instead of bursting to catch up)
+            next_deadline += period
+            now = time.perf_counter()
+            if now > next_deadline:
+                missed = int((now - next_deadline) / period) + 1
+                self.n_missed += missed
+                next_deadline += missed * period
+
+    def append(self, timestamp, position, velocity):
+        if self.n_samples == len(self.buffer):
+            # Full --> double the buffer (rare, so the copy doesn't matter)
+            self.buffer = np.concatenate((self.buffer, np.zeros(len(self.buffer), dtype=SAMPLE_DTYPE)))
+        sample = self.buffer[self.n_samples]
+        sample["time"] = timestamp
+        sample["position"] = position if position is not None else 0
+        sample["velocity"] = velocity if velocity is not None else 0
+        sample["ok"] = position is not None and velocity is not None
+        self.n_samples += 1
+
+    def samples(self):
+        return self.buffer[:self.n_samples]
+
+    def save(self, path):
+        samples = self.samples()
+        if path.endswith(".npy"):
+            np.save(path, samples)
+        else:
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["Timestamp (s)", "Position (inc)", "Velocity (rpm)", "Valid"])
+                writer.writerows(zip(samples["time"].tolist(), samples["position"].tolist(), samples["velocity"].tolist(), samples["ok"].astype(int).tolist()))
+        print(f"[INFO] Motor telemetry saved to {path}")
@@ -0,0 +1,148 @@
+"""
+PostProcessQueue Class
+
+This class runs the post-processing of recordings (tracking both videos, reconstructing the trajectory and saving
+the plots, see SessionPipeline) as jobs in worker processes, instead of inside the Tk button handler of the recorder. The recorder GUI
+and the camera preview keep running, so the operator can start the next recording while earlier sessions are
+still being processed.
+
+Every job has a status (queued, running, done, failed), the current stage and its progress. The workers send their
+progress over a managed queue, which is read in the GUI thread by poll(). The PostProcessQueueView class shows the
+jobs in the recorder window.
+
+NOTE: the tracker asks the user to select the box and the ROI, these windows are opened by the worker process.
+With the default of one worker, the jobs are processed one after another so only one job asks for a selection at a time.
+
+Methods (PostProcessQueue):
+- __init__(max_workers): Initializes the queue, the worker pool and the progress queue are started by the first job.
+- start(): Starts the worker pool and the progress queue (if they are not started yet).
+- submit(video_files, undistort, grayscale): Adds a job for a recording (the videos of all cameras, cam1 first), returns the job id.
+- poll(): Processes the progress messages and finished jobs, returns the job list.
+- shutdown(wait): Stops the workers (after the queued jobs are done if wait=True) and processes their results.
+
+Methods (PostProcessQueueView):
+- __init__(window, queue, poll_ms): Adds the job list to the window and updates it every poll_ms.
+
+Functions:
+- process_session(job_id, cam1_file, undistort, progress_queue, trace, grayscale): The job that runs in a worker process.
+  If tracing is enabled in the recorder (see Tracing), the spans of the worker are added to the trace of the recorder.
+"""
+
+import tkinter as tk
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import itertools
+import queue
+import os
+from include import Tracing
+
+def process_session(job_id, cam1_file, undistort, progress_queue, trace=False, grayscale=False):
+    # Runs in a worker process. The analysis modules are imported here, so the recorder doesn't have to load them
+    from include.SessionPipeline import SessionPipeline
+    if trace:
+        Tracing.enable()
+
+    # Track, reconstruct and save the plots (no windows in a worker). The stages that are up to date according
+    # to the session manifest are skipped. The pipeline finds the videos of the other cameras next to the cam1 video
+    pipeline = SessionPipeline(cam1_file, undistort=undistort, grayscale=grayscale)
+    pipeline.run(progress_callback=lambda stage, progress: progress_queue.put((job_id, stage, progress)))
+    return pipeline.path("_Trajectory.csv"), Tracing.events()
+
+class PostProcessQueue:
+    def __init__(self, max_workers=1):
+        # The pool and the manager (a process of its own) are started by the first job, not at the startup of the recorder
+        self.max_workers = max_workers
+        self.pool = None
+        self.manager = None
+        self.progress_queue = None
+        self.jobs = {}
+        self.job_ids = itertools.count(1)
+
+    def start(self):
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            self.manager = multiprocessing.Manager()  # A managed queue can be passed to the worker processes
+            self.progress_queue = self.manager.Queue()
+
+    def submit(self, video_files, undistort=False, grayscale=False):
+        self.start()
+        job_id = next(self.job_ids)
+        cam1_file = video_files[0]
+        name = os.path.basename(cam1_file).replace("_cam1.avi", "")
+        future = self.pool.submit(process_session, job_id, cam1_file, undistort, self.progress_queue, Tracing.is_enabled(), grayscale)
+        self.jobs[job_id] = {"name": name, "status": "queued", "stage": "", "progress": 0.0, "future": future, "result": None, "error": None}
+        print(f"[INFO] Post-processing job {job_id} queued: {name}")
+        return job_id
+
+    def poll(self):
+        if self.pool is None:
+            return self.jobs
+
+        # Progress messages from the workers
+        while True:
+            try:
+                job_id, stage, progress = self.progress_queue.get_nowait()
+            except queue.Empty:
+                break
+            job = self.jobs[job_id]
+            if job["status"] == "queued":
+                job["status"] = "running"
+            job["stage"] = stage
+            job["progress"] = progress
+
+        # Finished jobs
+        for job_id, job in self.jobs.items():
+            future = job["future"]
+            if job["status"] in ("done", "failed") or not future.done():
+                continue
+            if future.exception() is not None:
+                job["status"] = "failed"
+                job["error"] = repr(future.exception())
+                print(f"[WARNING] Post-processing job {job_id} failed: {job['error']}")
+            else:
+                job["status"] = "done"
+                job["progress"] = 1.0
+                job["result"], events = future.result()
+                Tracing.add_events(events)
+                print(f"[INFO] Post-processing job {job_id} done: {job['result']}")
+        return self.jobs
+
+    def shutdown(self, wait=True):
+        if self.pool is None:
+            return
+        self.pool.shutdown(wait=wait, cancel_futures=not wait)
+        self.poll()  # Last progress messages and results of the finished jobs
+        self.manager.shutdown()
+
+class PostProcessQueueView:
+    def __init__(self, window, queue, poll_ms=200):
+        self.window = window
+        self.queue = queue
+        self.poll_ms = poll_ms
+
+        # Label and list with one line per post-processing job
+        self.label = tk.Label(window, text="Post-processing:")
+        self.label.pack()
+        self.listbox = tk.Listbox(window, height=4, width=90)
+        self.listbox.pack(pady=(0, 10))
+        self.update()
+
+    def update(self):
+        if not self.window.winfo_exists():
+            return
+        jobs = self.queue.poll()
+        lines = []
+        for job_id, job in jobs.items():
+            line = f"#{job_id} {job['name']}: {job['status']}"
+            if job["status"] == "running":
+                line += f" - {job['stage']} {job['progress'] * 100:.0f}%"
+            elif job["status"] == "failed":
+                line += f" - {job['error']}"
+            lines.append(line)
+
+        # Only rebuild the list if something changed
+        if lines != list(self.listbox.get(0, tk.END)):
+            self.listbox.delete(0, tk.END)
+            for line in lines:
+                self.listbox.insert(tk.END, line)
+        self.window.after(self.poll_ms, self.update)
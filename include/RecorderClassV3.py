@@ -1,20 +1,44 @@
 """
 DualCameraApp Class
 
-This class provides a graphical user interface (GUI) for recording video using two cameras 
-simultaneously. It allows the user to control the recording process, including the ability 
-to start/stop recording, adjust the camera focus, and save the recorded video files. The 
-recorded files are saved in AVI format, and the filenames are generated dynamically based 
+This class provides a graphical user interface (GUI) for recording video using multiple cameras (two by default)
+simultaneously. It allows the user to control the recording process, including the ability
+to start/stop recording, adjust the camera focus, and save the recorded video files. The
+recorded files are saved in AVI format, and the filenames are generated dynamically based
 on user input.
 
+The cameras come from the camera configuration (cameras.json, see include/CameraWorker.py), so a third or fourth view
+is added there without changing the code. Every camera is captured (and, while recording, encoded) by its own
+CameraWorker thread, so the cameras run in parallel and the GUI only shows their newest frames. A recording gives
+<filename>_<camera>.avi per camera and <filename>_timestamps.csv with one column "Timestamp <camera> (s)" per camera.
+
+Only the box region of a camera can be recorded ("Select crop" before recording, or "crop" in cameras.json), which
+makes the encoding, the files and the decoding in the tracker smaller in proportion to the area. The crop (padded by
+CROP_PADDING pixels) is shown in the preview and saved as <filename>_<camera>_crop.csv (X, Y, Width, Height); the
+tracker adds its offset back, so the locations and the box stay in full-frame pixels.
+
+A camera can be recorded in grayscale ("grayscale": true in cameras.json, e.g. with "XVID" or the raw "Y800" codec,
+FFV1 is lossless but slow to decode): a third of the bytes per frame, and the grayscale tracker (GRAYSCALE_TRACKING
+in main.py) reads Y800 and FFV1 recordings without any color conversion. The preview stays in color.
+
+When a recording stops, the frame index of every video is saved as <filename>_<camera>_index.npy (byte offset,
+keyframe and timestamp per frame, see include/FrameIndex.py) for fast seeking in the tracker and the review tools.
+
 Methods:
-- __init__(window): Initializes the application window, sets up the GUI components, and initializes cameras.
-- set_focus1(val): Sets the focus of camera 1 based on the slider value.
-- set_focus2(val): Sets the focus of camera 2 based on the slider value.
+- __init__(window, calibration_file, camera_config_file): Initializes the application window, sets up the GUI components, and starts the camera workers.
+- set_focus(index, val): Sets the focus of a camera based on its slider value.
+- select_crops(): Lets the user select the recorded region of every camera in its newest frame (an empty selection records the full frame).
 - set_recording_done_callback(callback): Sets a callback function to be called when the recording is finished.
+- set_recording_started_callback(callback): Sets a callback function that is called with the start time (time.perf_counter) when a recording starts.
+- set_motor_telemetry(telemetry): Sets a MotorTelemetry logger that runs during the recording and is saved as <filename>_motor.csv.
+- enable_frame_bus(n_slots): Captures the frames into a shared-memory FrameBus per camera, so other processes can read them without a copy.
+- frame_bus_specs(): Returns the specs of the frame buses (one per camera), to attach a FrameBusReader in another process.
+- add_frame_listener(listener): Adds a function that is called with (frame of every camera..., capture_time) as soon as every
+  camera has a new frame (e.g. LivePositionStream.on_frames). The capture time (time.perf_counter) is the one of the
+  oldest of these frames, listeners should return quickly.
 - toggle_recording(): Starts or stops the recording process.
-- update_frame(): Continuously updates the frames from both cameras in the GUI.
-- on_closing(): Releases the video capture objects and destroys the window when the application is closed.
+- update_frame(): Continuously updates the frames from all cameras in the GUI (undistorted with the cached remap maps).
+- on_closing(): Stops the camera workers and destroys the window when the application is closed.
 
 Author: Stijn Kolkman (s.y.kolkman@student.utwente.nl)
 Date: April 2025
@@ -25,62 +49,53 @@ import tkinter as tk
 from tkinter import ttk
 from PIL import Image, ImageTk
 import time
-import numpy as np 
 import os
-import subprocess 
+import subprocess
 import csv
+from itertools import zip_longest
+from include.UndistortMapCache import UndistortMapCache
+from include.CameraCalibration import load_calibration, DEFAULT_CALIBRATION_FILE
+from include.CameraWorker import CameraWorker, load_camera_config, DEFAULT_CAMERA_CONFIG_FILE
+from include.FrameIndex import build_index
+from include import Tracing
 
 cap_api = cv2.CAP_DSHOW  # Found to be the best API for using with logitech C920 in Windows. Other options are also possible
 
+PREVIEW_SIZE = (576, 324)  # Size of every camera preview in the GUI
+PREVIEW_COLUMNS = 2        # Number of previews next to each other
+CROP_PADDING = 32          # Margin (pixels) around a selected crop, so the object can't leave the recorded region at the box edge
+
 class DualCameraApp:
-    def __init__(self, window):
+    def __init__(self, window, calibration_file=DEFAULT_CALIBRATION_FILE, camera_config_file=DEFAULT_CAMERA_CONFIG_FILE):
         self.window = window
-        self.window.title("Dual Camera Recorder")
+        self.window.title("Camera Recorder")
         self.recording = False
-        self.recorded_file_names = None 
-        self.N_frames_cam1 = 0
-        self.N_frames_cam2 = 0
+        self.recorded_file_names = None
         self.record_start_time = None
-
-        # Define the size of the GUI
-        self.window.geometry("1250x700")
-
-        # Here the camera's are defined. Camera's can have different numbers on different computers, so change the number if needed (default is cap1 = 1, cap2 = 0)
-        self.cap1 = cv2.VideoCapture(1, cap_api) # cap1 needs to be the bottom camera!!
-        self.cap2 = cv2.VideoCapture(0, cap_api)
-
-        # Camera resolution
-        self.cap1.set(cv2.CAP_PROP_FRAME_WIDTH, 1920)
-        self.cap1.set(cv2.CAP_PROP_FRAME_HEIGHT, 1080)
-        self.cap2.set(cv2.CAP_PROP_FRAME_WIDTH, 1920)
-        self.cap2.set(cv2.CAP_PROP_FRAME_HEIGHT, 1080)
-
-        # Camera framerate
-        self.cap1.set(cv2.CAP_PROP_FPS, 30)
-        self.cap2.set(cv2.CAP_PROP_FPS, 30)
-
-        # Camera compression technique --> If turned off the FPS will be really low (around 5 fps)
-        fourcc = cv2.VideoWriter_fourcc(*'MJPG')
-        self.cap1.set(cv2.CAP_PROP_FOURCC, fourcc)
-        self.cap2.set(cv2.CAP_PROP_FOURCC, fourcc)
-
-        #Turns off the autofocus 
-        self.cap1.set(cv2.CAP_PROP_AUTOFOCUS, 0)
-        self.cap2.set(cv2.CAP_PROP_AUTOFOCUS, 0)
-
-        # Camera calibration parameters
-        self.camera_matrix1 = np.array([
-            [1397.9,   0, 953.6590],
-            [   0, 1403.0, 555.1515],
-            [   0,   0,   1]
-        ], dtype=np.float64)
-        self.dist_coeffs1 = np.array([0.1216, -0.1727, 0.00, 0.00, 0.0], dtype=np.float64)
-        self.camera_matrix2 = np.array([
-            [1397.9,   0, 953.6590],
-            [   0, 1403.0, 555.1515],
-            [   0,   0,   1]
-        ], dtype=np.float64)
-        self.dist_coeffs2 = np.array([0.1216, -0.1727, 0.00, 0.00, 0.0], dtype=np.float64)
+        self.motor_telemetry = None
+        self.frame_listeners = []
+        self.frame_buses = None
+
+        # Here the camera's are defined (cameras.json). Camera's can have different numbers on different computers, so change the index there if needed
+        # NOTE: cam1 needs to be the bottom camera!!
+        self.camera_config = load_camera_config(camera_config_file)
+        self.workers = [CameraWorker(config, cap_api) for config in self.camera_config]
+        self.camera_names = [worker.name for worker in self.workers]
+
+        # Define the size of the GUI (one row of previews and two focus sliders fit in the default size)
+        n_rows = -(-len(self.workers) // PREVIEW_COLUMNS)
+        height = 700 + (n_rows - 1) * (PREVIEW_SIZE[1] + 10) + max(len(self.workers) - 2, 0) * 70
+        self.window.geometry(f"1250x{height}")
+
+        # Camera calibration parameters (made with include/CameraCalibration.py), cameras without a calibration are shown distorted
+        calibration = load_calibration(calibration_file)
+        self.camera_matrices = {name: calibration["cameras"][name]["camera_matrix"] for name in self.camera_names if name in calibration["cameras"]}
+        self.dist_coeffs = {name: calibration["cameras"][name]["dist_coeffs"] for name in self.camera_names if name in calibration["cameras"]}
+
+        # Undistort the preview with precomputed remap maps (built once per calibration and preview size), one cache
+        # per calibrated camera, as every camera can be calibrated at its own resolution
+        self.undistort_preview = True
+        self.undistort_caches = {name: UndistortMapCache(calibration_size=calibration["cameras"][name]["image_size"]) for name in self.camera_matrices}
 
         # === GUI components ===
         # Label to display the text "File name:"
@@ -92,54 +107,53 @@ class DualCameraApp:
         self.filename_entry.insert(0, "Recording")
         self.filename_entry.pack(pady=(0, 10))
 
-        # Frame container that holds the two video display labels side by side
+        # Frame container that holds the video display labels, PREVIEW_COLUMNS side by side
         self.frame_container = tk.Frame(window)
         self.frame_container.pack()
-
-        # Label for displaying the first video feed, placed on the left side of the frame container
-        self.video_label1 = tk.Label(self.frame_container)
-        self.video_label1.pack(side="left", padx=10)
-
-        # Label for displaying the second video feed, placed on the right side of the frame container
-        self.video_label2 = tk.Label(self.frame_container)
-        self.video_label2.pack(side="right", padx=10)
-
-        # Label and slider for adjusting the focus of the first camera
-        self.focus_label1 = tk.Label(window, text="Focus Camera 1")
-        self.focus_label1.pack()
-
-        # Slider for setting the focus of Camera 1, with a range from 0 to 255
-        self.focus_slider1 = ttk.Scale(window, from_=0, to=255, orient='horizontal', length=400, command=self.set_focus1)
-        self.focus_slider1.set(58)  # Set the default focus value for Camera 1 to 58
-        self.focus_slider1.pack()
-
-        # Label to display the current focus value for Camera 1
-        self.focus_value_label1 = tk.Label(window, text=f"Focus Camera 1 Value: {self.focus_slider1.get()}")
-        self.focus_value_label1.pack()
-
-        # Label and slider for adjusting the focus of the second camera
-        self.focus_label2 = tk.Label(window, text="Focus Camera 2")
-        self.focus_label2.pack()
-
-        # Slider for setting the focus of Camera 2, with a range from 0 to 255
-        self.focus_slider2 = ttk.Scale(window, from_=0, to=255, orient='horizontal', length=400, command=self.set_focus2)
-        self.focus_slider2.set(91)  # Set the default focus value for Camera 2 to 91
-        self.focus_slider2.pack()
-
-        # Label to display the current focus value for Camera 2
-        self.focus_value_label2 = tk.Label(window, text=f"Focus Camera 2 Value: {self.focus_slider2.get()}")
-        self.focus_value_label2.pack()
-
-        # Button to start or stop recording
-        self.record_button = tk.Button(window, text="Start recording", command=self.toggle_recording, bg="red", fg="white")
-        self.record_button.pack(pady=10)
+        self.video_labels = []
+        for i in range(len(self.workers)):
+            # The text is shown until the first frame of the camera (the cameras are opened in the background)
+            video_label = tk.Label(self.frame_container, text=f"Opening {self.camera_names[i]}...")
+            video_label.grid(row=i // PREVIEW_COLUMNS, column=i % PREVIEW_COLUMNS, padx=10)
+            self.video_labels.append(video_label)
+
+        # Label, slider (range from 0 to 255) and value label for the focus of every camera, the default focus comes from the configuration
+        self.focus_sliders = []
+        self.focus_value_labels = []
+        for i, config in enumerate(self.camera_config):
+            tk.Label(window, text=f"Focus Camera {i + 1}").pack()
+            focus_slider = ttk.Scale(window, from_=0, to=255, orient='horizontal', length=400)
+            focus_slider.pack()
+            focus_value_label = tk.Label(window, text="")
+            focus_value_label.pack()
+            self.focus_sliders.append(focus_slider)
+            self.focus_value_labels.append(focus_value_label)
+
+            # The slider is set before its command is bound, so it doesn't send a focus to the camera: the worker applies
+            # the configured focus itself, and without one ("focus": null) the camera keeps its own focus
+            if config["focus"] is not None:
+                focus_slider.set(config["focus"])
+                focus_value_label.config(text=f"Focus Camera {i + 1} Value: {float(config['focus']):.2f}")
+            focus_slider.config(command=lambda val, i=i: self.set_focus(i, val))
+
+        # Buttons to select the recorded region of the cameras and to start or stop recording
+        self.button_container = tk.Frame(window)
+        self.button_container.pack(pady=10)
+        self.crop_button = tk.Button(self.button_container, text="Select crop", command=self.select_crops)
+        self.crop_button.pack(side="left", padx=5)
+        self.record_button = tk.Button(self.button_container, text="Start recording", command=self.toggle_recording, bg="red", fg="white")
+        self.record_button.pack(side="left", padx=5)
 
         # Label to display the names of the recorded files (empty initially)
         self.recorded_files_label = tk.Label(window, text="", fg="blue")
         self.recorded_files_label.pack(pady=10)
 
-        #Initiate timestamps array
-        self.timestamps = []
+        # Start the capture threads, they open the cameras in parallel while the window is already shown.
+        # The sequence numbers of the last shown frame and the last frames given to the listeners
+        self.shown_sequences = [0] * len(self.workers)
+        self.listener_sequences = [0] * len(self.workers)
+        for worker in self.workers:
+            worker.start()
 
         # Method to continuously update the frame (e.g., display live video feed)
         self.update_frame()
@@ -147,81 +161,146 @@ class DualCameraApp:
         # Ensuring proper cleanup
         self.window.protocol("WM_DELETE_WINDOW", self.on_closing)
 
-    def set_focus1(self, val):
-        # Update the focus on camera1
+    def set_focus(self, index, val):
+        # Update the focus of the camera and its label
         focus_value = float(val)
-        self.cap1.set(cv2.CAP_PROP_FOCUS, focus_value)
-        if hasattr(self, 'focus_value_label1'):  # Ensure the label exists before updating
-            # Update the label
-            self.focus_value_label1.config(text=f"Focus Camera 1 Value: {focus_value:.2f}")
+        self.workers[index].set_focus(focus_value)
+        if index < len(self.focus_value_labels):  # Ensure the label exists before updating
+            self.focus_value_labels[index].config(text=f"Focus Camera {index + 1} Value: {focus_value:.2f}")
 
-    def set_focus2(self, val):
-        # Update the focus on camera2
-        focus_value = float(val)
-        self.cap2.set(cv2.CAP_PROP_FOCUS, focus_value)
-        if hasattr(self, 'focus_value_label2'):  # Ensure the label exists before updating
-            # Update the label
-            self.focus_value_label2.config(text=f"Focus Camera 2 Value: {focus_value:.2f}")
+    def select_crops(self):
+        # Select the box of every camera in its newest full frame, like the box selection of the tracker
+        if self.recording:
+            return
+        for worker in self.workers:
+            _, frame, _ = worker.latest()
+            if frame is None:
+                continue
+            title = f"Select the crop of {worker.name} (empty = full frame)"
+            crop = cv2.selectROI(title, frame, fromCenter=False, showCrosshair=True)
+            cv2.destroyWindow(title)
+            crop = worker.set_crop(crop if crop[2] > 0 and crop[3] > 0 else None, CROP_PADDING)
+            print(f"[INFO] {worker.name} records {'the full frame' if crop is None else f'crop {crop}'}")
 
     def set_recording_done_callback(self, callback):
         # needed to send to  main that the recording is done and the tracker should start
         self.recording_done_callback = callback
 
+    def set_recording_started_callback(self, callback):
+        # Called with the start time of the recording, e.g. to start a velocity profile (VelocityProfilePlayer.start)
+        self.recording_started_callback = callback
+
+    def set_motor_telemetry(self, telemetry):
+        # The telemetry uses the same clock (time.perf_counter, relative to the start of the recording) as the frame timestamps
+        self.motor_telemetry = telemetry
+
+    def enable_frame_bus(self, n_slots=8):
+        # The frames are decoded straight into the shared-memory slots and the preview and the writer use the slot
+        # (no extra copy). NOTE: a slot is reused after n_slots frames, so the frame listeners get a copy
+        from include.FrameBus import FrameBus
+        self.frame_buses = []
+        for worker in self.workers:
+            bus = FrameBus(worker.name, shape=(worker.config["height"], worker.config["width"], 3), n_slots=n_slots)
+            worker.frame_bus = bus
+            self.frame_buses.append(bus)
+
+    def frame_bus_specs(self):
+        return [bus.spec() for bus in self.frame_buses] if self.frame_buses is not None else None
+
+    def add_frame_listener(self, listener):
+        # The listeners can keep the frames and use them on another thread: the frames of the cameras are not changed
+        # afterwards, and with the frame bus (where a slot is overwritten after n_slots frames) they get a copy
+        self.frame_listeners.append(listener)
+
     def toggle_recording(self):
-        self.recording = not self.recording
         filename = self.filename_entry.get().strip() or "recording"
         output_dir = os.path.join(os.getcwd(), filename)
         os.makedirs(output_dir, exist_ok=True)
 
-        cam1_filename = os.path.join(output_dir, f"{filename}_cam1.avi")
-        cam2_filename = os.path.join(output_dir, f"{filename}_cam2.avi")
-
-        if self.recording:
-            # Create video writer
-            self.N_frames_cam1 = 0
-            self.N_frames_cam2 = 0
-            self.record_start_time = time.time()
+        video_filenames = [os.path.join(output_dir, f"{filename}_{name}.avi") for name in self.camera_names]
+
+        if not self.recording:
+            # Open the video writers of all cameras before anything changes, so a camera that can't record
+            # (e.g. a codec that is not available) doesn't start a recording of only some of the cameras
+            writers = []
+            try:
+                for worker, video_filename in zip(self.workers, video_filenames):
+                    writers.append(worker.open_writer(video_filename))
+            except RuntimeError as error:
+                for writer, video_filename in zip(writers, video_filenames):
+                    writer.release()
+                    if os.path.exists(video_filename):
+                        os.remove(video_filename)  # Empty video of a recording that didn't start
+                print(f"[WARNING] Recording not started: {error}")
+                self.recorded_files_label.config(text=f"Recording not started: {error}")
+                return
+
+            # Start the video writers of all cameras with the same start time
+            self.recording = True
+            self.record_start_time = time.perf_counter()  # Monotonic clock, also used by the motor telemetry
             self.record_button.config(text="Stop recording", bg="gray")
+            self.crop_button.config(state="disabled")
             self.recorded_files_label.config(text="Recording in progress...")
-            print(f"Started recording: {cam1_filename} & {cam2_filename}")
-            
-            self.out1 = cv2.VideoWriter(cam1_filename, cv2.VideoWriter_fourcc(*'XVID'), 30, (1920, 1080))
-            self.out2 = cv2.VideoWriter(cam2_filename, cv2.VideoWriter_fourcc(*'XVID'), 30, (1920, 1080))
+            print(f"Started recording: {' & '.join(video_filenames)}")
+
+            for worker, video_filename, writer in zip(self.workers, video_filenames, writers):
+                worker.start_recording(video_filename, self.record_start_time, writer)
+
+                # Save the crop next to the video (and remove the crop of an earlier recording with the same name)
+                crop_filename = video_filename.replace(".avi", "_crop.csv")
+                if worker.crop is not None:
+                    with open(crop_filename, "w", newline="") as f:
+                        writer = csv.writer(f)
+                        writer.writerow(["X", "Y", "Width", "Height"])
+                        writer.writerow(worker.crop)
+                elif os.path.exists(crop_filename):
+                    os.remove(crop_filename)
+
+            if self.motor_telemetry is not None:
+                self.motor_telemetry.start(self.record_start_time)
+            if hasattr(self, 'recording_started_callback'):
+                self.recording_started_callback(self.record_start_time)
 
         else:
-            # Stop recording and calculate FPS
-            duration = time.time() - self.record_start_time
-            fps_value = self.N_frames_cam1 / duration if duration > 0 else 30.0
-            print(f"Duration: {duration:.2f}s — FPS: {fps_value:.2f}")
-
-            # Adjust the FPS value of the video writers after recording
-            self.out1.set(cv2.CAP_PROP_FPS, fps_value)
-            self.out2.set(cv2.CAP_PROP_FPS, fps_value)
-            self.out1.release()
-            self.out2.release()
-            #self.fix_video_fps_inplace(cam1_filename, fps_value)
-            #self.fix_video_fps_inplace(cam2_filename, fps_value)
-            #print(f'Fixed video 1 and 2 fps to {fps_value}')
+            # Stop recording, the workers set the measured FPS of their video
+            self.recording = False
+            with Tracing.span("close videos", "recorder"):
+                timestamps = [worker.stop_recording() for worker in self.workers]
+            duration = time.perf_counter() - self.record_start_time
+            frames_text = ", ".join(f"{name}: {len(ts)} frames" for name, ts in zip(self.camera_names, timestamps))
+            print(f"Duration: {duration:.2f}s — {frames_text}")
 
             self.record_button.config(text="Start recording", bg="red")
-            files_text = f"Recorded files:\n{cam1_filename}\n{cam2_filename}"
+            self.crop_button.config(state="normal")
+            files_text = "Recorded files:\n" + "\n".join(video_filenames)
             self.recorded_files_label.config(text=files_text)
             print("Recording done and saved")
-            self.recorded_file_names = (cam1_filename, cam2_filename)  # Store filenames
+            self.recorded_file_names = tuple(video_filenames)  # Store filenames
 
-            # Save timestamps to CSV
+            # Save timestamps to CSV, one column per camera (a camera can have fewer frames, the rest of its column is empty)
             timestamp_filename = os.path.join(output_dir, f"{filename}_timestamps.csv")
-            with open(timestamp_filename, "w", newline="") as f:
+            with Tracing.span("write csv", "recorder"), open(timestamp_filename, "w", newline="") as f:
                 print('[INFO] Saving timestamps to CSV file...')
                 writer = csv.writer(f)
-                writer.writerow(["Frame", "Timestamp (s)"])
-                for i, ts in enumerate(self.timestamps):
-                    #print(self.timestamps)
-                    writer.writerow([i, ts])
-            self.timestamps = []  # Clear timestamps after saving
+                writer.writerow(["Frame"] + [f"Timestamp {name} (s)" for name in self.camera_names])
+                for i, row in enumerate(zip_longest(*timestamps, fillvalue="")):
+                    writer.writerow([i, *row])
             print(f"[INFO] Timestamps saved to {timestamp_filename}")
 
-            # Call the callback when recording is done and change the fps to the correct value, but only if files are recorded
+            # Frame index per video (only reads the index at the end of the AVI, so this is fast)
+            with Tracing.span("write index", "recorder"):
+                for video_filename, camera_timestamps in zip(video_filenames, timestamps):
+                    try:
+                        build_index(video_filename, camera_timestamps)
+                    except (ValueError, OSError) as error:
+                        print(f"[WARNING] No frame index for {video_filename}: {error}")
+
+            # Stop the motor telemetry and save it next to the recording
+            if self.motor_telemetry is not None:
+                self.motor_telemetry.stop()
+                self.motor_telemetry.save(os.path.join(output_dir, f"{filename}_motor.csv"))
+
+            # Call the callback when recording is done, but only if files are recorded
             if hasattr(self, 'recording_done_callback') and self.recorded_file_names:
                 self.recording_done_callback()  # Notify that recording is done
 
@@ -229,48 +308,54 @@ class DualCameraApp:
         # Check if the window is still open before updating
         if not self.window.winfo_exists():
             return  # Exit the function if the window is closed
-        
-         #Read the frames
-        ret1, frame1 = self.cap1.read()
-        ret2, frame2 = self.cap2.read()
-
-        if self.recording and ret1 and ret2:
-            # Save frames
-            self.N_frames_cam1 += 1
-            self.N_frames_cam2 += 1
-            self.out1.write(frame1)
-            self.out2.write(frame2)
-
-            # Only log timestamp if both frames were successfully saved
-            timestamp = time.time() - self.record_start_time
-            #print(f"Frame {self.N_frames_cam1} recorded at timestamp: {timestamp:.2f}s")
-            self.timestamps.append(timestamp)
-
-        #Undistort the frames --> I UNDISTORT IN THE TRAJECTORY GENERATOR CLASS
-        #frame1 = cv2.undistort(frame1, self.camera_matrix1, self.dist_coeffs1)
-        #frame2 = cv2.undistort(frame2, self.camera_matrix2, self.dist_coeffs2)
-
-        if ret1:
-            # Update the GUI with the frame --> first the frame is resized to fit in the GUI 
-            frame1_resized = cv2.resize(frame1, (576, 324), interpolation=cv2.INTER_LINEAR)
-            frame_rgb1 = cv2.cvtColor(frame1_resized, cv2.COLOR_BGR2RGB)
-            img1 = ImageTk.PhotoImage(Image.fromarray(frame_rgb1))
-            self.video_label1.imgtk = img1
-            self.video_label1.config(image=img1)
-
-        if ret2:
-            # Update the GUI with the frame --> first the frame is resized to fit in the GUI     
-            frame2_resized = cv2.resize(frame2, (576, 324), interpolation=cv2.INTER_LINEAR)
-            frame_rgb2 = cv2.cvtColor(frame2_resized, cv2.COLOR_BGR2RGB)
-            img2 = ImageTk.PhotoImage(Image.fromarray(frame_rgb2))
-            self.video_label2.imgtk = img2
-            self.video_label2.config(image=img2)
+
+        # Newest frame of every camera (captured by the worker threads)
+        latest = [worker.latest() for worker in self.workers]
+
+        # The listeners get a frame of every camera, as soon as all cameras have a new frame
+        if self.frame_listeners and all(sequence > last for (sequence, _, _), last in zip(latest, self.listener_sequences)):
+            self.listener_sequences = [sequence for sequence, _, _ in latest]
+            capture_time = min(t for _, _, t in latest)
+            frames = [frame for _, frame, _ in latest]
+            if self.frame_buses is not None:
+                frames = [frame.copy() for frame in frames]  # Views on the ring slots, the capture thread reuses them
+            for listener in self.frame_listeners:
+                listener(*frames, capture_time)
+
+        # The recorded frames stay distorted --> the tracked points are undistorted in the trajectory generator class.
+        # Only the preview is undistorted, after resizing, so it costs a single small remap per frame
+        for i, (sequence, frame, _) in enumerate(latest):
+            if sequence == self.shown_sequences[i]:
+                continue  # No new frame of this camera
+            self.shown_sequences[i] = sequence
+            name = self.camera_names[i]
+
+            # Update the GUI with the frame --> first the frame is resized to fit in the GUI
+            with Tracing.span("preview", "recorder"):
+                frame_resized = cv2.resize(frame, PREVIEW_SIZE, interpolation=cv2.INTER_LINEAR)
+                if self.undistort_preview and name in self.camera_matrices:
+                    with Tracing.span("undistort", "recorder"):
+                        frame_resized = self.undistort_caches[name].undistort(frame_resized, self.camera_matrices[name], self.dist_coeffs[name])
+
+                # Show the recorded region (the crop is in full-frame pixels)
+                crop = self.workers[i].crop
+                if crop is not None:
+                    sx, sy = PREVIEW_SIZE[0] / frame.shape[1], PREVIEW_SIZE[1] / frame.shape[0]
+                    x, y, w, h = crop
+                    cv2.rectangle(frame_resized, (int(x * sx), int(y * sy)), (int((x + w) * sx), int((y + h) * sy)), (0, 255, 255), 1)
+                frame_rgb = cv2.cvtColor(frame_resized, cv2.COLOR_BGR2RGB)
+                img = ImageTk.PhotoImage(Image.fromarray(frame_rgb))
+                self.video_labels[i].imgtk = img
+                self.video_labels[i].config(image=img)
 
         self.window.after(10, self.update_frame)
 
     def on_closing(self):
-        self.cap1.release()
-        self.cap2.release()
+        for worker in self.workers:
+            worker.stop()
+        if self.frame_buses is not None:
+            for bus in self.frame_buses:
+                bus.close()
         self.window.destroy()
 
 # Used if the recorder class is called seperately
@@ -0,0 +1,412 @@
+"""
+ReviewPlayer Class
+
+A tool to check the tracking of a recording: plays all camera videos of a session side by side, aligned by their
+capture timestamps, with the tracking results drawn on top. It replaces playing the _tracking.avi files one by one:
+the player can pause, step forward and backward and scrub, and the overlays are drawn from the CSV files, so no
+annotated videos have to be encoded for it.
+
+Main Workflow:
+- The session is found from the cam1 video (<base>_cam1.avi), the other cameras from <base>_camN.avi.
+- The timeline is the timestamps of cam1. Every camera shows the frame captured nearest to the current time
+  (timestamps from the frame index, see FrameIndex). The videos are read with an IndexedVideoReader, so a jump only
+  decodes from the nearest keyframe (MJPG frames are decoded directly).
+- Every camera has a FramePrefetcher thread that decodes the requested frame and the next PREFETCH_FRAMES frames in
+  the play direction (stepping backward decodes the frames before it forward from their keyframe, in one pass).
+  The frames are resized to the panel size and kept in a FrameCache: an LRU cache with a memory budget, so
+  scrubbing back and forth over frames that were already shown doesn't decode again.
+- Overlays from <base>_<camera>_locations.csv (position, orientation, trail of the last TRAIL_FRAMES positions, grey
+  when the object was not found) and <base>_<camera>_box.csv, and the 3D position from <base>_Trajectory.csv on cam1.
+  The locations are in full-frame pixels, the offset of a cropped recording (<base>_<camera>_crop.csv) is removed.
+  NOTE: the videos are shown as recorded, locations of undistorted tracking can be off a little near the edges.
+- Keys: space plays/pauses, left/right arrow steps one frame (shift: one second).
+
+Methods (FrameCache):
+- __init__(budget_bytes): Initializes an empty cache with a memory budget.
+- get(key, count): Returns a cached frame (and marks it as recently used) or None, counted for the hit rate if count.
+- pin(owner, key): Keeps a frame in the cache (the requested frame of a camera, one per owner).
+- put(key, frame): Adds a frame, the least recently used frames (that are not pinned) are removed when the budget is exceeded.
+- stats(): Returns the number of frames, the used bytes and the hit rate.
+
+Methods (FramePrefetcher):
+- __init__(name, video_path, cache, size, prefetch): Opens the video of a camera, frames are resized to size.
+- start(): Starts the decoding thread.
+- request(frame_number, direction): Asks for a frame (and prefetching in the direction, 1 or -1). The requested frame
+  is pinned in the cache, so frames prefetched after it can't evict it before it is shown.
+- run(): Decodes the requested frames on the thread.
+- stop(): Stops the thread and releases the video.
+
+Methods (ReviewPlayer):
+- __init__(window, cam1_file, cache_mb, panel_size): Loads the session and builds the GUI.
+- load_overlays(cam): Loads the locations, box and crop offset of a camera.
+- set_position(position): Moves to a position on the timeline.
+- toggle_play(), step(frames): Playback controls.
+- draw_overlays(image, cam, frame_number): Draws the tracking results on a (resized) frame.
+- update(): Shows the frames of the current time and advances the playback (called with window.after).
+- on_closing(): Stops the prefetchers and closes the window.
+
+How to run:
+    python -m include.ReviewPlayer <base>_cam1.avi [--cache-mb 1024]
+"""
+
+import cv2
+import numpy as np
+import pandas as pd
+import tkinter as tk
+from PIL import Image, ImageTk
+from collections import OrderedDict
+import threading
+import argparse
+import time
+import csv
+import os
+import re
+from include.FrameIndex import IndexedVideoReader
+
+PANEL_SIZE = (640, 360)  # Maximum size of every camera panel (the aspect ratio of the video is kept)
+PANEL_COLUMNS = 2        # Number of panels next to each other
+PREFETCH_FRAMES = 30     # Frames decoded ahead of the current frame in the play direction
+TRAIL_FRAMES = 60        # Number of past positions drawn as trail
+
+def nearest_frame(timestamps, time_seconds):
+    # Index of the timestamp nearest to time_seconds (timestamps sorted)
+    i = int(np.searchsorted(timestamps, time_seconds))
+    if i >= len(timestamps):
+        return len(timestamps) - 1
+    if i > 0 and time_seconds - timestamps[i - 1] <= timestamps[i] - time_seconds:
+        return i - 1
+    return i
+
+class FrameCache:
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.frames = OrderedDict()  # key -> frame, least recently used first
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.pinned = {}  # owner -> key that is never evicted (the requested frame of every camera)
+        self.lock = threading.Lock()  # Filled by the prefetch threads, read by the GUI thread
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.frames
+
+    def get(self, key, count=True):
+        with self.lock:
+            frame = self.frames.get(key)
+            if frame is None:
+                self.misses += count
+                return None
+            self.frames.move_to_end(key)
+            self.hits += count
+            return frame
+
+    def pin(self, owner, key):
+        with self.lock:
+            self.pinned[owner] = key
+
+    def put(self, key, frame):
+        with self.lock:
+            if key in self.frames:
+                self.frames.move_to_end(key)
+                return
+            self.frames[key] = frame
+            self.nbytes += frame.nbytes
+            pinned = set(self.pinned.values())
+            pinned.add(key)
+            while self.nbytes > self.budget_bytes:
+                # Least recently used frame that is not pinned (with a budget of a few frames only the pinned ones stay)
+                evict = next((k for k in self.frames if k not in pinned), None)
+                if evict is None:
+                    break
+                self.nbytes -= self.frames.pop(evict).nbytes
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {"frames": len(self.frames), "bytes": self.nbytes, "hit_rate": self.hits / lookups if lookups else 0.0}
+
+class FramePrefetcher:
+    def __init__(self, name, video_path, cache, size, prefetch=PREFETCH_FRAMES):
+        self.name = name
+        self.reader = IndexedVideoReader(video_path, direct=True)  # Only used on this thread
+        self.cache = cache
+        self.size = size  # (width, height) of the cached frames
+        self.prefetch = prefetch
+        self.condition = threading.Condition()
+        self.target = None  # (frame number, direction) of the newest request
+        self.changed = False
+        self.running = True
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name=f"FramePrefetcher-{self.name}", daemon=True)
+        self.thread.start()
+
+    def request(self, frame_number, direction=1):
+        with self.condition:
+            if self.target != (frame_number, direction):
+                self.cache.pin(self.name, (self.name, frame_number))
+                self.target = (frame_number, direction)
+                self.changed = True
+                self.condition.notify()
+
+    def wanted_frames(self, frame_number, direction):
+        # The requested frame first, then the frames ahead in ascending order (one forward decoding pass)
+        if direction >= 0:
+            ahead = range(frame_number + 1, min(frame_number + self.prefetch, self.reader.frame_count - 1) + 1)
+        else:
+            ahead = range(max(frame_number - self.prefetch, 0), frame_number)
+        return [frame_number, *ahead]
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.running and not self.changed:
+                    self.condition.wait()
+                if not self.running:
+                    break
+                frame_number, direction = self.target
+                self.changed = False
+
+            for n in self.wanted_frames(frame_number, direction):
+                if self.changed or not self.running:
+                    break  # A new request (e.g. scrubbing) has priority over prefetching
+                if (self.name, n) in self.cache:
+                    continue
+                ret, frame = self.reader.read_frame(n)
+                if not ret:
+                    break
+                self.cache.put((self.name, n), cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA))
+        self.reader.release()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+
+class ReviewPlayer:
+    def __init__(self, window, cam1_file, cache_mb=1024, panel_size=PANEL_SIZE):
+        self.window = window
+        self.window.title("Review")
+        self.session_dir = os.path.dirname(os.path.abspath(cam1_file))
+        self.base_name = re.sub(r'_cam1\.avi$', '', os.path.basename(cam1_file))
+
+        # Cameras of the session (<base>_camN.avi)
+        pattern = re.compile(re.escape(self.base_name) + r'_(cam\d+)\.avi$')
+        found = [match.group(1) for match in map(pattern.match, os.listdir(self.session_dir)) if match]
+        self.cameras = sorted(found, key=lambda cam: int(cam[3:]))
+
+        # One prefetcher per camera, the panel keeps the aspect ratio of the video
+        self.cache = FrameCache(cache_mb * 1024 * 1024)
+        self.prefetchers = {}
+        self.timestamps = {}
+        self.scales = {}
+        for cam in self.cameras:
+            reader = IndexedVideoReader(self.path(f"_{cam}.avi"))
+            width, height = reader.cap.get(cv2.CAP_PROP_FRAME_WIDTH), reader.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
+            timestamps = reader.timestamps
+            if timestamps is None or np.isnan(timestamps).any():
+                print(f"[WARNING] No timestamps for {cam}, assuming {reader.fps:.1f} fps")
+                timestamps = np.arange(reader.frame_count) / reader.fps
+            self.timestamps[cam] = np.asarray(timestamps)
+            reader.release()
+
+            scale = min(panel_size[0] / width, panel_size[1] / height)
+            self.scales[cam] = scale
+            self.prefetchers[cam] = FramePrefetcher(cam, self.path(f"_{cam}.avi"), self.cache, (int(width * scale), int(height * scale)))
+        self.timeline = self.timestamps["cam1"]
+
+        # Overlays (positions, box, crop offset) and the 3D trajectory
+        self.overlays = {cam: self.load_overlays(cam) for cam in self.cameras}
+        trajectory_file = self.path("_Trajectory.csv")
+        self.trajectory = pd.read_csv(trajectory_file) if os.path.exists(trajectory_file) else None
+
+        # Panels
+        self.video_frame = tk.Frame(window)
+        self.video_frame.pack()
+        self.panels = {}
+        for i, cam in enumerate(self.cameras):
+            panel = tk.Label(self.video_frame, text=cam)
+            panel.grid(row=i // PANEL_COLUMNS, column=i % PANEL_COLUMNS, padx=2, pady=2)
+            self.panels[cam] = panel
+        self.shown = {cam: None for cam in self.cameras}  # Frame number shown in every panel
+        self.waiting = {cam: None for cam in self.cameras}  # Frame number every panel waits for (being decoded)
+
+        # Controls
+        controls = tk.Frame(window)
+        controls.pack(fill=tk.X)
+        tk.Button(controls, text="<", width=3, command=lambda: self.step(-1)).pack(side=tk.LEFT)
+        self.play_button = tk.Button(controls, text="Play", width=6, command=self.toggle_play)
+        self.play_button.pack(side=tk.LEFT)
+        tk.Button(controls, text=">", width=3, command=lambda: self.step(1)).pack(side=tk.LEFT)
+        self.show_overlays = tk.BooleanVar(value=True)
+        tk.Checkbutton(controls, text="Overlays", variable=self.show_overlays, command=self.redraw).pack(side=tk.LEFT)
+        self.slider = tk.Scale(controls, from_=0, to=len(self.timeline) - 1, orient=tk.HORIZONTAL, showvalue=False,
+                               command=lambda value: self.set_position(int(value)))
+        self.slider.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.info_label = tk.Label(window, anchor="w", font=("Courier", 9))
+        self.info_label.pack(fill=tk.X)
+
+        window.bind("<space>", lambda event: self.toggle_play())
+        window.bind("<Left>", lambda event: self.step(-1))
+        window.bind("<Right>", lambda event: self.step(1))
+        window.bind("<Shift-Left>", lambda event: self.step(-max(int(round(self.fps())), 1)))
+        window.bind("<Shift-Right>", lambda event: self.step(max(int(round(self.fps())), 1)))
+        window.protocol("WM_DELETE_WINDOW", self.on_closing)
+
+        self.position = 0  # Index in the timeline (frame of cam1)
+        self.direction = 1
+        self.playing = False
+        self.play_start = None  # (perf_counter, time in the video) when playing started
+        for prefetcher in self.prefetchers.values():
+            prefetcher.start()
+        self.set_position(0)
+        self.update()
+
+    def path(self, suffix):
+        return os.path.join(self.session_dir, f"{self.base_name}{suffix}")
+
+    def fps(self):
+        return (len(self.timeline) - 1) / (self.timeline[-1] - self.timeline[0]) if len(self.timeline) > 1 and self.timeline[-1] > self.timeline[0] else 30.0
+
+    def load_overlays(self, cam):
+        overlay = {"locations": None, "box": None, "offset": (0, 0)}
+        locations_file = self.path(f"_{cam}_locations.csv")
+        if os.path.exists(locations_file):
+            overlay["locations"] = pd.read_csv(locations_file)
+        else:
+            print(f"[WARNING] No locations for {cam}: {locations_file}")
+        box_file = self.path(f"_{cam}_box.csv")
+        if os.path.exists(box_file):
+            with open(box_file, newline='') as f:
+                box = next(csv.DictReader(f))
+            overlay["box"] = tuple(int(box[key]) for key in ("X", "Y", "Width", "Height"))
+        crop_file = self.path(f"_{cam}_crop.csv")
+        if os.path.exists(crop_file):
+            with open(crop_file, newline='') as f:
+                crop = next(csv.DictReader(f))
+            overlay["offset"] = (int(crop["X"]), int(crop["Y"]))
+        return overlay
+
+    def frame_numbers(self, position):
+        time_seconds = self.timeline[position]
+        return {cam: nearest_frame(self.timestamps[cam], time_seconds) for cam in self.cameras}
+
+    def set_position(self, position):
+        position = int(np.clip(position, 0, len(self.timeline) - 1))
+        if position != self.position:
+            self.direction = 1 if position > self.position else -1
+        self.position = position
+        if self.slider.get() != position:
+            self.slider.set(position)
+        for cam, frame_number in self.frame_numbers(position).items():
+            self.prefetchers[cam].request(frame_number, self.direction)
+
+    def toggle_play(self):
+        self.playing = not self.playing
+        if self.playing:
+            if self.position >= len(self.timeline) - 1:
+                self.set_position(0)
+            self.play_start = (time.perf_counter(), self.timeline[self.position])
+        self.play_button.config(text="Pause" if self.playing else "Play")
+
+    def step(self, frames):
+        if self.playing:
+            self.toggle_play()
+        self.set_position(self.position + frames)
+
+    def redraw(self):
+        self.shown = {cam: None for cam in self.cameras}
+
+    def draw_overlays(self, image, cam, frame_number):
+        overlay = self.overlays[cam]
+        scale = self.scales[cam]
+        ox, oy = overlay["offset"]
+
+        def point(x, y):  # Full-frame pixels --> panel pixels
+            return int((x - ox) * scale), int((y - oy) * scale)
+
+        if overlay["box"] is not None:
+            x, y, w, h = overlay["box"]
+            cv2.rectangle(image, point(x, y), point(x + w, y + h), (0, 255, 255), 1)
+
+        locations = overlay["locations"]
+        if locations is not None and frame_number < len(locations):
+            recent = locations.iloc[max(frame_number - TRAIL_FRAMES, 0):frame_number + 1]
+            recent = recent[recent["Found"] == 1] if "Found" in recent else recent
+            if len(recent) > 1:
+                trail = np.array([point(x, y) for x, y in zip(recent["X"], recent["Y"])], dtype=np.int32)
+                cv2.polylines(image, [trail], False, (255, 128, 0), 1)
+
+            row = locations.iloc[frame_number]
+            found = "Found" not in locations or row["Found"] == 1
+            color = (0, 0, 255) if found else (160, 160, 160)
+            center = point(row["X"], row["Y"])
+            angle = np.radians(row["angle (degrees)"]) if "angle (degrees)" in locations else 0.0
+            tip = (int(center[0] + 15 * np.cos(angle)), int(center[1] + 15 * np.sin(angle)))
+            cv2.circle(image, center, 4, color, -1)
+            cv2.line(image, center, tip, color, 2)
+
+        if cam == "cam1" and self.trajectory is not None and len(self.trajectory) > 0:
+            i = nearest_frame(self.trajectory["Time"].to_numpy(), self.timeline[self.position])
+            x, y, z = self.trajectory.iloc[i][["X", "Y", "Z"]]
+            cv2.putText(image, f"X {x:7.1f}  Y {y:7.1f}  Z {z:7.1f} mm", (8, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+
+    def update(self):
+        if not self.window.winfo_exists():
+            return
+
+        # Playback follows the wall clock (frames that can't be decoded in time are skipped)
+        if self.playing:
+            wall_start, video_start = self.play_start
+            position = int(np.searchsorted(self.timeline, video_start + time.perf_counter() - wall_start, side="right")) - 1
+            if position >= len(self.timeline) - 1:
+                position = len(self.timeline) - 1
+                self.toggle_play()
+            if position != self.position:
+                self.set_position(position)
+
+        # Show the frames that are decoded (a panel keeps its last frame until the new one is ready)
+        for cam, frame_number in self.frame_numbers(self.position).items():
+            if self.shown[cam] == frame_number:
+                continue
+            # Only the first lookup of a frame counts for the hit rate, while it is decoded the panel checks with "in"
+            key = (cam, frame_number)
+            if self.waiting[cam] != frame_number:
+                self.waiting[cam] = frame_number
+                frame = self.cache.get(key)
+            else:
+                frame = self.cache.get(key, count=False) if key in self.cache else None
+            if frame is None:
+                continue
+            image = frame.copy()  # The cached frame stays clean
+            if self.show_overlays.get():
+                self.draw_overlays(image, cam, frame_number)
+            img = ImageTk.PhotoImage(Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB)))
+            self.panels[cam].imgtk = img
+            self.panels[cam].config(image=img)
+            self.shown[cam] = frame_number
+
+        stats = self.cache.stats()
+        frames = "  ".join(f"{cam} {n:6d}" for cam, n in self.frame_numbers(self.position).items())
+        self.info_label.config(text=f"t = {self.timeline[self.position]:9.3f} s  {frames}  cache {stats['frames']} frames, "
+                                    f"{stats['bytes'] / 1e6:.0f} MB, hit rate {stats['hit_rate'] * 100:.0f}%")
+        self.window.after(10, self.update)
+
+    def on_closing(self):
+        for prefetcher in self.prefetchers.values():
+            prefetcher.stop()
+        self.window.destroy()
+
+# Used to review a recording
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Review the tracking of a recording (all cameras side by side).")
+    parser.add_argument("cam1_file", help="Video of camera 1 (<base>_cam1.avi)")
+    parser.add_argument("--cache-mb", type=int, default=1024, help="Memory budget of the decoded frames (MB)")
+    args = parser.parse_args()
+    root = tk.Tk()
+    player = ReviewPlayer(root, args.cam1_file, cache_mb=args.cache_mb)
+    root.mainloop()
@@ -0,0 +1,278 @@
+"""
+SessionPipeline Class
+
+This class runs the processing of a recording session (tracking both videos, reconstructing the trajectory and saving
+the plots) as a make-like pipeline. A manifest (<base>_manifest.json in the session folder) records every artifact
+with its content hash and frame/row count, and for every stage the input hashes, the parameters and the output hashes
+of the last run. A stage is only executed again if it never ran, if one of its inputs or parameters changed, or if
+one of its outputs is missing or was changed afterwards. Because the hashes are of the content, a stage that reruns
+but produces the same output doesn't trigger the stages after it.
+
+Hashing a large video takes time, so the hash of an artifact is reused as long as its size and modification time
+are the same as in the manifest.
+
+Stages (for a session <base> with <base>_cam1.avi, <base>_cam2.avi (and any other <base>_camN.avi) and <base>_timestamps.csv):
+- track_cam1 / track_cam2 / ...: VideoTracker, one stage per camera --> <base>_camN_locations.csv, <base>_camN_box.csv, <base>_camN_tracking.avi.
+  The selected box and ROI are stored in the manifest ("selections"), so tracking can be rerun without selecting them
+  again. Editing the selections in the manifest reruns the tracking with the new values.
+  With grayscale=True the videos are tracked single-channel and the tracking video is rendered afterwards from the
+  locations (VideoTracker.render_tracking_video), with tracking_video=False it isn't made at all.
+- reconstruct: TrajectoryReconstructor (with the locations of all cameras) --> <base>_Trajectory.csv/.h5, <base>_Kinematics.csv and the plots (PNG).
+
+The STAGE_VERSIONS are part of the parameters: increase the version of a stage after changing its code, so the
+stage is rerun for all sessions (e.g. only the reconstruction of a whole archive after a reconstruction change).
+
+Methods:
+- __init__(cam1_file, undistort, calibration_file, kinematics_window, plot_formats, display, grayscale, tracking_video): Initializes the pipeline for the
+  session of the cam1 video and loads the manifest (if it exists).
+- stages(): Returns the stages (name, inputs, params, outputs) in the order of execution.
+- stale_reason(stage): Returns why a stage has to run, or None if it is up to date.
+- run(force, dry_run, adopt, progress_callback): Runs the stages that are out of date and saves the manifest.
+  Returns the names of the stages that were (or with dry_run would be) run.
+- save_manifest(): Writes the manifest to the session folder.
+
+Functions:
+- find_sessions(folder): Returns the cam1 videos of all sessions in a folder (recursive).
+
+How to run (re-analysis of an archive):
+    python -m include.SessionPipeline <folder or _cam1.avi> [...] [--force reconstruct] [--dry-run] [--adopt] [--undistort] [--no-display] [--grayscale] [--no-tracking-video]
+"""
+
+import cv2
+import os
+import re
+import json
+import time
+import glob
+import argparse
+from include.CameraCalibration import file_hash, load_calibration, DEFAULT_CALIBRATION_FILE
+from include import Tracing
+
+MANIFEST_VERSION = 1
+
+# Increase a version to rerun that stage (and the stages that depend on its outputs) for every session
+STAGE_VERSIONS = {"track": 3, "reconstruct": 2}
+
+def find_sessions(folder):
+    return sorted(glob.glob(os.path.join(folder, "**", "*_cam1.avi"), recursive=True))
+
+class SessionPipeline:
+    def __init__(self, cam1_file, undistort=False, calibration_file=DEFAULT_CALIBRATION_FILE, kinematics_window=51, plot_formats=("png",), display=True,
+                 grayscale=False, tracking_video=True):
+        self.session_dir = os.path.dirname(os.path.abspath(cam1_file))
+        self.base_name = re.sub(r'_cam1\.avi$', '', os.path.basename(cam1_file))
+        self.undistort = undistort
+        self.calibration_file = calibration_file
+        self.kinematics_window = kinematics_window
+        self.plot_formats = tuple(plot_formats)
+        self.display = display  # Show the tracking windows
+        self.grayscale = grayscale  # Track gray frames (see VideoTracker)
+        self.tracking_video = tracking_video  # Save the annotated tracking video of every camera
+
+        # Cameras of the session (<base>_camN.avi), at least cam1 and cam2
+        pattern = re.compile(re.escape(self.base_name) + r'_(cam\d+)\.avi$')
+        found = [match.group(1) for match in map(pattern.match, os.listdir(self.session_dir)) if match]
+        self.cameras = sorted(set(found) | {"cam1", "cam2"}, key=lambda cam: int(cam[3:]))
+
+        self.manifest_path = os.path.join(self.session_dir, f"{self.base_name}_manifest.json")
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {"version": MANIFEST_VERSION, "session": self.base_name, "artifacts": {}, "selections": {}, "stages": {}}
+
+    def path(self, suffix):
+        return os.path.join(self.session_dir, f"{self.base_name}{suffix}")
+
+    def key(self, path):
+        # Artifacts in the session folder are stored relative to it, so a session folder can be moved
+        path = os.path.abspath(path)
+        if os.path.dirname(path) == self.session_dir:
+            return os.path.basename(path)
+        return path.replace(os.sep, "/")
+
+    def stages(self):
+        stages = []
+        for cam in self.cameras:
+            selections = self.manifest["selections"].get(cam, {})
+            inputs = [self.path(f"_{cam}.avi"), self.path("_timestamps.csv")]
+            if os.path.exists(self.path(f"_{cam}_crop.csv")):
+                inputs.append(self.path(f"_{cam}_crop.csv"))  # Offset of a cropped recording
+            if self.undistort:
+                inputs.append(self.calibration_file)
+            params = {"version": STAGE_VERSIONS["track"], "undistort": self.undistort,
+                      "roi": selections.get("roi"), "box": selections.get("box")}
+            if self.grayscale:
+                params["grayscale"] = True  # Only added when set, so the sessions tracked before stay up to date
+            outputs = [self.path(f"_{cam}_locations.csv"), self.path(f"_{cam}_box.csv")]
+            if self.tracking_video:
+                outputs.append(self.path(f"_{cam}_tracking.avi"))
+            stages.append({
+                "name": f"track_{cam}",
+                "inputs": inputs,
+                "params": params,
+                "outputs": outputs,
+                "run": lambda progress, cam=cam: self.run_tracking(cam, progress),
+            })
+
+        outputs = [self.path("_Trajectory.csv"), self.path("_Trajectory.h5"), self.path("_Kinematics.csv")]
+        outputs += [self.path(f"_{plot}.{ext}") for plot in ("Trajectory", "Velocity") for ext in self.plot_formats]
+        stages.append({
+            "name": "reconstruct",
+            "inputs": [self.path(f"_{cam}{suffix}") for cam in self.cameras for suffix in ("_locations.csv", "_box.csv")] + [self.calibration_file],
+            "params": {"version": STAGE_VERSIONS["reconstruct"], "points_undistorted": self.undistort,
+                       "kinematics_window": self.kinematics_window, "plot_formats": list(self.plot_formats)},
+            "outputs": outputs,
+            "run": lambda progress: self.run_reconstruction(progress),
+        })
+        return stages
+
+    def run_tracking(self, cam, progress):
+        from include.TrackerClassV3 import VideoTracker
+        video_file = self.path(f"_{cam}.avi")
+        if self.undistort:
+            calibration = load_calibration(self.calibration_file)["cameras"][cam]
+            tracker = VideoTracker(video_file, calibration["camera_matrix"], calibration["dist_coeffs"], grayscale=self.grayscale)
+        else:
+            tracker = VideoTracker(video_file, grayscale=self.grayscale)
+        tracker.display = self.display
+        tracker.annotate = self.tracking_video and not self.grayscale
+
+        # Use the stored selections if there are any, the tracker asks for the missing ones
+        selections = self.manifest["selections"].get(cam, {})
+        tracker.track_and_save(progress_callback=progress, roi=selections.get("roi"), box=selections.get("box"))
+        if self.tracking_video and self.grayscale:
+            tracker.render_tracking_video(progress_callback=progress)
+        self.manifest["selections"][cam] = {"roi": list(tracker.initial_roi), "box": list(tracker.box_roi)}
+
+    def run_reconstruction(self, progress):
+        from include.TrajectoryClassV5 import TrajectoryReconstructor
+        traj_reconstructor = TrajectoryReconstructor(*[self.path(f"_{cam}_locations.csv") for cam in self.cameras],
+                                                     points_undistorted=self.undistort, calibration_file=self.calibration_file)
+        traj_reconstructor.kinematics_window = self.kinematics_window
+        traj_reconstructor.reconstruct()
+        traj_reconstructor.export_plots(formats=self.plot_formats, background=False)
+
+    def artifact(self, path):
+        """Returns the manifest entry of an artifact (hash, size, mtime and frame/row count), None if it doesn't exist."""
+        if not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        known = self.manifest["artifacts"].get(self.key(path))
+        if known is not None and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+            return known
+
+        entry = {"hash": file_hash(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        if path.endswith(".avi"):
+            cap = cv2.VideoCapture(path)
+            entry["frames"] = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            cap.release()
+        elif path.endswith(".csv"):
+            with open(path, "rb") as f:
+                entry["rows"] = max(sum(1 for _ in f) - 1, 0)  # Without the header
+        self.manifest["artifacts"][self.key(path)] = entry
+        return entry
+
+    def artifact_hashes(self, paths):
+        entries = {self.key(path): self.artifact(path) for path in paths}
+        return {key: entry["hash"] if entry is not None else None for key, entry in entries.items()}
+
+    def stale_reason(self, stage):
+        record = self.manifest["stages"].get(stage["name"])
+        if record is None:
+            return "never run"
+        if record["params"] != stage["params"]:
+            return "parameters changed"
+        missing = [self.key(path) for path in stage["inputs"] if not os.path.exists(path)]
+        if missing:
+            raise FileNotFoundError(f"Missing input(s) for {stage['name']}: {missing}")
+        inputs = self.artifact_hashes(stage["inputs"])
+        if inputs != record["inputs"]:
+            changed = [key for key in inputs if inputs[key] != record["inputs"].get(key)]
+            return f"input changed: {', '.join(changed)}"
+        outputs = self.artifact_hashes(stage["outputs"])
+        if outputs != record["outputs"]:
+            changed = [key for key in outputs if outputs[key] != record["outputs"].get(key)]
+            return f"output missing or changed: {', '.join(changed)}"
+        return None
+
+    def record(self, stage, duration_s):
+        self.manifest["stages"][stage["name"]] = {
+            "inputs": self.artifact_hashes(stage["inputs"]),
+            "params": stage["params"],
+            "outputs": self.artifact_hashes(stage["outputs"]),
+            "finished": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "duration_s": duration_s,
+        }
+
+    def run(self, force=(), dry_run=False, adopt=False, progress_callback=None):
+        """
+        Runs the out-of-date stages in order. The stages in force are always run (a stage after it then reruns if
+        the output changed). With adopt=True, a stage without a record whose outputs all exist (a session processed
+        before the manifest) is recorded as done instead of being run.
+        progress_callback(stage_name, progress) is called with the progress (0-1) of the stages.
+        """
+        executed = []
+        for stage in self.stages():
+            name = stage["name"]
+            reason = "forced" if name in force else self.stale_reason(stage)
+            if reason is None:
+                print(f"[INFO] {self.base_name}: {name} is up to date")
+                continue
+            if adopt and reason == "never run" and all(os.path.exists(path) for path in stage["outputs"]):
+                print(f"[INFO] {self.base_name}: {name} adopted (outputs exist)")
+                self.record(stage, None)
+                continue
+
+            print(f"[INFO] {self.base_name}: {name} ({reason})")
+            executed.append(name)
+            if dry_run:
+                continue
+            def stage_progress(frame, total, name=name):
+                if progress_callback is not None:
+                    progress_callback(name, frame / total if total > 0 else 0.0)
+
+            stage_progress(0, 1)
+            start = time.perf_counter()
+            with Tracing.span(f"stage {name}", "pipeline", session=self.base_name):
+                stage["run"](stage_progress)
+
+            # The selections of the tracking are part of the parameters, so the stage is recreated after running
+            stage = next(s for s in self.stages() if s["name"] == name)
+            self.record(stage, time.perf_counter() - start)
+            self.save_manifest()
+
+        if not dry_run:
+            self.save_manifest()
+        return executed
+
+    def save_manifest(self):
+        # Write to a temporary file first, so an interrupted save doesn't leave a broken manifest
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(temp_path, self.manifest_path)
+
+# Used to (re)process sessions separately from the recorder
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the out-of-date processing stages of recording sessions.")
+    parser.add_argument("paths", nargs="+", help="Session cam1 videos (<base>_cam1.avi) or folders to search for them")
+    parser.add_argument("--force", nargs="*", default=[], help="Stages to run even if they are up to date (track_cam1, track_cam2, ..., reconstruct)")
+    parser.add_argument("--dry-run", action="store_true", help="Only show which stages would run")
+    parser.add_argument("--adopt", action="store_true", help="Record existing outputs of sessions without a manifest instead of rerunning")
+    parser.add_argument("--undistort", action="store_true", help="Undistort the full frames before tracking")
+    parser.add_argument("--no-display", action="store_true", help="Track without the preview windows")
+    parser.add_argument("--grayscale", action="store_true", help="Track single-channel (gray) frames")
+    parser.add_argument("--no-tracking-video", action="store_true", help="Don't save the annotated tracking videos")
+    parser.add_argument("--calibration", default=DEFAULT_CALIBRATION_FILE, help="Calibration file")
+    parser.add_argument("--kinematics-window", type=int, default=51, help="Savitzky-Golay window of the kinematics")
+    args = parser.parse_args()
+
+    sessions = []
+    for path in args.paths:
+        sessions += find_sessions(path) if os.path.isdir(path) else [path]
+
+    for cam1_file in sessions:
+        pipeline = SessionPipeline(cam1_file, undistort=args.undistort, calibration_file=args.calibration, kinematics_window=args.kinematics_window, display=not args.no_display,
+                                   grayscale=args.grayscale, tracking_video=not args.no_tracking_video)
+        pipeline.run(force=args.force, dry_run=args.dry_run, adopt=args.adopt)
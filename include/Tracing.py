@@ -0,0 +1,148 @@
+"""
+Tracing Module
+
+Lightweight, opt-in profiling spans for the recorder, tracker, reconstructor and plotting, to see where the time goes
+between pressing Stop and seeing a plot. A span measures the wall-clock time of a block of code:
+
+    from include import Tracing
+
+    with Tracing.span("threshold"):
+        ...
+
+    @Tracing.traced("reconstruct")
+    def reconstruct(self):
+        ...
+
+Tracing is disabled by default. A disabled span() returns a shared no-op context manager and a traced function only
+checks a flag, so the spans can stay in the per-frame loops. After Tracing.enable(), every span is recorded (name,
+category, start, duration, process and thread) with time.perf_counter_ns, which is the same monotonic clock in all
+processes, so spans of the post-processing workers can be added to the trace of the recorder (add_events).
+
+The trace can be exported as a Chrome trace (JSON, open in chrome://tracing or https://ui.perfetto.dev) and summarized
+per span category and name (count, total, mean, p95, max).
+
+Functions:
+- enable(): Starts recording spans (clears the previous spans).
+- disable(): Stops recording spans.
+- is_enabled(): Returns True if spans are recorded.
+- span(name, category, **args): Context manager that records the time of the block as a span.
+- traced(name, category): Decorator that records every call of the function as a span.
+- events(): Returns the recorded spans (for sending them to another process).
+- add_events(events): Adds spans recorded in another process.
+- export_chrome_trace(path): Saves the spans as a Chrome trace / Perfetto JSON file.
+- summary(): Returns the statistics per span category and name, sorted by the total time.
+- print_summary(): Prints the summary as a table.
+"""
+
+import numpy as np
+import functools
+import threading
+import json
+import time
+import os
+
+_enabled = False
+_events = []  # (name, category, start_ns, duration_ns, pid, tid, args), list.append is thread-safe
+_thread_names = {}
+
+class _NoSpan:
+    # Shared context manager for disabled tracing, does nothing
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+_NO_SPAN = _NoSpan()
+
+class _Span:
+    __slots__ = ("name", "category", "args", "start")
+
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end = time.perf_counter_ns()
+        thread = threading.current_thread()
+        _thread_names[thread.ident] = thread.name
+        _events.append((self.name, self.category, self.start, end - self.start, os.getpid(), thread.ident, self.args))
+        return False
+
+def enable():
+    global _enabled
+    _events.clear()
+    _enabled = True
+
+def disable():
+    global _enabled
+    _enabled = False
+
+def is_enabled():
+    return _enabled
+
+def span(name, category="", **args):
+    if not _enabled:
+        return _NO_SPAN
+    return _Span(name, category, args or None)
+
+def traced(name=None, category=""):
+    def decorator(function):
+        span_name = name or function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with _Span(span_name, category, None):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def events():
+    return list(_events)
+
+def add_events(events):
+    _events.extend(tuple(event) for event in events)
+
+def export_chrome_trace(path):
+    # Complete events ("X") with the time in microseconds, plus the thread names as metadata events
+    trace_events = []
+    for name, category, start_ns, duration_ns, pid, tid, args in _events:
+        event = {"name": name, "cat": category, "ph": "X", "ts": start_ns / 1000.0, "dur": duration_ns / 1000.0, "pid": pid, "tid": tid}
+        if args:
+            event["args"] = args
+        trace_events.append(event)
+    threads = {(pid, tid) for _, _, _, _, pid, tid, _ in _events}
+    for pid, tid in sorted(threads):
+        trace_events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": _thread_names.get(tid, str(tid))}})
+
+    with open(path, "w") as f:
+        json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+    print(f"[INFO] Trace with {len(_events)} spans saved to {path}")
+
+def summary():
+    durations = {}
+    for name, category, _, duration_ns, _, _, _ in _events:
+        durations.setdefault((category, name), []).append(duration_ns)
+
+    rows = []
+    for (category, name), values in durations.items():
+        values_ms = np.array(values) / 1e6
+        rows.append({"category": category, "name": name, "count": len(values_ms), "total_ms": float(values_ms.sum()),
+                     "mean_ms": float(values_ms.mean()), "p95_ms": float(np.percentile(values_ms, 95)), "max_ms": float(values_ms.max())})
+    rows.sort(key=lambda row: row["total_ms"], reverse=True)
+    return rows
+
+def print_summary():
+    rows = summary()
+    labels = [f"{row['category']}/{row['name']}" if row["category"] else row["name"] for row in rows]
+    width = max([len(label) for label in labels] + [4])
+    print(f"{'Span':<{width}} {'count':>8} {'total (ms)':>12} {'mean (ms)':>10} {'p95 (ms)':>10} {'max (ms)':>10}")
+    for label, row in zip(labels, rows):
+        print(f"{label:<{width}} {row['count']:>8} {row['total_ms']:>12.1f} {row['mean_ms']:>10.3f} {row['p95_ms']:>10.3f} {row['max_ms']:>10.3f}")
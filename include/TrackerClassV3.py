@@ -10,17 +10,39 @@ interactive ROI re-selection during tracking.
 Main Workflow:
 - A video file is loaded, and the user first selects the physical box (for world scaling) and then the object ROI.
 - A contour-based tracking method (using Otsu's thresholding) is used to track the selected object across the video frames.
-- The position (X, Y), orientation angle, and timestamp of the object are recorded and saved to a CSV file.
+- The position (X, Y), orientation angle, and timestamp of the object are recorded and saved to a CSV file, with a
+  "Found" column (0 if the object was not found and the last position is repeated).
 - The selected physical box (X, Y, Width, Height) is saved separately in a CSV file for use in world scaling.
 - An annotated video showing the tracked object, its center, and orientation is saved as a new video file.
+- For a cropped recording (<base>_crop.csv next to the video), the offset of the crop is added to the positions, the
+  box and the ROI, so they are in full-frame pixels like for a full recording (the tracking video stays cropped).
+- The frames are read with an IndexedVideoReader (see FrameIndex), the selections seek to the first frame with the
+  frame index of the recording instead of cv2.CAP_PROP_POS_FRAMES.
+- With grayscale=True the frames are tracked single-channel: the reader returns gray frames (as decoded for gray
+  recordings, converted into a reused buffer for color videos), and the annotated tracking video is not drawn and
+  encoded during tracking, it can be rendered afterwards from the CSV (render_tracking_video).
 
 Methods:
-- __init__(video_path): Initializes the VideoTracker object with the path to the video file and sets up necessary attributes.
-- select_roi(): Lets the user select a region of interest (ROI) in the first frame for tracking.
-- select_and_save_box(): Allows manual selection of the full environment box in the first frame and saves its dimensions to CSV.
-- update_roi_center(frame, roi): Updates the position of the ROI based on the largest contour found in the thresholded region.
-- track_and_save(): Tracks the selected object, saves the tracking data to a CSV file, allows interactive ROI re-selection, 
-  and outputs an annotated video.
+- __init__(video_path, camera_matrix, dist_coeffs, grayscale): Initializes the VideoTracker object with the path to the video file and sets up necessary attributes.
+  If a calibration is given, every frame is undistorted (single cv2.remap with cached maps) before thresholding.
+- read_frame(): Reads the next frame from the video and undistorts it if a calibration is given.
+- select_roi(roi): Lets the user select a region of interest (ROI) in the first frame for tracking (skipped if roi is given).
+- select_and_save_box(box_roi): Allows manual selection of the full environment box in the first frame and saves its dimensions to CSV
+  (the selection is skipped if box_roi is given).
+- update_roi_center(frame, roi): Updates the position of the ROI based on the largest contour found in the thresholded region,
+  and the orientation of the object (long axis of the minAreaRect).
+- track_and_save(progress_callback, roi, box): Tracks the selected object, saves the tracking data to a CSV file, allows interactive ROI re-selection, 
+  and outputs an annotated video. With a given roi and box (e.g. from the session manifest, see SessionPipeline) tracking runs without selection.
+  The used selections are kept in self.initial_roi and self.box_roi. Set self.display = False to track without the preview windows.
+  The codec of the tracking video is self.tracking_codec (default XVID). Set self.annotate = False to only save the CSV
+  (default for grayscale tracking).
+- render_tracking_video(progress_callback): Renders the annotated tracking video from the saved locations (center and
+  orientation in every frame), after tracking without annotation.
+
+Functions:
+- locate_object(frame, roi): Finds the object in the ROI (Otsu's thresholding, largest contour) and returns the moved ROI
+  and the minAreaRect of the object (also used for live tracking, see LivePositionStream). The frame can be BGR or grayscale.
+- long_axis_angle(rect): Returns the orientation of the long axis of a minAreaRect in [0, 180) degrees.
 
 Author: Stijn Kolkman (s.y.kolkman@student.utwente.nl)
 Date: April 2025
@@ -30,13 +52,79 @@ import cv2
 import numpy as np
 import csv
 import os
-import re
+from include.UndistortMapCache import UndistortMapCache
+from include.FrameIndex import IndexedVideoReader, load_timestamps
+from include import Tracing
+
+def locate_object(frame, roi):
+    """
+    Finds the object in the ROI of a frame: the largest contour after Otsu's thresholding.
+    Returns (roi, rect, threshold): the ROI moved to the center of the object (same size), the minAreaRect of the object
+    in frame coordinates (None if no contour was found, the ROI is then unchanged) and the thresholded ROI.
+    Used by the VideoTracker and by the LivePositionStream.
+    """
+    # Crop the ROI from the frame
+    x, y, w, h = [int(v) for v in roi]
+
+    # Ensure that the ROI coordinates are within the frame's dimensions
+    height, width = frame.shape[:2]
+    if x + w > width:
+        w = width - x
+    if y + h > height:
+        h = height - y
+
+    roi_frame = frame[y:y+h, x:x+w]
+
+    # Convert to grayscale (unless the frame already is) and apply Otsu's thresholding
+    with Tracing.span("threshold", "tracker"):
+        gray_roi = roi_frame if roi_frame.ndim == 2 else cv2.cvtColor(roi_frame, cv2.COLOR_BGR2GRAY)
+        _, threshold = cv2.threshold(gray_roi, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+
+    # Find contours in the thresholded image
+    with Tracing.span("contour", "tracker"):
+        contours, _ = cv2.findContours(threshold, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    if not contours:
+        return roi, None, threshold
+
+    # Get the largest contour by area
+    largest_contour = max(contours, key=cv2.contourArea)
+    (center_x, center_y), size, angle = cv2.minAreaRect(largest_contour)
+
+    # Compute the object's center (account for ROI offset)
+    center_x += x
+    center_y += y
+
+    # Update the ROI center based on the object's new center
+    # Keep the original size (w, h) but adjust its position
+    new_x = int(center_x) - w // 2
+    new_y = int(center_y) - h // 2
+
+    # Ensure the new ROI is within the bounds of the frame
+    new_x = max(new_x, 0)
+    new_y = max(new_y, 0)
+
+    # Ensure the ROI does not go out of bounds
+    if new_x + w > width:
+        new_x = width - w
+    if new_y + h > height:
+        new_y = height - h
+
+    return (new_x, new_y, w, h), ((center_x, center_y), size, angle), threshold
+
+def long_axis_angle(rect):
+    # Orientation of the long axis of the object in [0, 180) degrees (minAreaRect only gives the angle
+    # of one of the sides, in [0, 90))
+    (rect_w, rect_h), angle = rect[1], rect[2]
+    return (angle + 90.0) % 180.0 if rect_w < rect_h else angle % 180.0
 
 class VideoTracker:
-    def __init__(self, video_path):
+    def __init__(self, video_path, camera_matrix=None, dist_coeffs=None, grayscale=False):
         # Load the video using the video_path
         self.video_path = video_path
-        self.cap = cv2.VideoCapture(video_path)
+        self.grayscale = grayscale  # Track single-channel (gray) frames
+        self.reader = IndexedVideoReader(video_path, grayscale=grayscale)  # Seeks with the frame index sidecar (<base>_index.npy)
+        self.cap = self.reader.cap
         if not self.cap.isOpened():
             raise IOError("Cannot open the video file.")
         
@@ -49,20 +137,46 @@ class VideoTracker:
         self.csv_filename = os.path.join(self.output_dir, f"{self.base_name}_locations.csv")
         self.output_video_filename = os.path.join(self.output_dir, f"{self.base_name}_tracking.avi")
         self.out_video = None  # This will be the VideoWriter object for saving the tracked video
-
-        # Load the timestamps
-        self.base_name_timestamp = re.sub(r'_cam\d\.avi$', '', os.path.basename(video_path))
-        timestamp_file = os.path.join(self.output_dir, f"{self.base_name_timestamp}_timestamps.csv")
-        self.timestamps = []
-
-        if os.path.exists(timestamp_file):
-            with open(timestamp_file, newline='') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    self.timestamps.append(float(row["Timestamp (s)"]))
-            print(f"[INFO] Loaded {len(self.timestamps)} timestamps from {timestamp_file}")
-        else:
-            print(f"[WARNING] Timestamp file not found: {timestamp_file}")
+        self.angle = 0.0  # Orientation of the tracked object in degrees (long axis, [0, 180))
+        self.found = False  # Object found in the last frame (saved as "Found", frames without the object are not triangulated)
+        self.initial_roi = None  # ROI (X, Y, Width, Height) in the first frame
+        self.box_roi = None      # Box (X, Y, Width, Height) for the world scaling
+        self.display = True      # Show the tracking and threshold windows
+        self.tracking_codec = "XVID"  # FourCC of the annotated tracking video (see benchmarks/codec_benchmark.py)
+        self.annotate = not grayscale  # Draw and save the tracking video while tracking (otherwise see render_tracking_video)
+
+        # Load the timestamps of this camera (column "Timestamp <camera> (s)", older recordings have one "Timestamp (s)" column)
+        self.timestamps = load_timestamps(video_path) or []
+
+        # Offset of a cropped recording (<base>_crop.csv, see the recorder). The frames are tracked as they are, the
+        # positions, the box and the ROI are converted to full-frame pixels, so the rest of the pipeline doesn't change
+        self.offset = (0, 0)
+        self.cropped = False
+        crop_file = os.path.join(self.output_dir, f"{self.base_name}_crop.csv")
+        if os.path.exists(crop_file):
+            with open(crop_file, newline='') as f:
+                crop = next(csv.DictReader(f))
+            self.offset = (int(crop["X"]), int(crop["Y"]))
+            self.cropped = True
+            print(f"[INFO] Cropped recording, offset {self.offset} from {crop_file}")
+
+        # Optional undistortion of the full frames. NOTE: the saved locations are then already undistorted, so
+        # the TrajectoryReconstructor should be created with points_undistorted=True
+        self.camera_matrix = camera_matrix
+        self.dist_coeffs = dist_coeffs
+        self.undistort = camera_matrix is not None and dist_coeffs is not None
+        self.undistort_cache = UndistortMapCache() if self.undistort else None
+        self.undistorted_frame = None  # Reused output buffer for cv2.remap
+
+    def read_frame(self):
+        with Tracing.span("decode", "tracker"):
+            ret, frame = self.reader.read()
+        if ret and self.undistort:
+            with Tracing.span("undistort", "tracker"):
+                offset = self.offset if self.cropped else None  # A crop is undistorted as part of the full frame
+                self.undistorted_frame = self.undistort_cache.undistort(frame, self.camera_matrix, self.dist_coeffs, dst=self.undistorted_frame, offset=offset)
+            frame = self.undistorted_frame
+        return ret, frame
     """
     def preprocess_frame(self, frame):
         #Applies preprocessing to enhance contrast and reduce noise.
@@ -83,131 +197,102 @@ class VideoTracker:
         frame = cv2.GaussianBlur(frame, (5, 5), 0)
         return frame
     """
-    def select_roi(self):
-        self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-        ret, frame = self.cap.read()
+    def select_roi(self, roi=None):
+        self.reader.seek(0)
+        ret, frame = self.read_frame()
         if not ret:
             print("Cannot read from the video.")
             self.cap.release()
             cv2.destroyAllWindows()
             raise RuntimeError("Video reading error.")
 
-        roi = cv2.selectROI("Select the ROI", frame, fromCenter=False, showCrosshair=True)
-        cv2.destroyWindow("Select the ROI")
-        return frame, roi
-
-    def select_and_save_box(self):
-        self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)  # Go to the first frame
-        ret, frame = self.cap.read()
+        # The given and saved ROI are in full-frame pixels, the returned ROI in pixels of the (cropped) video
+        ox, oy = self.offset
+        if roi is None:
+            x, y, w, h = cv2.selectROI("Select the ROI", frame, fromCenter=False, showCrosshair=True)
+            cv2.destroyWindow("Select the ROI")
+            roi = (x + ox, y + oy, w, h)
+        self.initial_roi = tuple(int(v) for v in roi)
+        x, y, w, h = self.initial_roi
+        return frame, (max(x - ox, 0), max(y - oy, 0), w, h)
+
+    def select_and_save_box(self, box_roi=None):
+        self.reader.seek(0)  # Go to the first frame
+        ret, frame = self.read_frame()
         if not ret:
             print("Cannot read from the video.")
             self.cap.release()
             cv2.destroyAllWindows()
             raise RuntimeError("Video reading error during box selection.")
 
-        print("Select the FULL box/container used for world scale reference")
-        box_roi = cv2.selectROI("Select the Box", frame, fromCenter=False, showCrosshair=True)
-        cv2.destroyWindow("Select the Box")
+        if box_roi is None:
+            print("Select the FULL box/container used for world scale reference")
+            x, y, w, h = cv2.selectROI("Select the Box", frame, fromCenter=False, showCrosshair=True)
+            cv2.destroyWindow("Select the Box")
+            box_roi = (x + self.offset[0], y + self.offset[1], w, h)  # Saved in full-frame pixels
+        self.box_roi = tuple(int(v) for v in box_roi)
 
         box_csv_name = os.path.join(self.output_dir, f"{self.base_name}_box.csv")
         with open(box_csv_name, mode='w', newline='') as box_file:
             writer = csv.writer(box_file)
             writer.writerow(["X", "Y", "Width", "Height"])
-            writer.writerow(box_roi)
+            writer.writerow(self.box_roi)
 
         print(f"Box region saved to: {box_csv_name}")
 
     def update_roi_center(self, frame, roi):
-            # Crop the ROI from the frame
-            x, y, w, h = [int(v) for v in roi]
-
-            # Ensure that the ROI coordinates are within the frame's dimensions
-            height, width = frame.shape[:2]
-            if x + w > width:
-                w = width - x
-            if y + h > height:
-                h = height - y
-
-            roi_frame = frame[y:y+h, x:x+w]
-
-            # Convert to grayscale and apply Otsu's thresholding
-            gray_roi = cv2.cvtColor(roi_frame, cv2.COLOR_BGR2GRAY)
-            _, threshold = cv2.threshold(gray_roi, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+            x, y = int(roi[0]), int(roi[1])
+            roi, rect, threshold = locate_object(frame, roi)
+            self.found = rect is not None
 
             # Debug: Show the thresholded image
-            cv2.imshow("Thresholded Image", threshold)
-
-            # Add a short delay to give you time to inspect the thresholded image
-            #time.sleep(3)  # Adjust the time as needed (0.5 sec for example)
-
-            # Find contours in the thresholded image
-            contours, _ = cv2.findContours(threshold, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-            if contours:
-                # Get the largest contour by area
-                largest_contour = max(contours, key=cv2.contourArea)
-
-                # Get the bounding box of the largest contour
-                #x_contour, y_contour, w_contour, h_contour = cv2.boundingRect(largest_contour)
-                rect = cv2.minAreaRect(largest_contour)
-                box = cv2.boxPoints(rect)
-                box = np.int32(box)
-
-                # Compute the object's center (account for ROI offset)
-                center_x_, center_y_ = rect[0]
-                center_x_ += x
-                center_y_ += y
-                center_x_, center_y_ = int(center_x_), int(center_y_)
-                angle = rect[2]
-
-                # Update the ROI center based on the object's new center
-                # Keep the original size (w, h) but adjust its position
-                new_x = center_x_ - w // 2
-                new_y = center_y_ - h // 2
-
-                # Ensure the new ROI is within the bounds of the frame
-                new_x = max(new_x, 0)
-                new_y = max(new_y, 0)
+            if self.display:
+                cv2.imshow("Thresholded Image", threshold)
 
-                # Ensure the ROI does not go out of bounds
-                if new_x + w > width:
-                    new_x = width - w
-                if new_y + h > height:
-                    new_y = height - h
-
-                # Update the ROI
-                roi = (new_x, new_y, w, h)
+            if rect is not None:
+                # Orientation of the long axis, saved to the CSV for the angular rate in the Kinematics module
+                self.angle = long_axis_angle(rect)
+                if not self.annotate:
+                    return frame, roi
 
                 # Draw the contour and center on the frame for debugging
+                box = np.int32(cv2.boxPoints(rect))
+                center_x_, center_y_ = int(rect[0][0]), int(rect[0][1])
                 cv2.circle(frame, (center_x_, center_y_), 5, (0, 0, 255), -1)
-                # Adjust drawn contours by the top-left ROI offset (x, y)
-                cv2.drawContours(frame, [box + (x, y)], 0, (0, 0, 255), 2)
-                cv2.putText(frame, f"Orientation: {angle:.2f} deg", (x, y - 10),
+                cv2.drawContours(frame, [box], 0, (0, 0, 255), 2)
+                cv2.putText(frame, f"Orientation: {rect[2]:.2f} deg", (x, y - 10),
                                     cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
             else:
                 print("No contours found.")
 
             return frame, roi
 
-    def track_and_save(self):
-            # Manually select box 
-            self.select_and_save_box()
+    @Tracing.traced("track", "tracker")
+    def track_and_save(self, progress_callback=None, roi=None, box=None):
+            # progress_callback(frame_number, total_frames) is called every 30 frames (e.g. for the post-processing queue)
+            total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+            # Manually select box (or use the given box)
+            self.select_and_save_box(box)
 
-            # Select ROI and initialize variables
-            frame, roi = self.select_roi()
+            # Select ROI (or use the given ROI) and initialize variables
+            frame, roi = self.select_roi(roi)
 
-            fourcc = cv2.VideoWriter_fourcc(*'XVID')
-            self.out_video = cv2.VideoWriter(self.output_video_filename, fourcc, self.fps, (frame.shape[1], frame.shape[0]))
+            if self.annotate:
+                fourcc = cv2.VideoWriter_fourcc(*self.tracking_codec) if self.tracking_codec else 0
+                self.out_video = cv2.VideoWriter(self.output_video_filename, fourcc, self.fps, (frame.shape[1], frame.shape[0]), isColor=frame.ndim == 3)
 
             with open(self.csv_filename, mode='w', newline='') as file:
                 writer = csv.writer(file)
-                writer.writerow(["Time (seconds)", "X", "Y", "angle (degrees)"])
+                writer.writerow(["Time (seconds)", "X", "Y", "angle (degrees)", "Found"])
 
                 frame_number = 0
                 while True:
-                    ret, frame = self.cap.read()
-                    if not ret:
-                        break
+                    # The first frame is the one of the ROI selection, so every frame has its own timestamp
+                    if frame_number > 0:
+                        ret, frame = self.read_frame()
+                        if not ret:
+                            break
 
                     if frame_number < len(self.timestamps):
                         time_seconds = self.timestamps[frame_number]
@@ -216,34 +301,84 @@ class VideoTracker:
 
                     # Update ROI based on object position
                     frame, roi = self.update_roi_center(frame, roi)
+                    found = int(self.found)
 
                     # Get center of the updated ROI
                     x, y, w, h = [int(v) for v in roi]
-                    center_x = x + w // 2
-                    center_y = y + h // 2
+                    center_x = x + w // 2 + self.offset[0]  # Full-frame pixels (also for a cropped recording)
+                    center_y = y + h // 2 + self.offset[1]
                     #print(center_x)
                     #print(center_y)
-                    # Calculate the orientation (assuming square ROI, otherwise, use angle of bounding box)
-                    angle = 0  # We can skip angle computation for this simple case
+                    # Orientation of the object (from the minAreaRect in update_roi_center, last known value if no contour was found)
+                    angle = self.angle
 
                     # Write data to CSV
-                    writer.writerow([time_seconds, center_x, center_y, angle])
+                    with Tracing.span("write csv", "tracker"):
+                        writer.writerow([time_seconds, center_x, center_y, angle, found])
 
                     # Write the frame to the output video
-                    self.out_video.write(frame)
+                    if self.annotate:
+                        with Tracing.span("encode", "tracker"):
+                            self.out_video.write(frame)
 
                     # Display the frame
-                    cv2.imshow("Tracking", frame)
-                    if cv2.waitKey(1) & 0xFF == ord('q'):
-                        break
+                    if self.display:
+                        cv2.imshow("Tracking", frame)
+                        if cv2.waitKey(1) & 0xFF == ord('q'):
+                            break
 
                     frame_number += 1
+                    if progress_callback is not None and frame_number % 30 == 0:
+                        progress_callback(frame_number, total_frames)
 
             self.cap.release()
-            self.out_video.release()
-            cv2.destroyAllWindows()
+            if self.display:
+                cv2.destroyAllWindows()
             print(f"Tracking data saved to {self.csv_filename}")
-            print(f"Tracking video saved to {self.output_video_filename}")
+            if self.annotate:
+                self.out_video.release()
+                print(f"Tracking video saved to {self.output_video_filename}")
+
+    @Tracing.traced("render", "tracker")
+    def render_tracking_video(self, progress_callback=None):
+            # The annotated tracking video after tracking without annotation: the center and the orientation of the
+            # saved locations are drawn on the (undistorted) color frames. The contour of the object isn't saved
+            with open(self.csv_filename, newline='') as file:
+                locations = [(float(row["X"]) - self.offset[0], float(row["Y"]) - self.offset[1],
+                              float(row["angle (degrees)"]), int(row["Found"])) for row in csv.DictReader(file)]
+
+            self.reader = IndexedVideoReader(self.video_path)
+            self.cap = self.reader.cap
+            total_frames = len(locations)
+            fourcc = cv2.VideoWriter_fourcc(*self.tracking_codec) if self.tracking_codec else 0
+            self.out_video = None
+
+            for frame_number, (x, y, angle, found) in enumerate(locations):
+                ret, frame = self.read_frame()
+                if not ret:
+                    print(f"[WARNING] The video ends before the locations, rendered {frame_number} of {total_frames} frames")
+                    break
+                if self.out_video is None:
+                    self.out_video = cv2.VideoWriter(self.output_video_filename, fourcc, self.fps, (frame.shape[1], frame.shape[0]))
+
+                # Red if the object was found in this frame, grey if the last position is repeated
+                color = (0, 0, 255) if found else (128, 128, 128)
+                center = (int(x), int(y))
+                tip = (int(x + 20 * np.cos(np.radians(angle))), int(y + 20 * np.sin(np.radians(angle))))
+                cv2.circle(frame, center, 5, color, -1)
+                cv2.line(frame, center, tip, color, 2)
+                cv2.putText(frame, f"Orientation: {angle:.2f} deg", (center[0] - 60, center[1] - 30),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+                with Tracing.span("encode", "tracker"):
+                    self.out_video.write(frame)
+
+                if progress_callback is not None and (frame_number + 1) % 30 == 0:
+                    progress_callback(frame_number + 1, total_frames)
+
+            self.cap.release()
+            if self.out_video is not None:
+                self.out_video.release()
+                print(f"Tracking video saved to {self.output_video_filename}")
 
 # Used when this class is run seperately 
 if __name__ == "__main__":
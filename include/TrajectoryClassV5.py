@@ -7,8 +7,13 @@ This class reconstructs the 3D trajectory of a moving object using input from tw
 The reconstruction is based on known physical dimensions of a calibration object (box) visible to both cameras,
 allowing conversion of pixel measurements to real-world units (millimeters).
 
+With more cameras (or two cameras with stereo extrinsics), the position is triangulated over all cameras instead:
+every camera that sees the object adds two equations to a least-squares DLT problem, solved for all frames at once
+(include/Triangulation.py). This needs the pose of every camera relative to camera 1 in the calibration file
+(CameraCalibration.py --extrinsics); without it only camera 1 and 2 are used with the box geometry below.
+
 Main Workflow:
-- Loads object tracking data from two CSV files:
+- Loads object tracking data from two (or more) CSV files:
   - Camera 1: provides 2D image coordinates (X, Y).
   - Camera 2: provides depth-related information derived from Y-coordinates.
 - Computes real-world scaling factors (mm/pixel) using the box visible in each camera's field of view.
@@ -21,15 +26,27 @@ Main Workflow:
 - Visualizes the result using matplotlib:
   - 3D trajectory in world coordinates.
   - 2D projections from both camera views.
-  - Object velocity over time, smoothed with a moving average filter.
+  - Object velocity over time, smoothed with a Savitzky-Golay filter for non-uniform time steps (Kinematics module).
 
 Methods:
-- __init__(csv_file_cam1, csv_file_cam2): Initializes the class with the paths to the two CSV files containing tracking data.
+- __init__(csv_file_cam1, csv_file_cam2, *more_csv_files, points_undistorted, calibration_file): Initializes the class with the paths to the CSV files containing tracking data.
+  The locations of the other cameras are interpolated to the timestamps of camera 1.
+  Set points_undistorted=True if the tracker already undistorted the frames, the points are then used as they are.
+  The camera matrices are loaded from the calibration file (default: cameraCalibration/calibration.json).
 - load_mm_per_pixel_from_box(csv_path, real_width_mm, real_height_mm): Calculates scaling factors from calibration box CSV.
 - camera_to_box_distance(L_real_mm, L_pixels, focal_length_px):Computes camera-to-object distance using pinhole camera geometry.
+- align(timestamps, points, found): Interpolates the points of another camera to the timestamps of camera 1.
+- geometry(verbose): Returns the TrajectoryGeometry (calibration and boxes) that converts the pixel positions to 3D, one sample at a time.
 - reconstruct(): Reconstructs the 3D trajectory by converting 2D points and depth into world coordinates, then saves the 3D points to a CSV file.
-- plot_trajectory(): Plots the 3D trajectory of the tracked object and visualizes the 2D projections from both cameras.
-- plot_velocity():Displays a smoothed velocity graph based on 3D displacement over time.
+  The velocity, acceleration, orientation and angular rate are saved to <base>_Kinematics.csv.
+- triangulate_all(): Triangulates all frames over the cameras that see the object (used when every camera has a pose).
+- store_metadata(): Returns the metadata (calibration, box dimensions, fps) that is saved with the trajectory.
+- save_to_store(store_path): Saves the trajectory to a chunked HDF5 TrajectoryStore for time-range reads.
+- plot_trajectory(save_path, block): Plots the 3D trajectory of the tracked object and visualizes the 2D projections from both cameras.
+- plot_velocity(save_path, block): Displays a smoothed velocity graph based on 3D displacement over time.
+- trajectory_plot_data(): Returns the time, 3D points and 2D camera points used by the trajectory plot.
+- export_plots(formats, background): Saves both plots to files with the Agg backend (on a background thread), without opening windows.
+  The plotting itself (with downsampling for display) is done by the TrajectoryPlotter class.
 
 Author: Stijn Kolkman (s.y.kolkman@student.utwente.nl)
 Date: April 2025
@@ -39,65 +56,95 @@ Date: April 2025
 
 import cv2
 import numpy as np
-import matplotlib.pyplot as plt
 import pandas as pd
 import os
+import re
+from include.TrajectoryPlotter import TrajectoryPlotter
+from include.Kinematics import compute_kinematics
+from include.TrajectoryStore import TrajectoryStore
+from include.CameraCalibration import load_calibration, DEFAULT_CALIBRATION_FILE
+from include.TrajectoryGeometry import TrajectoryGeometry, BOX_MM_CAM1, BOX_MM_CAM2
+from include.Triangulation import projection_matrix, triangulate_points
+from include import Tracing
+
+def camera_name(csv_path, index):
+    # <base>_cam3_locations.csv --> cam3
+    match = re.search(r'_(cam\d+)_locations\.csv$', os.path.basename(csv_path))
+    return match.group(1) if match else f"cam{index + 1}"
 
 class TrajectoryReconstructor:
-    def __init__(self, csv_file_cam1, csv_file_cam2):
+    def __init__(self, csv_file_cam1, csv_file_cam2, *more_csv_files, points_undistorted=False, calibration_file=DEFAULT_CALIBRATION_FILE):
         
-        # Load the CSV files using pandas.
+        # Load the CSV files using pandas (camera 1 and 2, and the locations of any other camera)
         self.csv_file_cam1 = csv_file_cam1
         self.csv_file_cam2 = csv_file_cam2
+        self.csv_files = [csv_file_cam1, csv_file_cam2, *more_csv_files]
+        self.camera_names = [camera_name(path, i) for i, path in enumerate(self.csv_files)]
         self.output_dir = os.path.dirname(csv_file_cam1)
         base = os.path.basename(csv_file_cam1)
         self.base_name = base.replace("_cam1_locations.csv", "")
-        self.data_cam1 = pd.read_csv(csv_file_cam1)
-        self.data_cam2 = pd.read_csv(csv_file_cam2)
-        
-        # Extract X, Y coordinates
-        self.x_cam1 = self.data_cam1['X'].to_numpy()
-        self.y_cam1 = self.data_cam1['Y'].to_numpy()
-        self.x_cam2 = self.data_cam2['X'].to_numpy() 
-        self.y_cam2 = self.data_cam2['Y'].to_numpy()  
-        self.timestamps = self.data_cam1['Time (seconds)'].to_numpy()  # Assuming timestamps are the same for both cameras
-
-        # Camera calibration parameters
-        self.camera_matrix1 = np.array([
-            [1397.9,   0, 953.6590],
-            [   0, 1403.0, 555.1515],
-            [   0,   0,   1]
-        ], dtype=np.float64)
-        self.dist_coeffs1 = np.array([0.1216, -0.1727, 0.00, 0.00, 0.0], dtype=np.float64)
-        self.camera_matrix2 = np.array([
-            [1397.9,   0, 953.6590],
-            [   0, 1403.0, 555.1515],
-            [   0,   0,   1]
-        ], dtype=np.float64)
-        self.dist_coeffs2 = np.array([0.1216, -0.1727, 0.00, 0.00, 0.0], dtype=np.float64)
-
-        #Compensate for the distortion
-        points_cam1 = np.column_stack((self.x_cam1, self.y_cam1)).astype(np.float32)
-        undistorted_cam1 = cv2.undistortPoints(points_cam1, self.camera_matrix1, self.dist_coeffs1, P=self.camera_matrix1)
-        undistorted_cam1 = undistorted_cam1.reshape(-1, 2)
-        self.x_cam1 = undistorted_cam1[:, 0]
-        self.y_cam1 = undistorted_cam1[:, 1]
-
-        points_cam2 = np.column_stack((self.x_cam2, self.y_cam2)).astype(np.float32)
-        undistorted_cam2 = cv2.undistortPoints(points_cam2, self.camera_matrix2, self.dist_coeffs2, P=self.camera_matrix2)
-        undistorted_cam2 = undistorted_cam2.reshape(-1, 2)
-        self.x_cam2 = undistorted_cam2[:, 0]
-        self.y_cam2 = undistorted_cam2[:, 1]
+
+        # Camera calibration parameters (made with include/CameraCalibration.py), the other cameras need a calibration to be used
+        calibration = load_calibration(calibration_file)
+        for path, name in list(zip(self.csv_files, self.camera_names))[2:]:
+            if name not in calibration["cameras"]:
+                print(f"[WARNING] {name} is not in the calibration file, its locations are not used")
+                self.csv_files.remove(path)
+                self.camera_names.remove(name)
+
+        with Tracing.span("read csv", "reconstructor"):
+            self.data = [pd.read_csv(path) for path in self.csv_files]
+        self.data_cam1, self.data_cam2 = self.data[0], self.data[1]
+
+        self.camera_matrices = [calibration["cameras"][name]["camera_matrix"] for name in self.camera_names]
+        self.dist_coeffs = [calibration["cameras"][name]["dist_coeffs"] for name in self.camera_names]
+        self.camera_matrix1, self.camera_matrix2 = self.camera_matrices[0], self.camera_matrices[1]
+        self.dist_coeffs1, self.dist_coeffs2 = self.dist_coeffs[0], self.dist_coeffs[1]
+
+        # Triangulate over all cameras if every camera has a pose (extrinsics), otherwise use the box geometry of camera 1 and 2
+        self.poses = [(calibration["cameras"][name].get("R"), calibration["cameras"][name].get("T")) for name in self.camera_names]
+        self.triangulate = all(R is not None for R, _ in self.poses)
+        if len(self.csv_files) > 2 and not self.triangulate:
+            print("[WARNING] Not every camera has a pose in the calibration, only camera 1 and 2 are used (box geometry)")
+
+        # The timestamps of camera 1 are the time base of the trajectory
+        self.timestamps = self.data_cam1['Time (seconds)'].to_numpy()
+        self.angle_cam1 = self.data_cam1['angle (degrees)'].to_numpy()  # Orientation of the object seen from the top/bottom camera
+
+        # Extract the X, Y coordinates of every camera and compensate for the distortion (skipped if the tracker already
+        # undistorted the full frames). The other cameras are then interpolated to the timestamps of camera 1
+        self.points = []   # (n_frames, 2) per camera
+        self.visible = []  # (n_frames,) per camera, False where the tracker didn't find the object
+        for i, data in enumerate(self.data):
+            points = np.column_stack((data['X'].to_numpy(), data['Y'].to_numpy())).astype(np.float64)
+            if not points_undistorted:
+                with Tracing.span("undistort points", "reconstructor"):
+                    undistorted = cv2.undistortPoints(points.astype(np.float32), self.camera_matrices[i], self.dist_coeffs[i], P=self.camera_matrices[i])
+                    points = undistorted.reshape(-1, 2)
+            found = data['Found'].to_numpy() > 0 if 'Found' in data else np.ones(len(data), dtype=bool)
+            if i > 0:
+                points, found = self.align(data['Time (seconds)'].to_numpy(), points, found)
+            self.points.append(points)
+            self.visible.append(found)
+
+        self.x_cam1, self.y_cam1 = self.points[0][:, 0], self.points[0][:, 1]
+        self.x_cam2, self.y_cam2 = self.points[1][:, 0], self.points[1][:, 1]
 
         # Initialize 3D points to None
         self.points_3d = None
 
-        # Known physical dimensions of the box in mm (MILLIMETER!!!) (per view)
-        self.real_box_width_cam1_mm = 108    # Width as seen from camera 1 (top/bottom view)
-        self.real_box_height_cam1_mm = 56    # Height as seen from camera 1
+        # Window (in samples) of the Savitzky-Golay filter for the velocity, acceleration and angular rate
+        self.kinematics_window = 51
+
+        # Also save the trajectory to a chunked HDF5 store (TrajectoryStore) next to the CSV
+        self.save_hdf5 = True
 
-        self.real_box_width_cam2_mm = 108     # Width as seen from camera 2 (side view)
-        self.real_box_height_cam2_mm = 32    # Height as seen from camera 2 (used for Z)
+        # Plots are downsampled to at most max_points points per line
+        self.plotter = TrajectoryPlotter(max_points=5000)
+
+        # Known physical dimensions of the box in mm (MILLIMETER!!!) (per view)
+        self.real_box_width_cam1_mm, self.real_box_height_cam1_mm = BOX_MM_CAM1    # As seen from camera 1 (top/bottom view)
+        self.real_box_width_cam2_mm, self.real_box_height_cam2_mm = BOX_MM_CAM2    # As seen from camera 2 (side view, height used for Z)
 
         # Load box CSVs and compute mm-per-pixel scales
         box_file_cam1 = self.csv_file_cam1.replace("_locations.csv", "_box.csv")
@@ -105,6 +152,18 @@ class TrajectoryReconstructor:
         (self.box_x_cam1, self.box_y_cam1, self.width_px_cam1,self.height_px_cam1, self.mm_per_pixel_x_cam1,self.mm_per_pixel_y_cam1) = self.load_mm_per_pixel_from_box(box_file_cam1, self.real_box_width_cam1_mm, self.real_box_height_cam1_mm)
         (self.box_x_cam2, self.box_y_cam2,self.width_px_cam2,self.height_px_cam2, self.mm_per_pixel_x_cam2,self.mm_per_pixel_y_cam2) = self.load_mm_per_pixel_from_box(box_file_cam2, self.real_box_width_cam2_mm, self.real_box_height_cam2_mm)
 
+    def align(self, timestamps, points, found):
+        """Interpolates the points of another camera to the timestamps of camera 1 (unchanged if the timestamps are the same)."""
+        if len(timestamps) == len(self.timestamps) and np.array_equal(timestamps, self.timestamps):
+            return points, found
+        x = np.interp(self.timestamps, timestamps, points[:, 0])
+        y = np.interp(self.timestamps, timestamps, points[:, 1])
+
+        # Only visible if the frames on both sides are visible and the time is within the recording of this camera
+        visible = np.interp(self.timestamps, timestamps, found.astype(np.float64)) > 0.999
+        visible &= (self.timestamps >= timestamps[0]) & (self.timestamps <= timestamps[-1])
+        return np.column_stack((x, y)), visible
+
     def load_mm_per_pixel_from_box(self, csv_path, real_width_mm=None, real_height_mm=None):
         """
         Loads a box file and calculates mm-per-pixel scaling based on real-world dimensions.
@@ -127,66 +186,29 @@ class TrajectoryReconstructor:
         L_real_m = L_real_mm / 1000.0
         D_camera_box =(focal_length_px * L_real_m) / L_pixels
         return D_camera_box
+
+    def geometry(self, verbose=False):
+        """Returns a TrajectoryGeometry with the calibration and boxes of this reconstructor."""
+        return TrajectoryGeometry(self.camera_matrix1, self.camera_matrix2,
+                                  (self.box_x_cam1, self.box_y_cam1, self.width_px_cam1, self.height_px_cam1),
+                                  (self.box_x_cam2, self.box_y_cam2, self.width_px_cam2, self.height_px_cam2),
+                                  (self.real_box_width_cam1_mm, self.real_box_height_cam1_mm),
+                                  (self.real_box_width_cam2_mm, self.real_box_height_cam2_mm), verbose=verbose)
     
+    @Tracing.traced("reconstruct", "reconstructor")
     def reconstruct(self):
         """Reconstructs the 3D trajectory using mm-per-pixel scaling based on known box dimensions."""
-        # Get the focal lengths and the optical centers
-        fx_cam1 = self.camera_matrix1[0,0]
-        fy_cam1 = self.camera_matrix1[1,1]
-        fx_cam2 = self.camera_matrix2[0,0]
-        fy_cam2 = self.camera_matrix2[1,1]
-
-        cx_cam1 = self.camera_matrix1[0, 2]
-        cy_cam1 = self.camera_matrix1[1, 2]
-        cy_cam2 = self.camera_matrix2[1, 2]
-
-        # Initialize the distances and 3d location
-        Z1 = np.zeros_like(self.x_cam1, dtype=np.float64)
-        Z2 = np.zeros_like(self.x_cam1, dtype=np.float64)
-        X_3d = np.zeros_like(self.x_cam1, dtype=np.float64)
-        Y_3d = np.zeros_like(self.x_cam1, dtype=np.float64)
-        Z_3d = np.zeros_like(self.x_cam1, dtype=np.float64)
-
-        # Calculate the initial distance between the camera and the box
-        cam1_to_box_distance = self.camera_to_box_distance(self.real_box_width_cam1_mm,self.width_px_cam1,fx_cam1)
-        cam2_to_box_distance = self.camera_to_box_distance(self.real_box_width_cam2_mm,self.width_px_cam2,fx_cam2)
-        print(f"The initial distance from camera 1 to the bottom of the box is: {cam1_to_box_distance}m")
-        print(f"The initial distance from camera 2 to the nearest side of the box is: {cam2_to_box_distance}m")
-
-        # Find the bottom of the box
-        bottom_box_cam1 = self.box_y_cam1+self.height_px_cam1    
-        bottom_box_cam2 = self.box_y_cam2+self.height_px_cam2
-
-        # Use the position of the object and the bottom of the box to calculate the position in the box
-        initial_y = (bottom_box_cam1-self.y_cam1[0])*(self.mm_per_pixel_y_cam1/1000)
-        initial_z = (bottom_box_cam2-self.y_cam2[0])*(self.mm_per_pixel_y_cam2/1000)
-
-        # Calculate the initial distance between the object and the camera's
-        Z1[0] = cam1_to_box_distance + initial_z # Distance between object and camera1 at time=0
-        Z2[0] = cam2_to_box_distance + initial_y # Distance between object and camera2 at time=0
-        print(f"The initial distance from camera 1 to the object is: {Z1[0]}m")
-        print(f"The initial distance from camera 2 to the object is: {Z2[0]}m")
-
-        # Loop to calculate the 3d position and update the distances per timestep
-        for i, value in enumerate(self.x_cam1):
-            X_3d[i] = (self.x_cam1[i] - cx_cam1)*Z1[i]/fx_cam1
-            Y_3d[i] = (self.y_cam1[i] - cy_cam1)*Z1[i]/fy_cam1
-            Z_3d[i] = -(self.y_cam2[i] - cy_cam2)*Z2[i]/fy_cam2
-            if i < len(self.x_cam1) - 1:
-                # Adjust future depth estimates based on movement in Y and Z,
-                # this is assuming smooth motion and small displacements
-                Z1[i+1] = Z1[0]+(Z_3d[i] - Z_3d[0])
-                Z2[i+1] = Z2[0]-(Y_3d[i] - Y_3d[0])
-
-        # Make the first position 0,0,0
-        X_3d -= X_3d[0]
-        Y_3d -= Y_3d[0]
-        Z_3d -= Z_3d[0]
-
-        # Convert to millimeter
-        X_3d *= 1000
-        Z_3d *= 1000
-        Y_3d *= 1000
+        # The geometry (pinhole model, depth updated with the movement seen by the other camera) is in the
+        # TrajectoryGeometry class, which is also used for the live 3D position (LivePositionStream)
+        if self.triangulate:
+            X_3d, Y_3d, Z_3d = self.triangulate_all().T
+        else:
+            geometry = self.geometry(verbose=True)
+            X_3d = np.zeros_like(self.x_cam1, dtype=np.float64)
+            Y_3d = np.zeros_like(self.x_cam1, dtype=np.float64)
+            Z_3d = np.zeros_like(self.x_cam1, dtype=np.float64)
+            for i in range(len(self.x_cam1)):
+                X_3d[i], Y_3d[i], Z_3d[i] = geometry.update_relative(self.x_cam1[i], self.y_cam1[i], self.x_cam2[i], self.y_cam2[i])
 
         # Stack the coordinates into a 3D array (X, Y, Z)
         self.points_3d = np.vstack((X_3d, Y_3d, Z_3d))
@@ -204,102 +226,118 @@ class TrajectoryReconstructor:
         output_file_path = os.path.join(self.output_dir, f"{self.base_name}_Trajectory.csv")
 
         # Save the DataFrame to CSV
-        self.points_with_timestamp.to_csv(output_file_path, index=False)
+        with Tracing.span("write csv", "reconstructor"):
+            self.points_with_timestamp.to_csv(output_file_path, index=False)
 
-        # Compute velocities in mm/s
-        dt = np.diff(self.timestamps)  # Time difference between frames
-        dx = np.diff(self.points_3d[0])  # ΔX
-        dy = np.diff(self.points_3d[1])  # ΔY
-        dz = np.diff(self.points_3d[2])  # ΔZ
-        velocities = np.sqrt(dx**2 + dy**2 + dz**2) / dt
+        # Save the trajectory (with the calibration and box dimensions) to the chunked HDF5 store for time-range reads
+        if self.save_hdf5:
+            with Tracing.span("write hdf5", "reconstructor"):
+                self.save_to_store(os.path.join(self.output_dir, f"{self.base_name}_Trajectory.h5"))
 
-        # Save for plotting later (and also filter the velocity with a moving average filter)
-        window_size_moving_average = 50
-        self.velocities = np.convolve(velocities, np.ones(window_size_moving_average)/window_size_moving_average, mode='valid')
-        self.velocity_timestamps_initial = self.timestamps[1:] 
-        self.velocity_timestamps=self.velocity_timestamps_initial[window_size_moving_average - 1:]  # adjust time axis
+        # Compute the velocity, acceleration and angular rate (non-uniform Savitzky-Golay, no time shift)
+        # and save them next to the trajectory
+        with Tracing.span("kinematics", "reconstructor"):
+            self.kinematics = compute_kinematics(self.timestamps, self.points_3d.T, self.angle_cam1, window=self.kinematics_window)
+        with Tracing.span("write csv", "reconstructor"):
+            self.kinematics.to_csv(os.path.join(self.output_dir, f"{self.base_name}_Kinematics.csv"), index=False)
+
+        # Save for plotting later
+        self.velocities = self.kinematics['Speed'].to_numpy()
+        self.velocity_timestamps = self.timestamps
 
         return self.points_with_timestamp
 
-    def plot_trajectory(self):
+    def triangulate_all(self):
+        """
+        Triangulates every frame over all cameras that see the object (least-squares DLT, see include/Triangulation.py).
+        Returns (n_frames, 3) in mm relative to the first position, frames seen by fewer than two cameras are interpolated.
+        """
+        projections = np.array([projection_matrix(K, R, T) for K, (R, T) in zip(self.camera_matrices, self.poses)])
+        points_3d = triangulate_points(projections, np.stack(self.points, axis=1), np.column_stack(self.visible))
+
+        missing = np.isnan(points_3d).any(axis=1)
+        if missing.all():
+            raise RuntimeError("The object is not seen by two cameras in any frame")
+        if missing.any():
+            print(f"[WARNING] {missing.sum()} frames are seen by fewer than two cameras, their position is interpolated")
+            for axis in range(3):
+                points_3d[missing, axis] = np.interp(self.timestamps[missing], self.timestamps[~missing], points_3d[~missing, axis])
+
+        # Make the first position 0,0,0 (the poses are in millimeter)
+        return points_3d - points_3d[0]
+
+    def store_metadata(self):
+        # Everything needed to interpret the trajectory later, saved next to the data
+        duration = self.timestamps[-1] - self.timestamps[0] if len(self.timestamps) > 1 else 0.0
+        return {
+            "source": {name: os.path.basename(path) for name, path in zip(self.camera_names, self.csv_files)},
+            "units": {"time": "s", "position": "mm"},
+            "fps": (len(self.timestamps) - 1) / duration if duration > 0 else None,
+            "method": "triangulation" if self.triangulate else "box geometry",
+            "calibration": {
+                name: {"camera_matrix": K, "dist_coeffs": d, **({"R": R, "T": T} if R is not None else {})}
+                for name, K, d, (R, T) in zip(self.camera_names, self.camera_matrices, self.dist_coeffs, self.poses)
+            },
+            "box_mm": {
+                "cam1": [self.real_box_width_cam1_mm, self.real_box_height_cam1_mm],
+                "cam2": [self.real_box_width_cam2_mm, self.real_box_height_cam2_mm],
+            },
+            "box_px": {
+                "cam1": [self.box_x_cam1, self.box_y_cam1, self.width_px_cam1, self.height_px_cam1],
+                "cam2": [self.box_x_cam2, self.box_y_cam2, self.width_px_cam2, self.height_px_cam2],
+            },
+        }
+
+    def save_to_store(self, store_path):
+        """Writes the reconstructed trajectory to a new TrajectoryStore (HDF5) file, with the metadata."""
+        with TrajectoryStore(store_path, mode="w", metadata=self.store_metadata()) as store:
+            store.append(self.timestamps, self.points_3d.T)
+        print(f"[INFO] Trajectory saved to {store_path}")
+
+    def plot_trajectory(self, save_path=None, block=True):
+        """Plots the (downsampled) 3D trajectory and both camera views. With save_path the plot is written to a file without opening a window."""
         if self.points_3d is None:
             print("No 3D points to plot. Call 'reconstruct()' first.")
             return
 
-        # Extract 3D coordinates
-        x_coords = self.points_3d[0, :]
-        y_coords = self.points_3d[1, :]
-        z_coords = self.points_3d[2, :]
-
         # Create figure with 3 subplots: 3D and two 2D plots
-        fig = plt.figure(figsize=(15, 5))
-
-        # Plot 3D trajectory
-        ax_3d = fig.add_subplot(131, projection='3d')
-        #ax_3d.scatter(x_coords, y_coords, z_coords, color='r', marker='o', s=50)
-        ax_3d.plot(x_coords, y_coords, z_coords, color='b', linestyle='-', linewidth=2)
-        ax_3d.set_title("Trajectory")
-        ax_3d.set_xlabel("X (mm)")
-        ax_3d.set_ylabel("Y (mm)")
-        ax_3d.set_zlabel("Z (mm)")
-
-        # Get the limits for each axis
-        x_limits = ax_3d.get_xlim()
-        y_limits = ax_3d.get_ylim()
-        z_limits = ax_3d.get_zlim()
-
-        # Find the largest range among the axes
-        max_range = max(
-            x_limits[1] - x_limits[0], 
-            y_limits[1] - y_limits[0], 
-            z_limits[1] - z_limits[0]
-        )
-
-        # Set the same range for all axes
-        ax_3d.set_xlim([x_limits[0], x_limits[0] + max_range])
-        ax_3d.set_ylim([y_limits[0], y_limits[0] + max_range])
-        ax_3d.set_zlim([z_limits[0], z_limits[0] + max_range])
-        ax_3d.view_init(elev=30, azim=+90)
-
-        # Camera resolution
-        cam_width, cam_height = 1920, 1080
-
-        # Plot Camera 1 (X,Y)
-        ax_cam1 = fig.add_subplot(132)
-        ax_cam1.scatter(self.x_cam1, self.y_cam1, color='g', marker='x')
-        ax_cam1.plot(self.x_cam1, self.y_cam1, color='g', linestyle='--')
-        ax_cam1.set_title("Camera 1 Tracked Points")
-        ax_cam1.set_xlabel("X (pixels)")
-        ax_cam1.set_ylabel("Y (pixels)")
-        ax_cam1.set_xlim(0, cam_width)
-        ax_cam1.set_ylim(cam_height, 0)
-
-        # Plot Camera 2 (X,Z)
-        ax_cam2 = fig.add_subplot(133)
-        ax_cam2.scatter(self.x_cam2, self.y_cam2, color='m', marker='x')
-        ax_cam2.plot(self.x_cam2, self.y_cam2, color='m', linestyle='--')
-        ax_cam2.set_title("Camera 2 Tracked Points (X vs Z)")
-        ax_cam2.set_xlabel("X (pixels)")
-        ax_cam2.set_ylabel("Z (pixels)")
-        ax_cam2.set_xlim(0, cam_width)
-        ax_cam2.set_ylim(cam_height, 0)
-
-        plt.tight_layout()
-        plt.show()
-
-    def plot_velocity(self):
+        fig = self.plotter.new_figure((15, 5), headless=save_path is not None)
+        self.plotter.draw_trajectory(fig, *self.trajectory_plot_data())
+        self.plotter.finish(fig, save_path, block)
+
+    def plot_velocity(self, save_path=None, block=True):
+        """Plots the (downsampled) velocity over time. With save_path the plot is written to a file without opening a window."""
         if not hasattr(self, 'velocities'):
             print("Velocity not computed. Run 'reconstruct()' first.")
             return
 
-        plt.figure(figsize=(8, 4))
-        plt.plot(self.velocity_timestamps, self.velocities, color='orange', linewidth=2)
-        plt.title("Object Velocity Over Time")
-        plt.xlabel("Time (s)")
-        plt.ylabel("Velocity (mm/s)")
-        plt.grid(True)
-        plt.tight_layout()
-        plt.show()
+        fig = self.plotter.new_figure((8, 4), headless=save_path is not None)
+        self.plotter.draw_velocity(fig, self.velocity_timestamps, self.velocities)
+        self.plotter.finish(fig, save_path, block)
+
+    def trajectory_plot_data(self):
+        points_cam1 = np.column_stack((self.x_cam1, self.y_cam1))
+        points_cam2 = np.column_stack((self.x_cam2, self.y_cam2))
+        return self.timestamps, self.points_3d, points_cam1, points_cam2
+
+    def export_plots(self, formats=("png",), background=True):
+        """
+        Saves the trajectory and velocity plots as <base>_Trajectory.<ext> and <base>_Velocity.<ext> with the Agg backend.
+        With background=True the rendering runs on a background thread, which is returned (join it to wait).
+        """
+        if self.points_3d is None:
+            print("No 3D points to plot. Call 'reconstruct()' first.")
+            return None
+
+        base_path = os.path.join(self.output_dir, self.base_name)
+        jobs = [
+            (self.plotter.draw_trajectory, (15, 5), self.trajectory_plot_data(), [f"{base_path}_Trajectory.{ext}" for ext in formats]),
+            (self.plotter.draw_velocity, (8, 4), (self.velocity_timestamps, self.velocities), [f"{base_path}_Velocity.{ext}" for ext in formats]),
+        ]
+        if background:
+            return self.plotter.save_async(jobs)
+        self.plotter.save_all(jobs)
+        return None
 
 # # Used when this class is run seperately 
 if __name__ == "__main__":
@@ -0,0 +1,97 @@
+"""
+TrajectoryGeometry Class
+
+This class contains the geometry of the TrajectoryReconstructor: it converts the (undistorted) pixel positions of the
+object in both cameras to a 3D position, one sample at a time. It is used by the TrajectoryReconstructor for the
+offline reconstruction and by the LivePositionStream for the live 3D position, so both give the same result.
+
+The camera-to-box distances follow from the known box width and its width in pixels (pinhole model). The first
+sample sets the initial distances between the object and both cameras (from the position of the object relative to
+the bottom of the box). After that, the depth of every camera is updated with the movement seen by the other camera,
+assuming smooth motion and small displacements.
+
+Methods:
+- __init__(camera_matrix1, camera_matrix2, box_cam1, box_cam2, box_mm_cam1, box_mm_cam2): Initializes the geometry with
+  the camera matrices, the boxes (X, Y, Width, Height in pixels) and the real box sizes (width, height in mm).
+- camera_to_box_distance(L_real_mm, L_pixels, focal_length_px): Computes camera-to-object distance using pinhole camera geometry.
+- reset(): Starts a new trajectory (the next sample is the first sample).
+- update(x_cam1, y_cam1, x_cam2, y_cam2): Returns the 3D position (X, Y, Z) in meters, in the coordinate system of camera 1.
+- update_relative(x_cam1, y_cam1, x_cam2, y_cam2): Returns the 3D position in mm relative to the first sample (as in the trajectory CSV).
+"""
+
+# Known physical dimensions of the box in mm (MILLIMETER!!!) (width, height per view)
+BOX_MM_CAM1 = (108, 56)    # As seen from camera 1 (top/bottom view)
+BOX_MM_CAM2 = (108, 32)    # As seen from camera 2 (side view, the height is used for Z)
+
+class TrajectoryGeometry:
+    def __init__(self, camera_matrix1, camera_matrix2, box_cam1, box_cam2, box_mm_cam1, box_mm_cam2, verbose=False):
+        # Get the focal lengths and the optical centers
+        self.fx_cam1 = camera_matrix1[0, 0]
+        self.fy_cam1 = camera_matrix1[1, 1]
+        self.fx_cam2 = camera_matrix2[0, 0]
+        self.fy_cam2 = camera_matrix2[1, 1]
+        self.cx_cam1 = camera_matrix1[0, 2]
+        self.cy_cam1 = camera_matrix1[1, 2]
+        self.cy_cam2 = camera_matrix2[1, 2]
+
+        # Boxes in pixels and in mm
+        self.box_x_cam1, self.box_y_cam1, self.width_px_cam1, self.height_px_cam1 = box_cam1
+        self.box_x_cam2, self.box_y_cam2, self.width_px_cam2, self.height_px_cam2 = box_cam2
+        self.real_box_width_cam1_mm, self.real_box_height_cam1_mm = box_mm_cam1
+        self.real_box_width_cam2_mm, self.real_box_height_cam2_mm = box_mm_cam2
+        self.mm_per_pixel_y_cam1 = self.real_box_height_cam1_mm / self.height_px_cam1
+        self.mm_per_pixel_y_cam2 = self.real_box_height_cam2_mm / self.height_px_cam2
+
+        # Calculate the initial distance between the camera and the box
+        self.cam1_to_box_distance = self.camera_to_box_distance(self.real_box_width_cam1_mm, self.width_px_cam1, self.fx_cam1)
+        self.cam2_to_box_distance = self.camera_to_box_distance(self.real_box_width_cam2_mm, self.width_px_cam2, self.fx_cam2)
+        if verbose:
+            print(f"The initial distance from camera 1 to the bottom of the box is: {self.cam1_to_box_distance}m")
+            print(f"The initial distance from camera 2 to the nearest side of the box is: {self.cam2_to_box_distance}m")
+        self.verbose = verbose
+        self.reset()
+
+    def camera_to_box_distance(self, L_real_mm, L_pixels, focal_length_px):
+        L_real_m = L_real_mm / 1000.0
+        D_camera_box =(focal_length_px * L_real_m) / L_pixels
+        return D_camera_box
+
+    def reset(self):
+        self.first = None  # First 3D position (m)
+        self.Z1 = None     # Distance between the object and camera 1 for the next sample
+        self.Z2 = None     # Distance between the object and camera 2 for the next sample
+
+    def update(self, x_cam1, y_cam1, x_cam2, y_cam2):
+        if self.first is None:
+            # Find the bottom of the box
+            bottom_box_cam1 = self.box_y_cam1 + self.height_px_cam1
+            bottom_box_cam2 = self.box_y_cam2 + self.height_px_cam2
+
+            # Use the position of the object and the bottom of the box to calculate the position in the box
+            initial_y = (bottom_box_cam1 - y_cam1) * (self.mm_per_pixel_y_cam1 / 1000)
+            initial_z = (bottom_box_cam2 - y_cam2) * (self.mm_per_pixel_y_cam2 / 1000)
+
+            # Calculate the initial distance between the object and the camera's
+            self.Z1_0 = self.cam1_to_box_distance + initial_z  # Distance between object and camera1 at time=0
+            self.Z2_0 = self.cam2_to_box_distance + initial_y  # Distance between object and camera2 at time=0
+            self.Z1, self.Z2 = self.Z1_0, self.Z2_0
+            if self.verbose:
+                print(f"The initial distance from camera 1 to the object is: {self.Z1_0}m")
+                print(f"The initial distance from camera 2 to the object is: {self.Z2_0}m")
+
+        X_3d = (x_cam1 - self.cx_cam1) * self.Z1 / self.fx_cam1
+        Y_3d = (y_cam1 - self.cy_cam1) * self.Z1 / self.fy_cam1
+        Z_3d = -(y_cam2 - self.cy_cam2) * self.Z2 / self.fy_cam2
+        if self.first is None:
+            self.first = (X_3d, Y_3d, Z_3d)
+
+        # Adjust future depth estimates based on movement in Y and Z,
+        # this is assuming smooth motion and small displacements
+        self.Z1 = self.Z1_0 + (Z_3d - self.first[2])
+        self.Z2 = self.Z2_0 - (Y_3d - self.first[1])
+        return X_3d, Y_3d, Z_3d
+
+    def update_relative(self, x_cam1, y_cam1, x_cam2, y_cam2):
+        # Make the first position 0,0,0 and convert to millimeter
+        X_3d, Y_3d, Z_3d = self.update(x_cam1, y_cam1, x_cam2, y_cam2)
+        return (X_3d - self.first[0]) * 1000, (Y_3d - self.first[1]) * 1000, (Z_3d - self.first[2]) * 1000
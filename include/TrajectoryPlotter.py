@@ -0,0 +1,185 @@
+"""
+TrajectoryPlotter Class
+
+This class draws the trajectory and velocity plots of the TrajectoryReconstructor. Long, high-rate recordings have
+far more samples than there are pixels on the screen, so the data is downsampled for display with a shape-preserving
+method first (LTTB by default, or min/max decimation), which keeps the peaks and corners of the trajectory visible.
+
+The figures can be shown in a window (optionally non-blocking, so the Tk recorder keeps running), or rendered
+straight to PNG/SVG files with the Agg backend. Headless figures are made with matplotlib.figure.Figure instead of
+pyplot, which makes it safe to render them on a background thread and never opens a window (batch runs).
+
+Methods:
+- __init__(max_points, method): Initializes the plotter with the maximum number of plotted points per line and the downsampling method.
+- downsample(x, values): Returns the indices of the samples to plot.
+- new_figure(figsize, headless): Creates a pyplot figure (window) or a headless Agg figure.
+- draw_trajectory(fig, time, points_3d, points_cam1, points_cam2, cam_size): Draws the 3D trajectory and both 2D camera views.
+- draw_velocity(fig, time, velocity): Draws the velocity over time.
+- finish(fig, save_path, block): Saves the figure to a file or shows it.
+- save_all(jobs): Renders and saves a list of figures with the Agg backend.
+- save_async(jobs): Same as save_all, but on a background thread.
+
+Functions:
+- lttb_indices(x, values, n_out): Largest-Triangle-Three-Buckets downsampling, also works for multi-dimensional values.
+- minmax_indices(values, n_buckets): Keeps the minimum and maximum sample of every bucket.
+"""
+
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import threading
+from include import Tracing
+
+def lttb_indices(x, values, n_out):
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # Points as rows of (x, value_1, ..., value_d), so a 3D trajectory is downsampled as a whole
+    points = np.column_stack((np.asarray(x, dtype=np.float64), np.asarray(values, dtype=np.float64).reshape(n, -1)))
+
+    # The first and last point are always kept, the rest is divided over n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+
+    a = points[0]
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        c = points[end:next_end].mean(axis=0)  # Average of the next bucket
+
+        # Pick the point that makes the largest triangle with the last picked point and the next bucket average
+        # (squared area in n dimensions: |u|^2 |w|^2 - (u.w)^2)
+        u = points[start:end] - a
+        w = c - a
+        area = (u * u).sum(axis=1) * (w @ w) - (u @ w) ** 2
+        indices[i + 1] = start + np.argmax(area)
+        a = points[indices[i + 1]]
+    return indices
+
+def minmax_indices(values, n_buckets):
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if 2 * n_buckets >= n or n_buckets < 1:
+        return np.arange(n)
+
+    # Equally sized buckets, the remaining tail is kept as it is
+    size = n // n_buckets
+    buckets = values[:size * n_buckets].reshape(n_buckets, size)
+    offsets = np.arange(n_buckets) * size
+    indices = np.concatenate((offsets + np.argmin(buckets, axis=1), offsets + np.argmax(buckets, axis=1), np.arange(size * n_buckets, n), [0]))
+    return np.unique(indices)
+
+class TrajectoryPlotter:
+    def __init__(self, max_points=5000, method="lttb"):
+        self.max_points = max_points
+        self.method = method  # "lttb" or "minmax"
+
+    def downsample(self, x, values):
+        if self.method == "minmax":
+            # Min/max per coordinate, the union keeps the extremes of every coordinate
+            values = np.asarray(values).reshape(len(x), -1)
+            n_buckets = max(1, self.max_points // (2 * values.shape[1]))
+            return np.unique(np.concatenate([minmax_indices(values[:, i], n_buckets) for i in range(values.shape[1])]))
+        return lttb_indices(x, values, self.max_points)
+
+    def new_figure(self, figsize, headless=False):
+        if headless:
+            # Not registered with pyplot --> no window, and safe to use on a background thread
+            fig = Figure(figsize=figsize)
+            FigureCanvasAgg(fig)
+            return fig
+        return plt.figure(figsize=figsize)
+
+    def draw_trajectory(self, fig, time, points_3d, points_cam1, points_cam2, cam_size=(1920, 1080)):
+        # Extract 3D coordinates (downsampled)
+        indices = self.downsample(time, points_3d.T)
+        x_coords = points_3d[0, indices]
+        y_coords = points_3d[1, indices]
+        z_coords = points_3d[2, indices]
+
+        # Plot 3D trajectory
+        ax_3d = fig.add_subplot(131, projection='3d')
+        ax_3d.plot(x_coords, y_coords, z_coords, color='b', linestyle='-', linewidth=2)
+        ax_3d.set_title("Trajectory")
+        ax_3d.set_xlabel("X (mm)")
+        ax_3d.set_ylabel("Y (mm)")
+        ax_3d.set_zlabel("Z (mm)")
+
+        # Set the same range for all axes, based on the largest range among the axes
+        x_limits = ax_3d.get_xlim()
+        y_limits = ax_3d.get_ylim()
+        z_limits = ax_3d.get_zlim()
+        max_range = max(x_limits[1] - x_limits[0], y_limits[1] - y_limits[0], z_limits[1] - z_limits[0])
+        ax_3d.set_xlim([x_limits[0], x_limits[0] + max_range])
+        ax_3d.set_ylim([y_limits[0], y_limits[0] + max_range])
+        ax_3d.set_zlim([z_limits[0], z_limits[0] + max_range])
+        ax_3d.view_init(elev=30, azim=+90)
+
+        # Camera resolution
+        cam_width, cam_height = cam_size
+
+        # Plot Camera 1 (X,Y)
+        indices = self.downsample(time, points_cam1)
+        ax_cam1 = fig.add_subplot(132)
+        ax_cam1.scatter(points_cam1[indices, 0], points_cam1[indices, 1], color='g', marker='x')
+        ax_cam1.plot(points_cam1[indices, 0], points_cam1[indices, 1], color='g', linestyle='--')
+        ax_cam1.set_title("Camera 1 Tracked Points")
+        ax_cam1.set_xlabel("X (pixels)")
+        ax_cam1.set_ylabel("Y (pixels)")
+        ax_cam1.set_xlim(0, cam_width)
+        ax_cam1.set_ylim(cam_height, 0)
+
+        # Plot Camera 2 (X,Z)
+        indices = self.downsample(time, points_cam2)
+        ax_cam2 = fig.add_subplot(133)
+        ax_cam2.scatter(points_cam2[indices, 0], points_cam2[indices, 1], color='m', marker='x')
+        ax_cam2.plot(points_cam2[indices, 0], points_cam2[indices, 1], color='m', linestyle='--')
+        ax_cam2.set_title("Camera 2 Tracked Points (X vs Z)")
+        ax_cam2.set_xlabel("X (pixels)")
+        ax_cam2.set_ylabel("Z (pixels)")
+        ax_cam2.set_xlim(0, cam_width)
+        ax_cam2.set_ylim(cam_height, 0)
+
+        fig.tight_layout()
+
+    def draw_velocity(self, fig, time, velocity):
+        indices = self.downsample(time, velocity)
+        ax = fig.add_subplot(111)
+        ax.plot(time[indices], velocity[indices], color='orange', linewidth=2)
+        ax.set_title("Object Velocity Over Time")
+        ax.set_xlabel("Time (s)")
+        ax.set_ylabel("Velocity (mm/s)")
+        ax.grid(True)
+        fig.tight_layout()
+
+    def finish(self, fig, save_path=None, block=True):
+        if save_path is not None:
+            # The format (png, svg, ...) follows from the file extension
+            with Tracing.span("save plot", "plot"):
+                fig.savefig(save_path)
+            print(f"[INFO] Plot saved to {save_path}")
+        else:
+            # block=False keeps the Tk recorder responsive while the plot window is open
+            plt.show(block=block)
+
+    def save_all(self, jobs):
+        """
+        Renders and saves figures without opening windows. jobs is a list of (draw_function, figsize, args, save_paths),
+        where draw_function is draw_trajectory or draw_velocity.
+        """
+        for draw_function, figsize, args, save_paths in jobs:
+            with Tracing.span("plot", "plot", figure=draw_function.__name__):
+                fig = self.new_figure(figsize, headless=True)
+                draw_function(fig, *args)
+                for save_path in save_paths:
+                    self.finish(fig, save_path)
+
+    def save_async(self, jobs):
+        # Same as save_all, but on a background thread. Returns the (started) thread
+        thread = threading.Thread(target=self.save_all, args=(jobs,), name="PlotExport", daemon=False)
+        thread.start()
+        return thread
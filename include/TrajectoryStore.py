@@ -0,0 +1,136 @@
+"""
+TrajectoryStore Class
+
+This class stores a trajectory in a chunked, appendable HDF5 file (h5py), as an alternative to the CSV file that
+has to be rewritten from scratch and loaded completely to look at a few seconds of motion.
+
+File layout:
+- time:       (N,) float64, the timestamps in seconds (must be increasing), stored in chunks of chunk_rows rows.
+- data:       (N, C) float64, the values per timestamp (default columns X, Y, Z in mm), same chunking.
+- block_time: (N / chunk_rows,) float64, the first timestamp of every chunk. This small index is loaded completely,
+              so a time-range read only has to touch the chunks inside the range.
+- The metadata (calibration, box dimensions, fps, ...) is saved as JSON in the attributes of the file.
+
+The file can be appended to while recording continues. With swmr=True the writer uses HDF5 single-writer /
+multiple-reader mode, so other processes can read the file (open it with swmr=True as well) while it is written.
+
+Methods:
+- __init__(path, mode, columns, chunk_rows, swmr, metadata): Opens or creates the store. In SWMR mode the attributes
+  can't be changed anymore once writing started, so give the metadata to the constructor.
+- append(time, values): Appends rows to the store.
+- read(t_start, t_end): Returns the rows with t_start <= time < t_end as a DataFrame, without loading the whole session.
+- set_metadata(metadata) / get_metadata(): Saves / loads the metadata dictionary.
+- time_range(): Returns the first and last timestamp in the store.
+- flush(), close(): Writes the buffers to disk / closes the file (the class can also be used in a with-statement).
+"""
+
+import h5py
+import numpy as np
+import pandas as pd
+import json
+
+class TrajectoryStore:
+    def __init__(self, path, mode="a", columns=("X", "Y", "Z"), chunk_rows=4096, swmr=False, metadata=None):
+        self.path = path
+        self.swmr = swmr
+        if mode == "r":
+            self.file = h5py.File(path, "r", swmr=swmr)
+        else:
+            self.file = h5py.File(path, mode, libver="latest" if swmr else "earliest")
+
+        if "time" not in self.file:
+            if mode == "r":
+                raise IOError(f"Not a trajectory store: {path}")
+            # Resizable chunked datasets, so rows can be appended without rewriting the file
+            self.file.create_dataset("time", shape=(0,), maxshape=(None,), dtype=np.float64, chunks=(chunk_rows,))
+            self.file.create_dataset("data", shape=(0, len(columns)), maxshape=(None, len(columns)), dtype=np.float64, chunks=(chunk_rows, len(columns)))
+            self.file.create_dataset("block_time", shape=(0,), maxshape=(None,), dtype=np.float64, chunks=(1024,))
+            self.file["data"].attrs["columns"] = json.dumps(list(columns))
+            self.file.attrs["chunk_rows"] = chunk_rows
+            self.file.attrs["metadata"] = json.dumps({})
+
+        self.time = self.file["time"]
+        self.data = self.file["data"]
+        self.block_time = self.file["block_time"]
+        self.columns = json.loads(self.file["data"].attrs["columns"])
+        self.chunk_rows = int(self.file.attrs["chunk_rows"])
+
+        if metadata is not None:
+            self.set_metadata(metadata)
+        if swmr and mode != "r":
+            self.file.swmr_mode = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self.time.shape[0]
+
+    def append(self, time, values):
+        time = np.atleast_1d(np.asarray(time, dtype=np.float64))
+        values = np.asarray(values, dtype=np.float64).reshape(len(time), len(self.columns))
+        if len(time) == 0:
+            return
+        n_old = len(self)
+        if np.any(np.diff(time) < 0) or (n_old > 0 and time[0] < self.time[n_old - 1]):
+            raise ValueError("Timestamps must be increasing, rows can only be appended at the end of the store")
+
+        n_new = n_old + len(time)
+        self.time.resize((n_new,))
+        self.data.resize((n_new, len(self.columns)))
+        self.time[n_old:n_new] = time
+        self.data[n_old:n_new] = values
+
+        # Update the block index with the first timestamp of every new chunk
+        first_block = -(-n_old // self.chunk_rows)  # First chunk that starts in the appended rows
+        block_starts = np.arange(first_block * self.chunk_rows, n_new, self.chunk_rows)
+        if len(block_starts):
+            n_blocks = first_block + len(block_starts)
+            self.block_time.resize((n_blocks,))
+            self.block_time[first_block:n_blocks] = time[block_starts - n_old]
+
+        if self.swmr:
+            self.flush()
+
+    def read(self, t_start=-np.inf, t_end=np.inf):
+        if self.swmr:
+            # Pick up the rows that were appended by the writer since the file was opened
+            for dataset in (self.time, self.data, self.block_time):
+                dataset.refresh()
+
+        # Find the chunks that contain the time range with the (small) block index
+        block_time = self.block_time[:]
+        first_block = max(np.searchsorted(block_time, t_start, side="right") - 1, 0)
+        last_block = np.searchsorted(block_time, t_end, side="left")
+        row_start = first_block * self.chunk_rows
+        row_end = min(last_block * self.chunk_rows, len(self))
+
+        # Only read those chunks and cut off the rows outside the range
+        time = self.time[row_start:row_end]
+        i_start = np.searchsorted(time, t_start, side="left")
+        i_end = np.searchsorted(time, t_end, side="left")
+        rows = pd.DataFrame(self.data[row_start + i_start:row_start + i_end], columns=self.columns)
+        rows.insert(0, "Time", time[i_start:i_end])
+        return rows
+
+    def time_range(self):
+        if len(self) == 0:
+            return None, None
+        return float(self.time[0]), float(self.time[len(self) - 1])
+
+    def set_metadata(self, metadata):
+        # numpy arrays (e.g. camera matrices) are saved as lists
+        self.file.attrs["metadata"] = json.dumps(metadata, default=lambda value: np.asarray(value).tolist())
+
+    def get_metadata(self):
+        return json.loads(self.file.attrs["metadata"])
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        if self.file:
+            self.file.close()
@@ -0,0 +1,69 @@
+"""
+Triangulation Functions
+
+Multi-view triangulation of the tracked object, for setups with more than two cameras (or two cameras with stereo
+extrinsics). Every camera that sees the object in a frame gives two linear equations for its 3D position (direct
+linear transform, DLT); the least-squares solution over all these cameras is the right singular vector of the
+smallest singular value. All frames are solved at once with a batched np.linalg.svd (no loop over the frames).
+
+The 3D positions are in the coordinate system of camera 1, in mm (the unit of the calibration poses).
+
+Functions:
+- projection_matrix(camera_matrix, R, T): Returns the 3x4 projection matrix K [R | T] of a camera.
+- triangulate_points(projections, points, visible, chunk_size): Triangulates the points of all frames. Returns an
+  (n_frames, 3) array, NaN where fewer than two cameras see the object.
+- reprojection_error(projections, points, visible, points_3d): Returns the reprojection error (pixels) per frame and camera.
+"""
+
+import numpy as np
+
+def projection_matrix(camera_matrix, R=None, T=None):
+    R = np.eye(3) if R is None else np.asarray(R, dtype=np.float64)
+    T = np.zeros(3) if T is None else np.asarray(T, dtype=np.float64).reshape(3)
+    return np.asarray(camera_matrix, dtype=np.float64) @ np.column_stack((R, T))
+
+def triangulate_points(projections, points, visible=None, chunk_size=65536):
+    """
+    projections: (n_cameras, 3, 4) projection matrices, points: (n_frames, n_cameras, 2) undistorted pixel positions,
+    visible: (n_frames, n_cameras) bool, False for the cameras that don't see the object (default: all visible).
+    """
+    projections = np.asarray(projections, dtype=np.float64)
+    points = np.asarray(points, dtype=np.float64)
+    n_frames, n_cameras = points.shape[:2]
+    visible = np.ones((n_frames, n_cameras), dtype=bool) if visible is None else np.asarray(visible, dtype=bool)
+    visible = visible & np.isfinite(points).all(axis=2)
+
+    points_3d = np.full((n_frames, 3), np.nan)
+    for start in range(0, n_frames, chunk_size):
+        stop = min(start + chunk_size, n_frames)
+        x = np.nan_to_num(points[start:stop, :, 0])[:, :, None]
+        y = np.nan_to_num(points[start:stop, :, 1])[:, :, None]
+
+        # Two rows per camera: x * P[2] - P[0] and y * P[2] - P[1] --> (frames, 2 * cameras, 4)
+        rows = np.concatenate((x * projections[None, :, 2] - projections[None, :, 0],
+                               y * projections[None, :, 2] - projections[None, :, 1]), axis=1)
+
+        # Normalize the rows by their spatial part, so the residual of a row is the distance (mm) of the point to the
+        # plane of that row (otherwise the translation of the other cameras makes their rows count much less), and
+        # remove the cameras that don't see the object
+        norms = np.linalg.norm(rows[:, :, :3], axis=2, keepdims=True)
+        weights = np.tile(visible[start:stop], 2)[:, :, None]
+        rows = np.where(weights, rows / np.where(norms > 0, norms, 1.0), 0.0)
+
+        # Least-squares solution: right singular vector of the smallest singular value
+        _, _, vt = np.linalg.svd(rows)
+        homogeneous = vt[:, -1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            points_3d[start:stop] = homogeneous[:, :3] / homogeneous[:, 3:]
+
+    points_3d[visible.sum(axis=1) < 2] = np.nan
+    return points_3d
+
+def reprojection_error(projections, points, visible, points_3d):
+    projections = np.asarray(projections, dtype=np.float64)
+    homogeneous = np.column_stack((points_3d, np.ones(len(points_3d))))
+    projected = np.einsum("cij,fj->fci", projections, homogeneous)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        projected = projected[:, :, :2] / projected[:, :, 2:]
+    errors = np.linalg.norm(projected - np.asarray(points, dtype=np.float64), axis=2)
+    return np.where(visible, errors, np.nan)
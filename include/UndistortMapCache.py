@@ -0,0 +1,96 @@
+"""
+UndistortMapCache Class
+
+This class precomputes the lens undistortion maps of a camera once, so that full frames can be undistorted with a
+single cv2.remap call per frame. cv2.undistort recomputes these maps on every call, which is why undistorting the
+live preview used to be too slow. The maps are stored in the fixed-point format (CV_16SC2), which is the fastest
+format for cv2.remap, and are saved to disk so they only have to be built once per calibration and resolution.
+
+Main Workflow:
+- The maps are keyed by the calibration (camera matrix + distortion coefficients) and the frame resolution.
+- If the frame resolution differs from the resolution the camera was calibrated at, the camera matrix is scaled,
+  so a downscaled preview frame can be undistorted directly (which is a lot cheaper than undistorting 1080p).
+- For a cropped video (see the crop of the recorder), the offset of the crop in the full frame is given instead: the
+  principal point is shifted by the offset, so the undistorted crop is the same region of the undistorted full frame.
+- get_maps() returns the maps from memory, from the cache folder on disk, or builds and saves them.
+- undistort() applies the maps to a frame using cv2.remap.
+
+Methods:
+- __init__(cache_dir, calibration_size): Initializes the cache with the folder to store the maps and the calibration resolution.
+- cache_key(camera_matrix, dist_coeffs, frame_size, offset): Returns the key (hash) of a calibration, resolution and crop offset.
+- scaled_camera_matrix(camera_matrix, frame_size): Scales the camera matrix from the calibration resolution to the frame resolution.
+- cropped_camera_matrix(camera_matrix, offset): Shifts the principal point of the camera matrix to a crop at offset (X, Y).
+- get_maps(camera_matrix, dist_coeffs, frame_size, offset): Returns the (map1, map2) pair, building and saving it if needed.
+- undistort(frame, camera_matrix, dist_coeffs, dst, offset): Undistorts a frame with a single cv2.remap call.
+"""
+
+import cv2
+import numpy as np
+import hashlib
+import os
+
+# Default folder for the saved maps (ignored by git, the maps can always be rebuilt)
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cameraCalibration", "undistort_cache")
+
+class UndistortMapCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, calibration_size=(1920, 1080)):
+        self.cache_dir = cache_dir
+        self.calibration_size = tuple(calibration_size)  # (width, height) of the calibration images
+        self.maps = {}  # In-memory cache: key -> (map1, map2)
+
+    def cache_key(self, camera_matrix, dist_coeffs, frame_size, offset=None):
+        h = hashlib.sha1()
+        h.update(np.ascontiguousarray(camera_matrix, dtype=np.float64).tobytes())
+        h.update(np.ascontiguousarray(dist_coeffs, dtype=np.float64).ravel().tobytes())
+        h.update(np.array(self.calibration_size + tuple(frame_size), dtype=np.int64).tobytes())
+        if offset is not None:
+            h.update(np.array(offset, dtype=np.int64).tobytes())
+        return h.hexdigest()[:16]
+
+    def scaled_camera_matrix(self, camera_matrix, frame_size):
+        # fx, skew and cx scale with the width, fy and cy with the height
+        scaled = np.array(camera_matrix, dtype=np.float64)
+        scaled[0, :] *= frame_size[0] / self.calibration_size[0]
+        scaled[1, :] *= frame_size[1] / self.calibration_size[1]
+        return scaled
+
+    def cropped_camera_matrix(self, camera_matrix, offset):
+        # The crop is in full-resolution pixels, so only the principal point moves
+        cropped = np.array(camera_matrix, dtype=np.float64)
+        cropped[0, 2] -= offset[0]
+        cropped[1, 2] -= offset[1]
+        return cropped
+
+    def get_maps(self, camera_matrix, dist_coeffs, frame_size, offset=None):
+        frame_size = (int(frame_size[0]), int(frame_size[1]))
+        key = self.cache_key(camera_matrix, dist_coeffs, frame_size, offset)
+        if key in self.maps:
+            return self.maps[key]
+
+        map_file = os.path.join(self.cache_dir, f"undistort_{key}_{frame_size[0]}x{frame_size[1]}.npz")
+        if os.path.exists(map_file):
+            with np.load(map_file) as data:
+                maps = (data["map1"], data["map2"])
+        else:
+            # Build the maps once (the new camera matrix equals the old one, so the pixel scale stays the same)
+            if offset is None:
+                K = self.scaled_camera_matrix(camera_matrix, frame_size)
+            else:
+                K = self.cropped_camera_matrix(camera_matrix, offset)
+            D = np.asarray(dist_coeffs, dtype=np.float64)
+            maps = cv2.initUndistortRectifyMap(K, D, None, K, frame_size, cv2.CV_16SC2)
+
+            # Save the maps, write to a temporary file first so a crash never leaves a half written cache file
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_file = map_file + ".tmp.npz"
+            np.savez(tmp_file, map1=maps[0], map2=maps[1])
+            os.replace(tmp_file, map_file)
+            print(f"[INFO] Saved undistortion maps to {map_file}")
+
+        self.maps[key] = maps
+        return maps
+
+    def undistort(self, frame, camera_matrix, dist_coeffs, dst=None, offset=None):
+        # Pass dst to reuse an output buffer instead of allocating a new frame every call
+        map1, map2 = self.get_maps(camera_matrix, dist_coeffs, (frame.shape[1], frame.shape[0]), offset)
+        return cv2.remap(frame, map1, map2, cv2.INTER_LINEAR, dst=dst)
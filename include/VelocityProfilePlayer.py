@@ -0,0 +1,124 @@
+"""
+VelocityProfilePlayer Class
+
+This class plays a scripted velocity schedule on the motor, so step-response and sweep experiments are
+reproducible instead of being driven by hand with MotorVelocityInput.
+
+The schedule is a list of (time, frequency, direction) setpoints: the rotation frequency of the magnet in Hz and
+the direction (1 or -1), at a time in seconds from the start. It can be loaded from a CSV file (columns
+"Time (s)", "Frequency (Hz)", "Direction") or generated from a function of time.
+
+The setpoints are executed with absolute deadlines (start time + setpoint time), not with sleeps between commands,
+so the delays of the commands don't add up over the profile. The player sleeps until just before a deadline and
+spins for the last part to be accurate. The start time can be the start of the recording (see
+DualCameraApp.set_recording_started_callback), which uses the same clock (time.perf_counter), so the commands line
+up with the frame timestamps. For every setpoint the scheduled time, the send time and the time the command was
+done are logged, so the scheduling jitter can be measured.
+
+Methods:
+- __init__(motor, times, frequencies, directions, spin_s): Initializes the player with the motor and the schedule
+  (ValueError if the schedule has no setpoints).
+- from_csv(motor, path): Creates a player from a CSV schedule.
+- from_function(motor, function, duration, step): Creates a player from a function t -> (frequency, direction).
+- start(t0): Starts playing on a background thread, t0 is the perf_counter time of time 0 (default: now).
+- wait(): Waits until the profile is finished.
+- stop(): Aborts the profile and stops the motor.
+- jitter_stats(): Returns the statistics of the lateness of the commands.
+- save_log(path): Saves the commanded against actual timing to CSV.
+"""
+
+import numpy as np
+import pandas as pd
+import threading
+import time
+import csv
+from include.Motor import FrequencyToVelocity
+
+class VelocityProfilePlayer:
+    def __init__(self, motor, times, frequencies, directions, spin_s=0.001):
+        if len(times) == 0:
+            # E.g. a CSV with only the header or a function profile with a negative duration
+            raise ValueError("The velocity profile has no setpoints")
+        order = np.argsort(times, kind="stable")
+        self.motor = motor
+        self.times = np.asarray(times, dtype=np.float64)[order]
+        self.frequencies = np.asarray(frequencies, dtype=np.float64)[order]
+        self.directions = np.asarray(directions, dtype=np.int64)[order]
+        self.spin_s = spin_s  # The last part before a deadline is busy-waited instead of slept (sleep is not accurate)
+
+        self.t0 = None
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.log = []  # (index, scheduled, sent, done) per command, relative to t0
+
+    @classmethod
+    def from_csv(cls, motor, path, **kwargs):
+        schedule = pd.read_csv(path)
+        directions = schedule["Direction"] if "Direction" in schedule else np.ones(len(schedule))
+        return cls(motor, schedule["Time (s)"], schedule["Frequency (Hz)"], directions, **kwargs)
+
+    @classmethod
+    def from_function(cls, motor, function, duration, step=0.1, **kwargs):
+        # function(t) returns (frequency in Hz, direction) for every step in [0, duration]
+        times = np.arange(0.0, duration + step / 2, step)
+        setpoints = [function(t) for t in times]
+        return cls(motor, times, [f for f, _ in setpoints], [d for _, d in setpoints], **kwargs)
+
+    def start(self, t0=None):
+        if self.thread is not None:
+            self.stop()
+        self.t0 = time.perf_counter() if t0 is None else t0
+        self.log = []
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, name="VelocityProfilePlayer", daemon=True)
+        self.thread.start()
+        print(f"[INFO] Velocity profile started ({len(self.times)} setpoints, {self.times[-1]:.1f} s)")
+
+    def wait(self):
+        if self.thread is not None:
+            self.thread.join()
+
+    def stop(self):
+        if self.thread is None:
+            return
+        self.stop_event.set()
+        self.thread.join()
+        self.thread = None
+        self.motor.RunSetVelocity(0)
+
+    def run(self):
+        for i, scheduled in enumerate(self.times):
+            deadline = self.t0 + scheduled
+
+            # Sleep until just before the deadline (can be interrupted by stop), then spin
+            remaining = deadline - time.perf_counter() - self.spin_s
+            if remaining > 0 and self.stop_event.wait(remaining):
+                return
+            while time.perf_counter() < deadline:
+                pass
+            if self.stop_event.is_set():
+                return
+
+            sent = time.perf_counter()
+            self.motor.RunSetVelocity(FrequencyToVelocity(self.frequencies[i], self.directions[i]))
+            done = time.perf_counter()
+            self.log.append((i, scheduled, sent - self.t0, done - self.t0))
+
+    def jitter_stats(self):
+        if not self.log:
+            return None
+        log = np.array(self.log)
+        lateness_ms = (log[:, 2] - log[:, 1]) * 1000.0
+        command_ms = (log[:, 3] - log[:, 2]) * 1000.0
+        return {"n_commands": len(log),
+                "lateness_mean_ms": float(lateness_ms.mean()), "lateness_p95_ms": float(np.percentile(lateness_ms, 95)),
+                "lateness_max_ms": float(lateness_ms.max()), "command_mean_ms": float(command_ms.mean())}
+
+    def save_log(self, path):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Setpoint", "Scheduled (s)", "Sent (s)", "Done (s)", "Lateness (ms)", "Frequency (Hz)", "Direction"])
+            for i, scheduled, sent, done in self.log:
+                writer.writerow([i, scheduled, sent, done, (sent - scheduled) * 1000.0, self.frequencies[i], self.directions[i]])
+        print(f"[INFO] Velocity profile log saved to {path}")
+        print(f"[INFO] Velocity profile timing: {self.jitter_stats()}")
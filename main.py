@@ -8,9 +8,11 @@ This script is designed to automate the process of:
 
 Main Workflow:
 - After the recording is completed, the 'on_recording_done' function is triggered.
+- The recording is added to the post-processing queue (PostProcessQueue), which runs the rest in a worker process,
+  so the recorder GUI stays responsive and the next recording can be started right away.
 - The recorded video files are passed to the VideoTracker to extract tracking data.
 - The tracking data is saved in CSV format, which is then fed into the TrajectoryReconstructor for 3D trajectory reconstruction.
-- Finally, the trajectory is plotted.
+- Finally, the trajectory and velocity plots are saved as PNG files next to the recording.
 
 Dependencies:
 - DualCameraApp (from RecorderClass.py): Provides GUI for dual camera video recording.
@@ -22,39 +24,115 @@ Date: April 2025
 """
 
 from include.RecorderClassV3 import DualCameraApp
-from include.TrackerClassV3 import VideoTracker
-from include.TrajectoryClassV5 import TrajectoryReconstructor
+from include.PostProcessQueue import PostProcessQueue, PostProcessQueueView
+from include import Tracing
 import tkinter as tk
 
+# Set to True to undistort the full frames before tracking (one cached cv2.remap per frame),
+# instead of only undistorting the tracked points in the TrajectoryReconstructor
+UNDISTORT_FRAMES = False
+
+# Set to True to track single-channel (gray) frames, the annotated tracking video is then rendered after tracking from
+# the saved locations. Fastest with "grayscale": true recordings with the Y800 or FFV1 codec (see cameras.json)
+GRAYSCALE_TRACKING = False
+
+# Set to True to log the motor position and velocity during the recording (<filename>_motor.csv), needs the EPOS4
+MOTOR_TELEMETRY = False
+
+# Path to a velocity profile CSV ("Time (s)", "Frequency (Hz)", "Direction") that is played on the motor from the start
+# of every recording, or None. The commanded against actual timing is saved as <filename>_profile_log.csv
+VELOCITY_PROFILE = None
+
+# Number of worker processes for the post-processing queue. NOTE: the tracker asks for the box and ROI selection,
+# with more than one worker multiple selection windows can be open at the same time
+POSTPROCESS_WORKERS = 1
+
+# Path to a session manifest (<filename>_manifest.json) with the box and ROI selections of both cameras, or None.
+# With a manifest, the 3D position is computed live and sent over UDP to LIVE_STREAM_ADDRESS (see include/LivePositionStream.py,
+# LivePositionReceiver receives it, e.g. for the robot or the motor loop)
+LIVE_STREAM = None
+LIVE_STREAM_ADDRESS = ("127.0.0.1", 5005)
+
+# Set to True to capture the frames into a shared-memory frame bus per camera (include/FrameBus.py), so consumers in
+# other processes can read them without copying (attach with FrameBusReader(app.frame_bus_specs()[i]))
+FRAME_BUS = False
+
+# Set to True to record profiling spans of the recorder and the post-processing. When the recorder is closed, the trace
+# is saved as trace.json (open in chrome://tracing or https://ui.perfetto.dev) and a summary per span is printed
+TRACE = False
+
 #from robot_ros import update_target
 #rlcpp.startnode()
 # Function to be called after the recording process is finished, to start the tracker and trajectory generator
 def on_recording_done():
     if hasattr(app, "recorded_file_names") and app.recorded_file_names:
         #Get the names of the recorded files
-        cam1_file, cam2_file = app.recorded_file_names
-        print("Recorded file names:", cam1_file, cam2_file)
-
-        # Apply the tracker on the recordings
-        tracker_cam1 = VideoTracker(cam1_file)
-        tracker_cam1.track_and_save()
-        csv_file_cam1 = tracker_cam1.csv_filename
-        tracker_cam2 = VideoTracker(cam2_file)
-        tracker_cam2.track_and_save()
-        csv_file_cam2 = tracker_cam2.csv_filename
-        
-        # Apply the trajectory generator on the data from the tracker
-        traj_reconstructor = TrajectoryReconstructor(csv_file_cam1, csv_file_cam2)
-        traj_reconstructor.reconstruct()
-        traj_reconstructor.plot_trajectory()
-        traj_reconstructor.plot_velocity()
+        video_files = list(app.recorded_file_names)  # One video per camera, cam1 first
+        cam1_file = video_files[0]
+        print("Recorded file names:", *video_files)
+
+        # Stop the velocity profile (if it is still running) and save its timing log next to the recording
+        if profile_player is not None:
+            profile_player.stop()
+            profile_player.save_log(cam1_file.replace("_cam1.avi", "_profile_log.csv"))
+
+        # Track, reconstruct and plot in the background
+        postprocess_queue.submit(video_files, undistort=UNDISTORT_FRAMES, grayscale=GRAYSCALE_TRACKING)
     else:
         print("No recordings were generated.")
 
-        #robot_ros.update_target(target_pos)  # Uncomment if using ROS to update the target position
+        #robot_ros.update_target(target_pos)  # Uncomment if using ROS to update the target position (live: see LIVE_STREAM)
+
+# The main guard is needed for the worker processes of the post-processing queue (they import this module on Windows)
+if __name__ == "__main__":
+    if TRACE:
+        Tracing.enable()
+
+    # Start the recorder GUI
+    root = tk.Tk()
+    app = DualCameraApp(root)
+    app.set_recording_done_callback(on_recording_done)
+    if FRAME_BUS:
+        app.enable_frame_bus()
+    postprocess_queue = PostProcessQueue(max_workers=POSTPROCESS_WORKERS)
+    postprocess_view = PostProcessQueueView(root, postprocess_queue)
+
+    motor = None
+    profile_player = None
+    if MOTOR_TELEMETRY or VELOCITY_PROFILE:
+        from include.Motor import Motor
+        motor = Motor(1, 0)
+        motor.OpenCommunication()
+    if MOTOR_TELEMETRY:
+        from include.MotorTelemetry import MotorTelemetry
+        app.set_motor_telemetry(MotorTelemetry(motor, rate_hz=200))
+    if VELOCITY_PROFILE:
+        from include.VelocityProfilePlayer import VelocityProfilePlayer
+        motor.EnableMotor()
+        motor.SetVelocityProfile(8000, 8000)
+        profile_player = VelocityProfilePlayer.from_csv(motor, VELOCITY_PROFILE)
+        app.set_recording_started_callback(profile_player.start)  # Same clock as the frame timestamps
+
+    live_stream = None
+    if LIVE_STREAM:
+        from include.LivePositionStream import LivePositionStream
+        live_stream = LivePositionStream.from_manifest(LIVE_STREAM, address=LIVE_STREAM_ADDRESS)
+        live_stream.start()
+        app.add_frame_listener(live_stream.on_frames)
+
+    root.mainloop()
+
+    if live_stream is not None:
+        live_stream.stop()
+
+    if motor is not None:
+        if VELOCITY_PROFILE:
+            motor.DisableMotor()
+        motor.CloseCommunication()
+
+    # Wait for the queued jobs to finish before exiting
+    postprocess_queue.shutdown(wait=True)
 
-# Start the recorder GUI
-root = tk.Tk()
-app = DualCameraApp(root)
-app.set_recording_done_callback(on_recording_done)
-root.mainloop()
\ No newline at end of file
+    if TRACE:
+        Tracing.export_chrome_trace("trace.json")
+        Tracing.print_summary()